@@ -1,200 +1,61 @@
+"""Vercel serverless entry point for the real backend.
+
+vercel.json rewrites /api/* and /auth/* here. Everything expensive happens
+once per instance, at import (the cold start), and is reused by every warm
+invocation that instance serves:
+
+- the app is built by backend create_app() with lazy routers, so a cold
+  start only imports the routers its first request needs;
+- the SQLAlchemy engine and its pool live in app.database.database, and
+  connect on the first query rather than at import;
+- outbound HTTP goes through app.core.http_client's pooled client, created
+  on first use.
+
+State lives in DATABASE_URL (e.g. Postgres); the instance keeps nothing
+between invocations that another instance would need.
+"""
 import os
 import sys
 import logging
-from datetime import datetime, timedelta
-import json
 
-# Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Add the parent directory to the path to import from backend
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
 
-try:
-    from fastapi import FastAPI, Depends, HTTPException, status, Request, Response
-    from fastapi.middleware.cors import CORSMiddleware
-    from fastapi.responses import JSONResponse
-    from pydantic import BaseModel
-    from typing import Optional, Dict, Any
-    
-    # Create a simple FastAPI app directly (not importing from backend)
-    app = FastAPI(title="Micro-Entrepreneur API", docs_url="/api/docs")
-    
-    # Add exception handler for better error reporting
-    @app.middleware("http")
-    async def log_exceptions(request: Request, call_next):
-        try:
-            return await call_next(request)
-        except Exception as e:
-            logger.error(f"Error processing request: {str(e)}")
-            return JSONResponse(
-                status_code=500,
-                content={"detail": f"Server error: {str(e)}"}
-            )
-    
-    # User schemas
-    class UserCreate(BaseModel):
-        name: str
-        email: Optional[str] = None
-        phone: Optional[str] = None
-        user_id: str
-        password: str
+# Serverless defaults, overridable from the project settings. An instance
+# serves one request at a time and may be frozen between them, so routers
+# load on demand, there is no warm-up thread, and the pool stays small.
+os.environ.setdefault("LAZY_ROUTERS", "true")
+os.environ.setdefault("WARM_UP", "off")
+os.environ.setdefault("DB_POOL_SIZE", "1")
+os.environ.setdefault("DB_MAX_OVERFLOW", "2")
 
-    class UserResponse(BaseModel):
-        id: int = 1  # Hardcoded for testing
-        name: str
-        email: Optional[str] = None
-        phone: Optional[str] = None
-        user_id: str
-        created_at: datetime = datetime.now()
+if not os.getenv("DATABASE_URL"):
+    logger.warning("DATABASE_URL is not set; data will not survive this instance")
 
-    class LoginRequest(BaseModel):
-        user_id: str
-        password: str
+from app.main import create_app
 
-    class Token(BaseModel):
-        access_token: str
-        token_type: str = "bearer"
-    
-    # Mock users database (in-memory)
-    users_db = {
-        # Add a test user
-        "testuser": {
-            "id": 1,
-            "name": "Test User",
-            "email": "test@example.com",
-            "phone": "1234567890",
-            "user_id": "testuser",
-            "password": "password123", # Don't do this in production!
-            "created_at": datetime.now().isoformat()
-        }
-    }
-    
-    # Add signup endpoint - both with and without /api prefix for flexibility
-    @app.post("/auth/signup", response_model=UserResponse)
-    @app.post("/api/auth/signup", response_model=UserResponse)
-    async def signup(user: UserCreate):
-        try:
-            logger.info(f"Signup attempt for user_id: {user.user_id}")
-            
-            # Check if user exists
-            if user.user_id in users_db:
-                logger.warning(f"User {user.user_id} already exists")
-                raise HTTPException(status_code=400, detail="User ID already registered")
-            
-            # Create user (simplified, no actual DB)
-            new_user = {
-                "id": len(users_db) + 1,
-                "name": user.name,
-                "email": user.email,
-                "phone": user.phone,
-                "user_id": user.user_id,
-                "password": user.password,  # In production, hash this!
-                "created_at": datetime.now().isoformat()
-            }
-            
-            # Store in our mock DB
-            users_db[user.user_id] = new_user
-            logger.info(f"User {user.user_id} created successfully")
-            
-            # Return user data without password
-            response_data = {k: v for k, v in new_user.items() if k != "password"}
-            return response_data
-        
-        except HTTPException as he:
-            # Re-raise HTTP exceptions
-            raise he
-        except Exception as e:
-            # Log any other errors
-            logger.error(f"Signup error: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Signup error: {str(e)}")
-    
-    # Add login endpoint - both with and without /api prefix for flexibility
-    @app.post("/auth/login", response_model=Token)
-    @app.post("/api/auth/login", response_model=Token)
-    async def login(login_request: LoginRequest):
-        try:
-            logger.info(f"Login attempt for user_id: {login_request.user_id}")
-            
-            # Check if user exists and password matches
-            if login_request.user_id not in users_db or users_db[login_request.user_id]["password"] != login_request.password:
-                logger.warning(f"Invalid login for user_id: {login_request.user_id}")
-                raise HTTPException(status_code=400, detail="Incorrect user ID or password")
-            
-            logger.info(f"Login successful for user_id: {login_request.user_id}")
-            # Return a mock token
-            return {"access_token": f"mock_token_{login_request.user_id}", "token_type": "bearer"}
-        
-        except HTTPException as he:
-            # Re-raise HTTP exceptions
-            raise he
-        except Exception as e:
-            # Log any other errors
-            logger.error(f"Login error: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Login error: {str(e)}")
-    
-    # Root endpoint for testing
-    @app.get("/")
-    async def root():
-        return {"message": "API is working!"}
+API_PREFIX = "/api"
 
-    # Health check endpoint for debugging
-    @app.get("/api/health")
-    @app.get("/health")
-    async def health_check():
-        return {
-            "status": "ok", 
-            "timestamp": datetime.now().isoformat(),
-            "users_count": len(users_db),
-            "python_path": sys.path,
-            "registered_routes": [
-                {"path": route.path, "name": route.name, "methods": list(route.methods)} 
-                for route in app.routes
-            ]
-        }
-        
-    # Debug endpoint to echo request data
-    @app.post("/api/debug")
-    @app.post("/debug")
-    async def debug_request(request: Request):
-        body = await request.body()
-        try:
-            body_json = json.loads(body)
-        except:
-            body_json = {"raw": str(body)}
-            
-        return {
-            "method": request.method,
-            "url": str(request.url),
-            "headers": dict(request.headers),
-            "query_params": dict(request.query_params),
-            "path_params": request.path_params,
-            "body": body_json
-        }
-    
-    # Override CORS settings to allow requests from the same domain
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],  # In production, this would be restricted to your domain
-        allow_credentials=False,
-        allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
-        allow_headers=["*"],
-    )
+class StripPrefix:
+    """Serve /api/<path> as /<path>, the paths the backend routers are mounted at"""
 
-    # Export the app for Vercel serverless function
-    handler = app
-    
-except Exception as e:
-    # Log startup errors
-    print(f"Startup error: {str(e)}")
-    
-    # Create a minimal error-reporting app
-    from fastapi import FastAPI
-    app = FastAPI()
-    
-    @app.get("/")
-    async def error_root():
-        return {"error": f"Failed to initialize API: {str(e)}"}
-    
-    handler = app
+    def __init__(self, app, prefix: str):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            path = scope["path"]
+            if path == self.prefix or path.startswith(self.prefix + "/"):
+                scope = dict(scope, path=path[len(self.prefix):] or "/",
+                             root_path=scope.get("root_path", "") + self.prefix)
+        await self.app(scope, receive, send)
+
+backend = create_app()
+app = StripPrefix(backend, API_PREFIX)
+
+# Export the app for Vercel serverless function
+handler = app
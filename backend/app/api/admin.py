@@ -0,0 +1,126 @@
+from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi.responses import FileResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core import profiling, memory
+from app.database.database import shards
+from app.models.models import Customer, Interaction
+from typing import Dict, Any, Optional
+import os
+
+router = APIRouter()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Admin endpoints exist only when ADMIN_TOKEN is configured"""
+    if not profiling.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not profiling.is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@router.get("/profiling", dependencies=[Depends(require_admin)])
+def get_profiling_status() -> Dict[str, Any]:
+    """Rolling route profiles and saved profile files"""
+    files = sorted(os.listdir(profiling.PROFILE_DIR)) if os.path.isdir(profiling.PROFILE_DIR) else []
+    return {
+        "sample_interval_ms": profiling.SAMPLE_INTERVAL * 1000,
+        "rolling": profiling.rolling_profiles.status(),
+        "files": files
+    }
+
+@router.put("/profiling/routes", dependencies=[Depends(require_admin)])
+def set_rolling_profile(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Profile a fraction of requests to a route, e.g. {"route": "/dashboard/reports", "rate": 0.05}"""
+    route = config.get("route")
+    if not route or not route.startswith("/"):
+        raise HTTPException(status_code=400, detail="route must be a path template starting with /")
+    try:
+        profiling.rolling_profiles.configure(route, float(config.get("rate", 0.01)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"rolling": profiling.rolling_profiles.status()}
+
+@router.delete("/profiling/routes", dependencies=[Depends(require_admin)])
+def remove_rolling_profile(route: str) -> Dict[str, Any]:
+    """Stop profiling a route (its collapsed stacks file is kept)"""
+    if not profiling.rolling_profiles.remove(route):
+        raise HTTPException(status_code=404, detail="Route is not being profiled")
+    return {"rolling": profiling.rolling_profiles.status()}
+
+@router.get("/profiles/{filename}", dependencies=[Depends(require_admin)])
+def download_profile(filename: str):
+    """Download a saved profile (open .speedscope.json files at speedscope.app)"""
+    if os.path.basename(filename) != filename or not filename.startswith(("profile-", "rolling-")):
+        raise HTTPException(status_code=400, detail="Invalid profile name")
+    path = os.path.join(profiling.PROFILE_DIR, filename)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "application/json" if filename.endswith(".json") else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=filename)
+
+@router.get("/memory", dependencies=[Depends(require_admin)])
+def get_memory_status() -> Dict[str, Any]:
+    """RSS, tracemalloc state and stored snapshots for this worker"""
+    return memory.memory_status()
+
+@router.post("/memory/tracemalloc/start", dependencies=[Depends(require_admin)])
+def start_tracemalloc(options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Start tracing allocations; deeper stacks cost more memory and CPU"""
+    frames = int((options or {}).get("frames", 10))
+    if not 1 <= frames <= 100:
+        raise HTTPException(status_code=400, detail="frames must be between 1 and 100")
+    memory.start_tracing(frames)
+    return memory.memory_status()
+
+@router.post("/memory/tracemalloc/stop", dependencies=[Depends(require_admin)])
+def stop_tracemalloc() -> Dict[str, Any]:
+    memory.stop_tracing()
+    return memory.memory_status()
+
+@router.post("/memory/snapshots", dependencies=[Depends(require_admin)])
+def take_memory_snapshot(label: Optional[str] = None) -> Dict[str, Any]:
+    """Take a tracemalloc snapshot and return its top allocation sites"""
+    try:
+        return memory.snapshots.take(label)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/memory/snapshots/diff", dependencies=[Depends(require_admin)])
+def diff_memory_snapshots(base: int, target: Optional[int] = None, limit: int = 20) -> Dict[str, Any]:
+    """Allocation growth between two snapshots (target defaults to a new snapshot)"""
+    try:
+        if target is None:
+            target = memory.snapshots.take("diff")["id"]
+        return {"base": base, "target": target, "top": memory.snapshots.diff(base, target, limit)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Snapshot {e.args[0]} not found")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/shards", dependencies=[Depends(require_admin)])
+def get_shard_status() -> Dict[str, Any]:
+    """Tenants, customers and interactions on every shard, counted on all shards at once"""
+    def count(db: Session) -> Dict[str, int]:
+        return {
+            "tenants": db.query(func.count(func.distinct(Customer.user_id))).scalar(),
+            "customers": db.query(func.count(Customer.id)).scalar(),
+            "interactions": db.query(func.count(Interaction.id)).scalar(),
+        }
+    return {"shards": shards.scatter_gather(count)}
+
+@router.get("/tenants/largest", dependencies=[Depends(require_admin)])
+def get_largest_tenants(limit: int = 10) -> Dict[str, Any]:
+    """Tenants with the most customers: each shard's top `limit`, merged"""
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+
+    def largest(db: Session):
+        customers = func.count(Customer.id)
+        return (db.query(Customer.user_id, customers).group_by(Customer.user_id)
+                .order_by(customers.desc(), Customer.user_id).limit(limit).all())
+
+    tenants = [
+        {"user_id": user_id, "customers": count, "shard": shard}
+        for shard, rows in shards.scatter_gather(largest).items() for user_id, count in rows
+    ]
+    tenants.sort(key=lambda tenant: (-tenant["customers"], tenant["user_id"]))
+    return {"tenants": tenants[:limit]}
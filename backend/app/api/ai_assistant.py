@@ -1,6 +1,5 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
 from sqlalchemy.orm import Session
-import httpx
 import os
 import base64
 from io import BytesIO
@@ -9,6 +8,10 @@ from typing import Dict, Any, List, Optional
 from app.database.database import get_db
 from app.models.models import Customer as CustomerModel, Interaction as InteractionModel
 from app.core.security_utils import limiter
+from app.core.scoring import get_customer_score, engagement_level, format_hour_window, refresh_customer_scores, refresh_stale_scores
+from app.core.contact_time import best_contact_times
+from app.core.metrics import time_upstream
+from app.core.http_client import get_http_client
 import json
 from pydantic import BaseModel
 from app.api.ai_image_generator import ImagePromptRequest, ImageGenerationResponse
@@ -18,7 +21,10 @@ load_dotenv()
 router = APIRouter()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+GEMINI_API_URL = os.getenv(
+    "GEMINI_API_URL",
+    "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+)
 
 @router.post("/assist")
 @limiter.limit("5/minute")
@@ -53,7 +59,8 @@ async def ai_assist(request: Request, data: Dict[str, Any]) -> Dict[str, Any]:
     
     # Make request to Gemini API
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        client = get_http_client()
+        with time_upstream("gemini"):
             response = await client.post(
                 f"{GEMINI_API_URL}?key={GEMINI_API_KEY}",
                 json={
@@ -67,29 +74,29 @@ async def ai_assist(request: Request, data: Dict[str, Any]) -> Dict[str, Any]:
                     "Content-Type": "application/json"
                 }
             )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if "candidates" in data and len(data["candidates"]) > 0:
-                    ai_response = data["candidates"][0]["content"]["parts"][0]["text"]
-                    
-                    # Try to clean up the JSON response if it contains JSON
-                    if '{' in ai_response and '}' in ai_response:
-                        # Check if the response is wrapped in quotes or markdown
-                        if ai_response.strip().startswith('"""') or ai_response.strip().startswith('```'):
-                            # Extract just the JSON part
-                            import re
-                            json_match = re.search(r'\{[\s\S]*\}', ai_response)
-                            if json_match:
-                                ai_response = json_match.group(0)
-                    
-                    return {"response": ai_response}
-                else:
-                    return {"error": "No response from AI model"}
+        
+        if response.status_code == 200:
+            data = response.json()
+            if "candidates" in data and len(data["candidates"]) > 0:
+                ai_response = data["candidates"][0]["content"]["parts"][0]["text"]
+                
+                # Try to clean up the JSON response if it contains JSON
+                if '{' in ai_response and '}' in ai_response:
+                    # Check if the response is wrapped in quotes or markdown
+                    if ai_response.strip().startswith('"""') or ai_response.strip().startswith('```'):
+                        # Extract just the JSON part
+                        import re
+                        json_match = re.search(r'\{[\s\S]*\}', ai_response)
+                        if json_match:
+                            ai_response = json_match.group(0)
+                
+                return {"response": ai_response}
             else:
-                # Get the error details
-                error_text = await response.aread()
-                return {"error": f"Gemini API error: {response.status_code} - {error_text.decode()}"}
+                return {"error": "No response from AI model"}
+        else:
+            # Get the error details
+            error_text = await response.aread()
+            return {"error": f"Gemini API error: {response.status_code} - {error_text.decode()}"}
     except Exception as e:
         return {"error": f"Failed to connect to AI service: {str(e)}"}
 
@@ -134,18 +141,35 @@ async def get_customer_insights(
         ]
     }
     
-    # Mock AI insights (in real app, would use actual AI)
+    # Precomputed engagement scores and contact-time histogram (primary-key reads)
+    score = get_customer_score(db, customer.id, user_id)
+    contact_time = best_contact_times(db, user_id, [customer.id])[0]
+    
+    if score.churn_risk >= 0.7:
+        risk_assessment = "High churn risk - customer has gone quiet"
+        recommended_actions = ["Send a re-engagement offer", "Schedule a call", "Ask for feedback"]
+    elif score.churn_risk >= 0.4:
+        risk_assessment = "Moderate churn risk - engagement is slowing down"
+        recommended_actions = ["Follow up on recent inquiry", "Send personalized offer", "Share a helpful update"]
+    else:
+        risk_assessment = "Low risk customer with good engagement"
+        recommended_actions = ["Ask for a referral", "Suggest an upgrade or add-on", "Keep regular check-ins"]
+    
     insights = {
-        "engagement_level": "High" if len(interactions) > 5 else "Medium" if len(interactions) > 2 else "Low",
-        "recommended_actions": [
-            "Follow up on recent inquiry",
-            "Send personalized offer",
-            "Schedule a call"
-        ],
-        "best_contact_time": "10:00 AM - 12:00 PM",
+        "engagement_level": engagement_level(score.engagement_score),
+        "engagement_score": round(score.engagement_score, 1),
+        "recency_score": round(score.recency_score, 1),
+        "frequency_score": round(score.frequency_score, 1),
+        "churn_risk": round(score.churn_risk, 3),
+        "recommended_actions": recommended_actions,
+        "best_contact_time": (
+            contact_time["best_contact_time"]
+            or format_hour_window(score.best_contact_hour)
+            or "10:00 AM - 12:00 PM"
+        ),
         "preferred_communication": "WhatsApp",
         "potential_services": ["Life Insurance", "Health Insurance"],
-        "risk_assessment": "Low risk customer with good engagement"
+        "risk_assessment": risk_assessment
     }
     
     return {
@@ -154,6 +178,23 @@ async def get_customer_insights(
         "context": context
     }
 
+@router.post("/customer-scores/refresh")
+def refresh_scores(
+    refresh_data: Dict[str, Any],
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """Rescore a tenant's customers (only stale ones unless full=true)"""
+    user_id = refresh_data.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=400, detail="user_id is required")
+    
+    if refresh_data.get("full"):
+        scored = refresh_customer_scores(db, user_id)
+    else:
+        scored = refresh_stale_scores(db, user_id)
+    
+    return {"user_id": user_id, "customers_scored": scored}
+
 @router.post("/generate-message")
 async def generate_personalized_message(
     request_data: Dict[str, Any],
@@ -319,7 +360,8 @@ async def generate_marketing_content(
     
     # Make request to Gemini API
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        client = get_http_client()
+        with time_upstream("gemini"):
             response = await client.post(
                 f"{GEMINI_API_URL}?key={GEMINI_API_KEY}",
                 json={
@@ -333,22 +375,22 @@ async def generate_marketing_content(
                     "Content-Type": "application/json"
                 }
             )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if "candidates" in data and len(data["candidates"]) > 0:
-                    ai_response = data["candidates"][0]["content"]["parts"][0]["text"]
-                    return {
-                        "content": ai_response,
-                        "content_type": content_type,
-                        "platform": platform if content_type == "social_media" else None,
-                        "tone": tone
-                    }
-                else:
-                    return {"error": "No response from AI model"}
+        
+        if response.status_code == 200:
+            data = response.json()
+            if "candidates" in data and len(data["candidates"]) > 0:
+                ai_response = data["candidates"][0]["content"]["parts"][0]["text"]
+                return {
+                    "content": ai_response,
+                    "content_type": content_type,
+                    "platform": platform if content_type == "social_media" else None,
+                    "tone": tone
+                }
             else:
-                # Get the error details
-                error_text = await response.aread()
-                return {"error": f"Gemini API error: {response.status_code} - {error_text.decode()}"}
+                return {"error": "No response from AI model"}
+        else:
+            # Get the error details
+            error_text = await response.aread()
+            return {"error": f"Gemini API error: {response.status_code} - {error_text.decode()}"}
     except Exception as e:
         return {"error": f"Failed to connect to AI service: {str(e)}"}
\ No newline at end of file
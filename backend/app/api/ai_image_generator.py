@@ -4,6 +4,7 @@ import os
 import base64
 from io import BytesIO
 from typing import Optional
+from app.core.metrics import time_upstream
 
 # This is a placeholder for the actual Google Gemini integration
 # In a real implementation, we would import and use the Google Gemini client
@@ -58,10 +59,11 @@ async def generate_image(request: ImagePromptRequest):
             client = genai.Client(api_key=api_key)
             
             # Generate content
-            response = client.models.generate_content(
-                model=request.model,
-                contents=[request.prompt],
-            )
+            with time_upstream("gemini_image"):
+                response = client.models.generate_content(
+                    model=request.model,
+                    contents=[request.prompt],
+                )
             
             # Process the response
             for part in response.candidates[0].content.parts:
@@ -1,17 +1,31 @@
+import anyio
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.database.database import get_db
+from app.database.database import get_directory_db, shards
 from app.models.models import User as UserModel
 from app.schemas.schemas import UserCreate, User as UserSchema, UserUpdate, PasswordChangeRequest
 from app.schemas.login import LoginRequest
-from app.core.security import get_password_hash, create_access_token, verify_password, get_current_user_id
+from app.core.security import create_access_token, get_current_user_id, revoke_access_token, security
+from app.core.passwords import hash_password, verify_password, verify_and_update
 from datetime import timedelta
 from typing import Dict, Any
 
 router = APIRouter()
 
+def _replicate_user(db_user: UserModel) -> None:
+    """Keep the tenant's shard copy of its users row current (without credentials:
+    logins are only checked against the directory)"""
+    if shards.sharded:
+        row = {column.name: getattr(db_user, column.key) for column in UserModel.__table__.columns}
+        shards.replicate(db_user.id, UserModel.__table__, {**row, "password_hash": None})
+
+# Routes that hash passwords stay sync, so their queries run on a worker thread rather than
+# the event loop; bcrypt itself is handed back to the loop (anyio.from_thread.run) and runs in
+# the password pool with its backpressure.
+
 @router.post("/signup", response_model=UserSchema)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+def register_user(user: UserCreate, db: Session = Depends(get_directory_db)):
     # Check if user already exists
     db_user = db.query(UserModel).filter(UserModel.user_id == user.user_id).first()
     if db_user:
@@ -30,16 +44,18 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
         phone=user.phone,
         user_id=user.user_id
     )
-    db_user.set_password(user.password)
+    db_user.password_hash = anyio.from_thread.run(hash_password, user.password)
     
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    shards.place(db_user.id)
+    _replicate_user(db_user)
     
     return db_user
 
 @router.post("/login")
-def login_user(login_request: LoginRequest, db: Session = Depends(get_db)) -> Dict[str, Any]:
+def login_user(login_request: LoginRequest, db: Session = Depends(get_directory_db)) -> Dict[str, Any]:
     user_id = login_request.user_id
     password = login_request.password
     
@@ -48,9 +64,13 @@ def login_user(login_request: LoginRequest, db: Session = Depends(get_db)) -> Di
     if not db_user:
         raise HTTPException(status_code=400, detail="Incorrect user ID or password")
     
-    # Verify password
-    if not verify_password(password, db_user.password_hash):
+    # Verify password, upgrading the stored hash if the cost factor has changed
+    valid, new_hash = anyio.from_thread.run(verify_and_update, password, db_user.password_hash)
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect user ID or password")
+    if new_hash:
+        db_user.password_hash = new_hash
+        db.commit()
     
     # Create access token
     access_token_expires = timedelta(minutes=30)
@@ -60,15 +80,23 @@ def login_user(login_request: LoginRequest, db: Session = Depends(get_db)) -> Di
     
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.post("/logout")
+def logout_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user_id: str = Depends(get_current_user_id)
+) -> Dict[str, Any]:
+    revoke_access_token(credentials.credentials)
+    return {"message": "Logged out successfully"}
+
 @router.get("/profile", response_model=UserSchema)
-def get_user_profile(current_user_id: str = Depends(get_current_user_id), db: Session = Depends(get_db)):
+def get_user_profile(current_user_id: str = Depends(get_current_user_id), db: Session = Depends(get_directory_db)):
     db_user = db.query(UserModel).filter(UserModel.user_id == current_user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 @router.put("/profile", response_model=UserSchema)
-def update_user_profile(user_update: UserUpdate, current_user_id: str = Depends(get_current_user_id), db: Session = Depends(get_db)):
+def update_user_profile(user_update: UserUpdate, current_user_id: str = Depends(get_current_user_id), db: Session = Depends(get_directory_db)):
     db_user = db.query(UserModel).filter(UserModel.user_id == current_user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -97,20 +125,21 @@ def update_user_profile(user_update: UserUpdate, current_user_id: str = Depends(
     
     db.commit()
     db.refresh(db_user)
+    _replicate_user(db_user)
     return db_user
 
 @router.post("/change-password")
-def change_password(password_request: PasswordChangeRequest, current_user_id: str = Depends(get_current_user_id), db: Session = Depends(get_db)):
+def change_password(password_request: PasswordChangeRequest, current_user_id: str = Depends(get_current_user_id), db: Session = Depends(get_directory_db)):
     db_user = db.query(UserModel).filter(UserModel.user_id == current_user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Verify current password
-    if not verify_password(password_request.current_password, db_user.password_hash):
+    if not anyio.from_thread.run(verify_password, password_request.current_password, db_user.password_hash):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Update password
-    db_user.set_password(password_request.new_password)
+    db_user.password_hash = anyio.from_thread.run(hash_password, password_request.new_password)
     db.commit()
     
     return {"message": "Password changed successfully"}
\ No newline at end of file
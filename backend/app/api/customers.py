@@ -1,18 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
-from app.database.database import get_db
-from app.models.models import Customer as CustomerModel, Interaction as InteractionModel
-from app.schemas.schemas import CustomerCreate, CustomerUpdate, Customer as CustomerSchema
-from typing import List, Dict, Any
+from app.database.database import get_db, tenant_criteria
+from app.models.models import Customer as CustomerModel, Interaction as InteractionModel, CustomerSegment, CustomerScore, CustomerContactHistogram
+from app.schemas.schemas import CustomerCreate, CustomerUpdate, Customer as CustomerSchema, Interaction as InteractionSchema
+from app.core.segmentation import SEGMENTS, refresh_segments, refresh_stale_segments, segment_counts
+from app.core.contact_time import best_contact_times, rebuild_histograms, record_inbound_interaction
+from app.core.scoring import is_inbound, is_outbound
+from app.core.rollups import record_daily_metrics
+from app.core.pubsub import publish_event
+from app.core.serialization import FAST_JSON, RowSerializer
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 router = APIRouter()
 
+MAX_BEST_TIME_IDS = 10000
+
+CUSTOMER_ROWS = RowSerializer(CustomerSchema)
+INTERACTION_ROWS = RowSerializer(InteractionSchema)
+
 @router.post("/", response_model=CustomerSchema)
 def create_customer(customer: CustomerCreate, db: Session = Depends(get_db)):
     db_customer = CustomerModel(**customer.dict())
     db.add(db_customer)
+    record_daily_metrics(db, customer.user_id, customers_added=1)
     db.commit()
     db.refresh(db_customer)
     return db_customer
@@ -22,17 +34,55 @@ def get_customers(
     user_id: int,
     skip: int = 0,
     limit: int = 100,
+    segment: Optional[str] = None,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    customers = db.query(CustomerModel).filter(CustomerModel.user_id == user_id).offset(skip).limit(limit).all()
+    rows = CUSTOMER_ROWS.only(fields)
+    query = db.query(CustomerModel).filter(CustomerModel.user_id == user_id)
+    
+    if segment is not None:
+        if segment not in SEGMENTS:
+            raise HTTPException(status_code=400, detail=f"Unknown segment. Valid segments: {', '.join(SEGMENTS)}")
+        # Served by the (user_id, segment, customer_id) index on customer_segments
+        query = query.join(CustomerSegment, CustomerSegment.customer_id == CustomerModel.id).filter(
+            CustomerSegment.user_id == user_id,
+            CustomerSegment.segment == segment
+        ).order_by(CustomerSegment.customer_id)
+    
+    if FAST_JSON or fields is not None:
+        # Only the requested columns are selected
+        return rows.response(query.with_entities(*rows.columns(CustomerModel)).offset(skip).limit(limit))
+    customers = query.offset(skip).limit(limit).all()
     return customers
 
+@router.get("/segments")
+def get_segments(user_id: int, db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """Get the number of customers in each segment"""
+    return {"user_id": user_id, "segments": segment_counts(db, user_id)}
+
+@router.post("/segments/refresh")
+def refresh_customer_segments(refresh_data: Dict[str, Any], db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """Re-assign segments (only customers with new interactions unless full=true)"""
+    user_id = refresh_data.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=400, detail="user_id is required")
+    
+    if refresh_data.get("full"):
+        assigned = refresh_segments(db, user_id)
+    else:
+        assigned = refresh_stale_segments(db, user_id)
+    
+    return {"user_id": user_id, "customers_assigned": assigned}
+
 @router.get("/search", response_model=List[CustomerSchema])
 def search_customers(
     user_id: int,
     query: str,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
+    rows = CUSTOMER_ROWS.only(fields)
     customers = db.query(CustomerModel).filter(
         CustomerModel.user_id == user_id,
         or_(
@@ -40,8 +90,43 @@ def search_customers(
             CustomerModel.contact_info.contains(query),
             CustomerModel.notes.contains(query)
         )
-    ).all()
-    return customers
+    )
+    if FAST_JSON or fields is not None:
+        return rows.response(customers.with_entities(*rows.columns(CustomerModel)))
+    return customers.all()
+
+@router.get("/best-time")
+def get_best_contact_times(user_id: int, ids: str, db: Session = Depends(get_db)) -> List[Dict[str, Any]]:
+    """Get the best contact window for a comma-separated list of customer ids"""
+    try:
+        customer_ids = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    return _best_contact_times(db, user_id, customer_ids)
+
+@router.post("/best-time")
+def post_best_contact_times(request_data: Dict[str, Any], db: Session = Depends(get_db)) -> List[Dict[str, Any]]:
+    """Same as GET /best-time, for id lists too long for a query string"""
+    user_id = request_data.get("user_id")
+    customer_ids = request_data.get("ids", [])
+    if not user_id or not isinstance(customer_ids, list):
+        raise HTTPException(status_code=400, detail="user_id and a list of ids are required")
+    return _best_contact_times(db, user_id, customer_ids)
+
+def _best_contact_times(db: Session, user_id: int, customer_ids: List[int]) -> List[Dict[str, Any]]:
+    if not customer_ids:
+        raise HTTPException(status_code=400, detail="At least one customer id is required")
+    if len(customer_ids) > MAX_BEST_TIME_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BEST_TIME_IDS} ids per request")
+    return best_contact_times(db, user_id, customer_ids)
+
+@router.post("/best-time/rebuild")
+def rebuild_best_contact_times(request_data: Dict[str, Any], db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """Rebuild contact-time histograms for a tenant from its interaction history"""
+    user_id = request_data.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=400, detail="user_id is required")
+    return {"user_id": user_id, "customers_rebuilt": rebuild_histograms(db, user_id)}
 
 @router.post("/{customer_id}/contact")
 def contact_customer(
@@ -50,7 +135,9 @@ def contact_customer(
     db: Session = Depends(get_db)
 ):
     """Record a contact interaction with a customer"""
-    db_customer = db.query(CustomerModel).filter(CustomerModel.id == customer_id).first()
+    db_customer = db.query(CustomerModel).filter(
+        CustomerModel.id == customer_id, *tenant_criteria(db, CustomerModel.user_id)
+    ).first()
     if not db_customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
@@ -65,26 +152,62 @@ def contact_customer(
     )
     
     db.add(interaction)
+    
+    # Replies from the customer feed their contact-time histogram
+    if is_inbound(interaction.sent_by):
+        record_inbound_interaction(db, customer_id, db_customer.user_id)
+    
+    if is_outbound(interaction.sent_by):
+        record_daily_metrics(db, db_customer.user_id, messages_other=1)
+    else:
+        record_daily_metrics(db, db_customer.user_id, messages_received=1)
+    
     db.commit()
     db.refresh(db_customer)
     
+    publish_event(db_customer.user_id, "customer.contacted", {
+        "customer_id": customer_id,
+        "interaction_id": interaction.id,
+        "message": interaction.message,
+        "sent_by": interaction.sent_by,
+        "timestamp": interaction.timestamp
+    })
+    
     return {"message": "Contact recorded successfully", "customer": db_customer}
 
 @router.get("/{customer_id}/interactions")
 def get_customer_interactions(
     customer_id: int,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Get all interactions for a specific customer"""
-    interactions = db.query(InteractionModel).filter(
+    query = db.query(InteractionModel).filter(
         InteractionModel.customer_id == customer_id
-    ).order_by(InteractionModel.timestamp.desc()).all()
+    ).order_by(InteractionModel.timestamp.desc())
+    criteria = tenant_criteria(db, CustomerModel.user_id)
+    if criteria:
+        query = query.join(CustomerModel, CustomerModel.id == InteractionModel.customer_id).filter(*criteria)
     
+    if fields is not None:
+        rows = INTERACTION_ROWS.only(fields)
+        return rows.response(query.with_entities(*rows.columns(InteractionModel)))
+    interactions = query.all()
     return interactions
 
 @router.get("/{customer_id}", response_model=CustomerSchema)
-def get_customer(customer_id: int, db: Session = Depends(get_db)):
-    db_customer = db.query(CustomerModel).filter(CustomerModel.id == customer_id).first()
+def get_customer(customer_id: int, fields: Optional[str] = None, db: Session = Depends(get_db)):
+    if fields is not None:
+        rows = CUSTOMER_ROWS.only(fields)
+        row = db.query(*rows.columns(CustomerModel)).filter(
+            CustomerModel.id == customer_id, *tenant_criteria(db, CustomerModel.user_id)
+        ).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Customer not found")
+        return rows.item_response(row)
+    db_customer = db.query(CustomerModel).filter(
+        CustomerModel.id == customer_id, *tenant_criteria(db, CustomerModel.user_id)
+    ).first()
     if not db_customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     return db_customer
@@ -95,7 +218,9 @@ def update_customer(
     customer: CustomerUpdate,
     db: Session = Depends(get_db)
 ):
-    db_customer = db.query(CustomerModel).filter(CustomerModel.id == customer_id).first()
+    db_customer = db.query(CustomerModel).filter(
+        CustomerModel.id == customer_id, *tenant_criteria(db, CustomerModel.user_id)
+    ).first()
     if not db_customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
@@ -108,10 +233,18 @@ def update_customer(
 
 @router.delete("/{customer_id}")
 def delete_customer(customer_id: int, db: Session = Depends(get_db)):
-    db_customer = db.query(CustomerModel).filter(CustomerModel.id == customer_id).first()
+    db_customer = db.query(CustomerModel).filter(
+        CustomerModel.id == customer_id, *tenant_criteria(db, CustomerModel.user_id)
+    ).first()
     if not db_customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
+    # Derived rows go with the customer; the refresh jobs only rewrite customers that still exist
+    db.query(CustomerSegment).filter(CustomerSegment.customer_id == customer_id).delete(synchronize_session=False)
+    db.query(CustomerScore).filter(CustomerScore.customer_id == customer_id).delete(synchronize_session=False)
+    db.query(CustomerContactHistogram).filter(
+        CustomerContactHistogram.customer_id == customer_id
+    ).delete(synchronize_session=False)
     db.delete(db_customer)
     db.commit()
     return {"message": "Customer deleted successfully"}
\ No newline at end of file
@@ -1,31 +1,27 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, select, union_all, literal, cast, null, String, DateTime
 from app.database.database import get_db
 from app.models.models import Customer as CustomerModel, Referral as ReferralModel, Interaction as InteractionModel
-from typing import Dict, Any, List
-from datetime import datetime, timedelta
+from app.core.rollups import resolve_date_range, daily_metrics_series, daily_metrics_totals, PLATFORMS
+from app.core.serialization import FAST_JSON, ORJSONResponse
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta, date
 
 router = APIRouter()
 
 @router.get("/")
-def get_dashboard_metrics(user_id: int, db: Session = Depends(get_db)) -> Dict[str, Any]:
-    # Get total customers
-    total_customers = db.query(CustomerModel).filter(CustomerModel.user_id == user_id).count()
+def get_dashboard_metrics(user_id: int, days: Optional[int] = None, db: Session = Depends(get_db)) -> Dict[str, Any]:
+    # All four totals in one round trip
+    def count(column, *conditions):
+        return select(func.count(column)).where(*conditions).scalar_subquery()
     
-    # Get total referrals
-    total_referrals = db.query(ReferralModel).filter(ReferralModel.user_id == user_id).count()
-    
-    # Get completed referrals (rewards)
-    completed_referrals = db.query(ReferralModel).filter(
-        ReferralModel.user_id == user_id,
-        ReferralModel.status == "completed"
-    ).count()
-    
-    # Get total interactions (engagements)
-    total_engagements = db.query(InteractionModel).join(CustomerModel).filter(
-        CustomerModel.user_id == user_id
-    ).count()
+    total_customers, total_referrals, completed_referrals, total_engagements = db.execute(select(
+        count(CustomerModel.id, CustomerModel.user_id == user_id),
+        count(ReferralModel.id, ReferralModel.user_id == user_id),
+        count(ReferralModel.id, ReferralModel.user_id == user_id, ReferralModel.status == "completed"),
+        count(InteractionModel.id, InteractionModel.customer_id == CustomerModel.id, CustomerModel.user_id == user_id)
+    )).one()
     
     # Calculate engagement rate
     engagement_rate = (total_engagements / (total_customers + 1)) * 100 if total_customers > 0 else 0
@@ -33,7 +29,7 @@ def get_dashboard_metrics(user_id: int, db: Session = Depends(get_db)) -> Dict[s
     # Get recent activities
     recent_activities = get_recent_activities(user_id, db)
     
-    return {
+    metrics = {
         "total_customers": total_customers,
         "total_referrals": total_referrals,
         "completed_referrals": completed_referrals,
@@ -41,47 +37,95 @@ def get_dashboard_metrics(user_id: int, db: Session = Depends(get_db)) -> Dict[s
         "total_engagements": total_engagements,
         "recent_activities": recent_activities
     }
-
-def get_recent_activities(user_id: int, db: Session) -> List[Dict[str, Any]]:
-    """Get recent activities for the dashboard"""
-    activities = []
     
-    # Recent customer additions
-    recent_customers = db.query(CustomerModel).filter(
-        CustomerModel.user_id == user_id
-    ).order_by(desc(CustomerModel.id)).limit(3).all()
+    # Optional activity summary for the last `days` days, read from the daily rollups
+    if days is not None:
+        try:
+            start, end = resolve_date_range(days)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        totals = daily_metrics_totals(db, user_id, start, end)
+        metrics["period"] = {
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            "customers_added": totals["customers_added"],
+            "messages_sent": sum(totals[f"messages_{platform}"] for platform in PLATFORMS) + totals["messages_other"],
+            "messages_received": totals["messages_received"],
+            "referrals_completed": totals["referrals_completed"],
+            "rewards_earned": totals["rewards_earned"]
+        }
     
-    for customer in recent_customers:
-        activities.append({
-            "action": f"New customer added: {customer.name}",
-            "time": "Recently",
-            "type": "customer"
-        })
+    return metrics
+
+@router.get("/timeseries")
+def get_metrics_timeseries(
+    user_id: int,
+    days: int = 90,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """Get daily metrics for a date range (one rollup row per day)"""
+    try:
+        start, end = resolve_date_range(days, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "user_id": user_id,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "days": daily_metrics_series(db, user_id, start, end)
+    }
+
+def get_recent_activities(user_id: int, db: Session) -> List[Dict[str, Any]]:
+    """Get recent activities for the dashboard (one UNION ALL query)"""
+    no_timestamp = cast(null(), DateTime)
+    recent_customers = select(
+        literal(0).label("kind"), CustomerModel.id.label("id"), no_timestamp.label("ts"),
+        CustomerModel.name.label("detail")
+    ).where(CustomerModel.user_id == user_id).order_by(desc(CustomerModel.id)).limit(3)
     
-    # Recent referrals
-    recent_referrals = db.query(ReferralModel).filter(
+    recent_rewards = select(
+        literal(1).label("kind"), ReferralModel.id.label("id"), no_timestamp.label("ts"),
+        cast(ReferralModel.reward_points, String).label("detail")
+    ).where(
         ReferralModel.user_id == user_id,
         ReferralModel.status == "completed"
-    ).order_by(desc(ReferralModel.id)).limit(2).all()
+    ).order_by(desc(ReferralModel.id)).limit(2)
     
-    for referral in recent_referrals:
-        activities.append({
-            "action": f"Referral reward earned: ₹{referral.reward_points}",
-            "time": "Recently",
-            "type": "reward"
-        })
-    
-    # Recent interactions
-    recent_interactions = db.query(InteractionModel).join(CustomerModel).filter(
+    recent_interactions = select(
+        literal(2).label("kind"), InteractionModel.id.label("id"), InteractionModel.timestamp.label("ts"),
+        InteractionModel.message.label("detail")
+    ).join(CustomerModel, CustomerModel.id == InteractionModel.customer_id).where(
         CustomerModel.user_id == user_id
-    ).order_by(desc(InteractionModel.timestamp)).limit(2).all()
+    ).order_by(desc(InteractionModel.timestamp)).limit(2)
+    
+    # Each part keeps its own ORDER BY/LIMIT inside a subquery; UNION ALL itself is unordered
+    rows = db.execute(union_all(*[
+        select(*part.subquery().c) for part in (recent_customers, recent_rewards, recent_interactions)
+    ])).all()
+    rows.sort(key=lambda row: (row.kind, -(row.ts.timestamp() if row.ts else 0), -row.id))
     
-    for interaction in recent_interactions:
-        activities.append({
-            "action": f"Customer interaction: {interaction.message[:50]}...",
-            "time": "Recently",
-            "type": "interaction"
-        })
+    activities = []
+    for row in rows:
+        if row.kind == 0:
+            activities.append({
+                "action": f"New customer added: {row.detail}",
+                "time": "Recently",
+                "type": "customer"
+            })
+        elif row.kind == 1:
+            activities.append({
+                "action": f"Referral reward earned: ₹{row.detail}",
+                "time": "Recently",
+                "type": "reward"
+            })
+        else:
+            activities.append({
+                "action": f"Customer interaction: {row.detail[:50]}...",
+                "time": "Recently",
+                "type": "interaction"
+            })
     
     return activities[:6]  # Return max 6 activities
 
@@ -90,10 +134,16 @@ def get_reports(user_id: int, db: Session = Depends(get_db)) -> Dict[str, Any]:
     # This is a simplified report
     # In a real application, you would generate more detailed reports
     
-    customers = db.query(CustomerModel).filter(CustomerModel.user_id == user_id).all()
-    referrals = db.query(ReferralModel).filter(ReferralModel.user_id == user_id).all()
+    # Only the reported columns, as plain rows rather than ORM objects
+    customers = db.query(
+        CustomerModel.id, CustomerModel.name, CustomerModel.contact_info, CustomerModel.last_contacted
+    ).filter(CustomerModel.user_id == user_id).all()
+    referrals = db.query(
+        ReferralModel.id, ReferralModel.customer_id, ReferralModel.referred_by,
+        ReferralModel.status, ReferralModel.reward_points
+    ).filter(ReferralModel.user_id == user_id).all()
     
-    return {
+    report = {
         "customers": [
             {
                 "id": c.id,
@@ -113,4 +163,5 @@ def get_reports(user_id: int, db: Session = Depends(get_db)) -> Dict[str, Any]:
             }
             for r in referrals
         ]
-    }
\ No newline at end of file
+    }
+    return ORJSONResponse(report) if FAST_JSON else report
@@ -2,7 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database.database import get_db
 from app.models.models import User as UserModel
-from typing import Dict, Any, List
+from app.core.rollups import record_daily_metrics, daily_metrics_totals, optional_date_range
+from typing import Dict, Any, List, Optional
+from datetime import date
 import secrets
 import string
 
@@ -23,10 +25,17 @@ def get_website_info(user_id: int, db: Session = Depends(get_db)) -> Dict[str, A
         "status": "live",
         "template": "professional",
         "last_updated": "2024-01-15T10:30:00Z",
-        "views": 156,
+        "views": daily_metrics_totals(db, user_id)["website_views"],
         "leads": 12
     }
 
+@router.post("/website/{user_id}/view")
+def record_website_view(user_id: int, db: Session = Depends(get_db)) -> Dict[str, str]:
+    """Record a page view of a user's website"""
+    record_daily_metrics(db, user_id, website_views=1)
+    db.commit()
+    return {"status": "recorded"}
+
 @router.get("/templates")
 def get_website_templates() -> List[Dict[str, Any]]:
     """Get available website templates"""
@@ -135,16 +144,28 @@ def update_social_profile(
     }
 
 @router.get("/analytics/{user_id}")
-def get_digital_presence_analytics(user_id: int, db: Session = Depends(get_db)) -> Dict[str, Any]:
+def get_digital_presence_analytics(
+    user_id: int,
+    days: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
     """Get analytics for user's digital presence"""
     user = db.query(UserModel).filter(UserModel.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Mock analytics data
+    try:
+        start, end = optional_date_range(days, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    total_views = daily_metrics_totals(db, user_id, start, end)["website_views"]
+    
+    # Website views are recorded; the remaining figures are still mock data
     return {
         "website": {
-            "total_views": 1250,
+            "total_views": total_views,
             "unique_visitors": 890,
             "bounce_rate": 35.2,
             "avg_session_duration": "2m 45s",
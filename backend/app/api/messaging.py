@@ -1,13 +1,105 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import select, insert, update, literal, and_, or_
 from app.database.database import get_db
-from app.models.models import Customer as CustomerModel, Interaction as InteractionModel
-from typing import Dict, Any, List
-from datetime import datetime
+from app.models.models import Customer as CustomerModel, Interaction as InteractionModel, FollowUpPolicy
+from app.core.rollups import (
+    response_analytics, record_daily_metrics,
+    platform_column, daily_metrics_totals, optional_date_range, PLATFORMS
+)
+from app.core.pubsub import publish_event
+from app.core.follow_ups import resolve_policy, sent_on
+from app.core.serialization import parse_fields
+from typing import Dict, Any, List, Optional
+from datetime import datetime, date
+import base64
+import binascii
 import json
 
 router = APIRouter()
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Message fields a client can ask for with ?fields=, in response order
+MESSAGE_FIELDS = {
+    "id": lambda interaction: interaction.id,
+    "message": lambda interaction: interaction.message,
+    "sent_by": lambda interaction: interaction.sent_by,
+    "timestamp": lambda interaction: interaction.timestamp,
+    "is_from_user": lambda interaction: interaction.sent_by.startswith("user_"),
+}
+
+def _serialize_interaction(interaction: InteractionModel, fields: Optional[tuple] = None) -> Dict[str, Any]:
+    if fields is not None:
+        return {name: MESSAGE_FIELDS[name](interaction) for name in fields}
+    return {
+        "id": interaction.id,
+        "message": interaction.message,
+        "sent_by": interaction.sent_by,
+        "timestamp": interaction.timestamp,
+        "is_from_user": interaction.sent_by.startswith("user_")
+    }
+
+def _message_query(db: Session, customer_id: int, fields: Optional[tuple]):
+    """A conversation's interactions, loading only the columns the requested fields need"""
+    query = db.query(InteractionModel).filter(InteractionModel.customer_id == customer_id)
+    if fields is not None:
+        columns = {"sent_by" if name == "is_from_user" else name for name in fields}
+        # The id is always loaded: sync and history tokens are built from it
+        query = query.options(load_only(*(getattr(InteractionModel, column) for column in columns | {"id"})))
+    return query
+
+def encode_sync_token(customer_id: int, interaction_id: int) -> str:
+    raw = f"{customer_id}:{interaction_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_sync_token(token: str, customer_id: int) -> int:
+    """Return the interaction id a token points at; tokens are bound to one conversation"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        token_customer_id, interaction_id = (int(part) for part in raw.split(":"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    if token_customer_id != customer_id:
+        raise HTTPException(status_code=400, detail="Sync token belongs to another conversation")
+    return interaction_id
+
+def _check_page_size(limit: int) -> None:
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+def _get_owned_customer(db: Session, customer_id: int, user_id: int) -> CustomerModel:
+    customer = db.query(CustomerModel).filter(
+        CustomerModel.id == customer_id,
+        CustomerModel.user_id == user_id
+    ).first()
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return customer
+
+def _cursor_timestamp(customer_id: int, interaction_id: int):
+    # Compare against the stored value so the keyset matches the index ordering exactly
+    return select(InteractionModel.timestamp).where(
+        InteractionModel.id == interaction_id,
+        InteractionModel.customer_id == customer_id
+    ).scalar_subquery()
+
+def _check_cursor(db: Session, customer_id: int, interaction_id: int) -> None:
+    """An empty page after a cursor may mean the message it points at is gone:
+    the keyset then matches nothing, so the client must start over instead"""
+    timestamp = db.execute(
+        select(InteractionModel.timestamp).where(
+            InteractionModel.id == interaction_id,
+            InteractionModel.customer_id == customer_id
+        )
+    ).first()
+    if timestamp is None or timestamp[0] is None:
+        raise HTTPException(
+            status_code=410,
+            detail="The message this cursor points at no longer exists; reload the conversation"
+        )
+
 @router.post("/send")
 def send_message(
     message_data: Dict[str, Any],
@@ -42,9 +134,16 @@ def send_message(
     customer.last_contacted = datetime.utcnow()
     
     db.add(interaction)
+    record_daily_metrics(db, user_id, **{platform_column(platform): 1})
     db.commit()
     db.refresh(interaction)
     
+    publish_event(user_id, "message.sent", {
+        "customer_id": customer_id,
+        "platform": platform,
+        **_serialize_interaction(interaction)
+    })
+    
     # In a real app, you would integrate with WhatsApp Business API, SMS gateway, etc.
     return {
         "message": "Message sent successfully",
@@ -58,9 +157,11 @@ def send_message(
 def get_conversation(
     customer_id: int,
     user_id: int,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ) -> List[Dict[str, Any]]:
     """Get conversation history with a customer"""
+    selected = parse_fields(fields, list(MESSAGE_FIELDS))
     # Verify customer belongs to user
     customer = db.query(CustomerModel).filter(
         CustomerModel.id == customer_id,
@@ -70,20 +171,96 @@ def get_conversation(
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    interactions = db.query(InteractionModel).filter(
-        InteractionModel.customer_id == customer_id
-    ).order_by(InteractionModel.timestamp.asc()).all()
+    interactions = _message_query(db, customer_id, selected).order_by(InteractionModel.timestamp.asc()).all()
     
-    return [
-        {
-            "id": interaction.id,
-            "message": interaction.message,
-            "sent_by": interaction.sent_by,
-            "timestamp": interaction.timestamp,
-            "is_from_user": interaction.sent_by.startswith("user_")
-        }
-        for interaction in interactions
-    ]
+    return [_serialize_interaction(interaction, selected) for interaction in interactions]
+
+@router.get("/conversations/{customer_id}/sync")
+def sync_conversation(
+    customer_id: int,
+    user_id: int,
+    since: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """Get messages newer than a sync token (oldest first); poll with the returned token"""
+    _check_page_size(limit)
+    selected = parse_fields(fields, list(MESSAGE_FIELDS))
+    _get_owned_customer(db, customer_id, user_id)
+    
+    cursor_id = decode_sync_token(since, customer_id) if since else after_id
+    
+    # Keyset scan on (customer_id, timestamp, id): cost is proportional to new messages
+    query = _message_query(db, customer_id, selected)
+    if cursor_id is not None:
+        cursor_ts = _cursor_timestamp(customer_id, cursor_id)
+        query = query.filter(or_(
+            InteractionModel.timestamp > cursor_ts,
+            and_(InteractionModel.timestamp == cursor_ts, InteractionModel.id > cursor_id)
+        ))
+    interactions = query.order_by(
+        InteractionModel.timestamp.asc(), InteractionModel.id.asc()
+    ).limit(limit + 1).all()
+    
+    if not interactions and cursor_id is not None:
+        _check_cursor(db, customer_id, cursor_id)
+    
+    has_more = len(interactions) > limit
+    interactions = interactions[:limit]
+    
+    if interactions:
+        sync_token = encode_sync_token(customer_id, interactions[-1].id)
+    elif cursor_id is not None:
+        sync_token = encode_sync_token(customer_id, cursor_id)
+    else:
+        sync_token = None
+    
+    return {
+        "messages": [_serialize_interaction(interaction, selected) for interaction in interactions],
+        "sync_token": sync_token,
+        "has_more": has_more
+    }
+
+@router.get("/conversations/{customer_id}/history")
+def get_conversation_page(
+    customer_id: int,
+    user_id: int,
+    before: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """Get a page of messages newest first, paging backwards with the `before` cursor"""
+    _check_page_size(limit)
+    selected = parse_fields(fields, list(MESSAGE_FIELDS))
+    _get_owned_customer(db, customer_id, user_id)
+    
+    query = _message_query(db, customer_id, selected)
+    if before:
+        cursor_id = decode_sync_token(before, customer_id)
+        cursor_ts = _cursor_timestamp(customer_id, cursor_id)
+        query = query.filter(or_(
+            InteractionModel.timestamp < cursor_ts,
+            and_(InteractionModel.timestamp == cursor_ts, InteractionModel.id < cursor_id)
+        ))
+    interactions = query.order_by(
+        InteractionModel.timestamp.desc(), InteractionModel.id.desc()
+    ).limit(limit + 1).all()
+    if not interactions and before:
+        _check_cursor(db, customer_id, cursor_id)
+    
+    has_more = len(interactions) > limit
+    interactions = interactions[:limit]
+    
+    return {
+        "messages": [_serialize_interaction(interaction, selected) for interaction in interactions],
+        "before": encode_sync_token(customer_id, interactions[-1].id) if has_more else None,
+        # The first page also hands out the token to start delta sync from
+        "sync_token": encode_sync_token(customer_id, interactions[0].id) if interactions and not before else None,
+        "has_more": has_more
+    }
 
 @router.post("/bulk-message")
 def send_bulk_message(
@@ -99,45 +276,41 @@ def send_bulk_message(
     if not all([customer_ids, message, user_id]):
         raise HTTPException(status_code=400, detail="customer_ids, message, and user_id are required")
     
-    # Verify all customers belong to user
-    customers = db.query(CustomerModel).filter(
-        CustomerModel.id.in_(customer_ids),
-        CustomerModel.user_id == user_id
-    ).all()
+    # A fixed number of statements whatever the recipient count: one UPDATE
+    # that also proves ownership, one INSERT ... SELECT and the metrics upsert
+    owned = and_(CustomerModel.id.in_(customer_ids), CustomerModel.user_id == user_id)
+    sent_count = db.execute(
+        update(CustomerModel).where(owned).values(last_contacted=datetime.utcnow()),
+        execution_options={"synchronize_session": False}
+    ).rowcount
     
-    if len(customers) != len(customer_ids):
+    if sent_count != len(customer_ids):
+        db.rollback()
         raise HTTPException(status_code=400, detail="Some customers not found or don't belong to user")
     
-    sent_count = 0
-    failed_count = 0
-    interactions = []
-    
-    for customer in customers:
-        try:
-            # Create interaction record
-            interaction = InteractionModel(
-                customer_id=customer.id,
-                message=f"[BULK-{platform.upper()}] {message}",
-                sent_by=f"user_{user_id}"
-            )
-            
-            # Update customer's last contacted time
-            customer.last_contacted = datetime.utcnow()
-            
-            db.add(interaction)
-            interactions.append(interaction)
-            sent_count += 1
-            
-        except Exception as e:
-            failed_count += 1
-            continue
+    db.execute(insert(InteractionModel).from_select(
+        ["customer_id", "message", "sent_by"],
+        select(
+            CustomerModel.id,
+            literal(f"[BULK-{platform.upper()}] {message}"),
+            literal(f"user_{user_id}")
+        ).where(owned).order_by(CustomerModel.id)
+    ))
     
+    record_daily_metrics(db, user_id, **{platform_column(platform): sent_count})
     db.commit()
     
+    # One event for the whole batch; clients re-sync the conversations they have open
+    publish_event(user_id, "message.bulk_sent", {
+        "customer_ids": sorted(customer_ids),
+        "platform": platform,
+        "sent_count": sent_count
+    })
+    
     return {
         "message": f"Bulk message sent to {sent_count} customers",
         "sent_count": sent_count,
-        "failed_count": failed_count,
+        "failed_count": 0,
         "platform": platform,
         "timestamp": datetime.utcnow()
     }
@@ -214,29 +387,23 @@ def schedule_message(
     }
 
 @router.get("/analytics/{user_id}")
-def get_messaging_analytics(user_id: int, db: Session = Depends(get_db)) -> Dict[str, Any]:
-    """Get messaging analytics for a user"""
-    # Get total messages sent
-    total_messages = db.query(InteractionModel).join(CustomerModel).filter(
-        CustomerModel.user_id == user_id,
-        InteractionModel.sent_by.like(f"user_{user_id}%")
-    ).count()
-    
-    # Get messages by platform
-    whatsapp_messages = db.query(InteractionModel).join(CustomerModel).filter(
-        CustomerModel.user_id == user_id,
-        InteractionModel.message.like("[WHATSAPP]%")
-    ).count()
-    
-    sms_messages = db.query(InteractionModel).join(CustomerModel).filter(
-        CustomerModel.user_id == user_id,
-        InteractionModel.message.like("[SMS]%")
-    ).count()
+def get_messaging_analytics(
+    user_id: int,
+    days: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """Get messaging analytics for a user (all time unless a date range is given)"""
+    try:
+        start, end = optional_date_range(days, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    email_messages = db.query(InteractionModel).join(CustomerModel).filter(
-        CustomerModel.user_id == user_id,
-        InteractionModel.message.like("[EMAIL]%")
-    ).count()
+    # Message counts come from the daily rollups
+    totals = daily_metrics_totals(db, user_id, start, end)
+    platforms = {platform: totals[f"messages_{platform}"] for platform in PLATFORMS}
+    total_messages = sum(platforms.values()) + totals["messages_other"]
     
     # Get customers contacted
     customers_contacted = db.query(CustomerModel).filter(
@@ -244,14 +411,46 @@ def get_messaging_analytics(user_id: int, db: Session = Depends(get_db)) -> Dict
         CustomerModel.last_contacted.isnot(None)
     ).count()
     
+    # Response rate and time come from the daily response rollups, which the
+    # refresh_all_tenant_rollups beat task keeps current
+    responses = response_analytics(db, user_id, start, end)
+    
     return {
         "total_messages": total_messages,
         "customers_contacted": customers_contacted,
-        "platforms": {
-            "whatsapp": whatsapp_messages,
-            "sms": sms_messages,
-            "email": email_messages
-        },
-        "response_rate": 85.2,  # Mock data
-        "avg_response_time": "2h 15m"  # Mock data
+        "platforms": platforms,
+        "response_rate": responses["response_rate"],
+        "avg_response_time": responses["avg_response_time"]
     }
+
+@router.get("/follow-ups/{user_id}")
+def get_follow_up_policy(user_id: int, db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """Automated follow-up settings for a tenant, and how many were sent today"""
+    policy = resolve_policy(db.get(FollowUpPolicy, user_id))
+    return {**policy, "sent_today": sent_on(db, user_id, datetime.utcnow().date())}
+
+@router.put("/follow-ups/{user_id}")
+def update_follow_up_policy(user_id: int, settings: Dict[str, Any], db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """Change a tenant's follow-up settings, e.g. {"stale_days": 14, "daily_cap": 20}; null restores a default"""
+    unknown = set(settings) - {"enabled", "stale_days", "daily_cap", "message"}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown settings: {', '.join(sorted(unknown))}")
+    if "enabled" in settings and not isinstance(settings["enabled"], (bool, type(None))):
+        raise HTTPException(status_code=400, detail="enabled must be true or false")
+    for name, minimum in (("stale_days", 1), ("daily_cap", 0)):
+        value = settings.get(name)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < minimum):
+            raise HTTPException(status_code=400, detail=f"{name} must be an integer of at least {minimum}")
+    message = settings.get("message")
+    if message is not None and (not isinstance(message, str) or not message.strip() or len(message) > 1000):
+        raise HTTPException(status_code=400, detail="message must be 1 to 1000 characters")
+    
+    policy = db.get(FollowUpPolicy, user_id)
+    if policy is None:
+        policy = FollowUpPolicy(user_id=user_id)
+        db.add(policy)
+    for name, value in settings.items():
+        setattr(policy, name, value)
+    policy.updated_at = datetime.utcnow()
+    db.commit()
+    return get_follow_up_policy(user_id, db)
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.core.pubsub import get_broker, tenant_topic, SubscriptionClosed
+import asyncio
+
+router = APIRouter()
+
+# Comment lines keep idle SSE connections open through proxies
+HEARTBEAT_SECONDS = 15
+# WebSocket close code for "try again later", sent to slow consumers
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+@router.get("/events")
+async def stream_events(user_id: int):
+    """Server-sent events stream of a tenant's conversation and dashboard updates"""
+    subscription = get_broker().subscribe(tenant_topic(user_id))
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                except SubscriptionClosed:
+                    return
+                yield f"data: {message}\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/ws")
+async def websocket_events(websocket: WebSocket, user_id: int):
+    """WebSocket push of a tenant's conversation and dashboard updates"""
+    await websocket.accept()
+    subscription = get_broker().subscribe(tenant_topic(user_id))
+
+    async def watch_disconnect():
+        # Client frames are ignored; this only notices the socket closing
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+        finally:
+            subscription.close("client_disconnected")
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        async for message in subscription:
+            await websocket.send_text(message)
+        if subscription.close_reason == "slow_consumer":
+            await websocket.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="slow consumer")
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        subscription.close()
+        watcher.cancel()
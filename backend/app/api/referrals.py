@@ -1,21 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from app.database.database import get_db
+from app.database.database import get_db, tenant_criteria
 from app.models.models import Referral as ReferralModel, Customer as CustomerModel
 from app.schemas.schemas import ReferralCreate, ReferralUpdate, Referral as ReferralSchema
-from typing import List, Dict, Any
+from app.core.rollups import record_daily_metrics, referral_deltas, merge_deltas, daily_metrics_totals, optional_date_range
+from app.core.pubsub import publish_event
+from app.core.serialization import FAST_JSON, RowSerializer
+from typing import List, Dict, Any, Optional
+from datetime import date
 import secrets
 import string
 
 router = APIRouter()
 
+REFERRAL_ROWS = RowSerializer(ReferralSchema)
+
+def _referral_event(referral: ReferralModel) -> Dict[str, Any]:
+    return {
+        "referral_id": referral.id,
+        "customer_id": referral.customer_id,
+        "status": referral.status,
+        "reward_points": referral.reward_points
+    }
+
 @router.post("/", response_model=ReferralSchema)
 def create_referral(referral: ReferralCreate, db: Session = Depends(get_db)):
     db_referral = ReferralModel(**referral.dict())
     db.add(db_referral)
+    record_daily_metrics(db, referral.user_id, **referral_deltas(referral.status, referral.reward_points))
     db.commit()
     db.refresh(db_referral)
+    publish_event(db_referral.user_id, "referral.created", _referral_event(db_referral))
     return db_referral
 
 @router.get("/", response_model=List[ReferralSchema])
@@ -23,42 +39,57 @@ def get_referrals(
     user_id: int,
     skip: int = 0,
     limit: int = 100,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    referrals = db.query(ReferralModel).filter(ReferralModel.user_id == user_id).offset(skip).limit(limit).all()
+    rows = REFERRAL_ROWS.only(fields)
+    query = db.query(ReferralModel).filter(ReferralModel.user_id == user_id)
+    if FAST_JSON or fields is not None:
+        return rows.response(query.with_entities(*rows.columns(ReferralModel)).offset(skip).limit(limit))
+    referrals = query.offset(skip).limit(limit).all()
     return referrals
 
 @router.get("/stats")
-def get_referral_stats(user_id: int, db: Session = Depends(get_db)) -> Dict[str, Any]:
-    """Get referral statistics for a user"""
-    total_referrals = db.query(ReferralModel).filter(ReferralModel.user_id == user_id).count()
-    completed_referrals = db.query(ReferralModel).filter(
-        ReferralModel.user_id == user_id,
-        ReferralModel.status == "completed"
-    ).count()
-    pending_referrals = db.query(ReferralModel).filter(
-        ReferralModel.user_id == user_id,
-        ReferralModel.status == "pending"
-    ).count()
+def get_referral_stats(
+    user_id: int,
+    days: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """Get referral statistics for a user (all time unless a date range is given)"""
+    try:
+        start, end = optional_date_range(days, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    total_earnings = db.query(func.sum(ReferralModel.reward_points)).filter(
-        ReferralModel.user_id == user_id,
-        ReferralModel.status == "completed"
-    ).scalar() or 0
+    # Counts come from the daily rollups, keyed by the day each referral was created
+    totals = daily_metrics_totals(db, user_id, start, end)
+    completed_referrals = totals["referrals_completed"]
+    pending_referrals = totals["referrals_pending"]
+    total_referrals = (
+        pending_referrals + completed_referrals + totals["referrals_accepted"] + totals["referrals_other"]
+    )
+    total_earnings = totals["rewards_earned"]
+    
+    # Tiers are always based on all-time completed referrals
+    all_time_completed = completed_referrals
+    if start is not None:
+        all_time_completed = daily_metrics_totals(db, user_id)["referrals_completed"]
     
     # Calculate tier based on completed referrals
     current_tier = "Bronze"
     next_tier_progress = 0
     
-    if completed_referrals >= 50:
+    if all_time_completed >= 50:
         current_tier = "Gold"
         next_tier_progress = 100
-    elif completed_referrals >= 20:
+    elif all_time_completed >= 20:
         current_tier = "Silver"
-        next_tier_progress = (completed_referrals - 20) / 30 * 100
+        next_tier_progress = (all_time_completed - 20) / 30 * 100
     else:
         current_tier = "Bronze"
-        next_tier_progress = completed_referrals / 20 * 100
+        next_tier_progress = all_time_completed / 20 * 100
     
     return {
         "total_referrals": total_referrals,
@@ -85,13 +116,17 @@ def get_referral_link(user_id: int) -> Dict[str, str]:
 def get_rewards(
     user_id: int,
     status: str = "completed",
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
+    rows = REFERRAL_ROWS.only(fields)
     referrals = db.query(ReferralModel).filter(
         ReferralModel.user_id == user_id,
         ReferralModel.status == status
-    ).all()
-    return referrals
+    )
+    if FAST_JSON or fields is not None:
+        return rows.response(referrals.with_entities(*rows.columns(ReferralModel)))
+    return referrals.all()
 
 @router.put("/{referral_id}", response_model=ReferralSchema)
 def update_referral(
@@ -99,13 +134,25 @@ def update_referral(
     referral: ReferralUpdate,
     db: Session = Depends(get_db)
 ):
-    db_referral = db.query(ReferralModel).filter(ReferralModel.id == referral_id).first()
+    db_referral = db.query(ReferralModel).filter(
+        ReferralModel.id == referral_id, *tenant_criteria(db, ReferralModel.user_id)
+    ).first()
     if not db_referral:
         raise HTTPException(status_code=404, detail="Referral not found")
     
+    previous = referral_deltas(db_referral.status, db_referral.reward_points, sign=-1)
+    
     for key, value in referral.dict().items():
         setattr(db_referral, key, value)
     
+    # Referral metrics are kept on the day the referral was created
+    created_day = db_referral.created_at.date() if db_referral.created_at else None
+    record_daily_metrics(
+        db, db_referral.user_id, created_day,
+        **merge_deltas(previous, referral_deltas(db_referral.status, db_referral.reward_points))
+    )
+    
     db.commit()
     db.refresh(db_referral)
+    publish_event(db_referral.user_id, "referral.updated", _referral_event(db_referral))
     return db_referral
\ No newline at end of file
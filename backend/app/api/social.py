@@ -1,10 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.database.database import get_db
-from app.models.models import SocialAccount
+from app.database.database import get_db, tenant_criteria
+from app.models.models import SocialAccount as SocialAccountModel
 from app.schemas.schemas import SocialAccountCreate, SocialAccountUpdate, SocialAccount
 from typing import List
-from app.core.celery_app import process_social_media_post
 
 router = APIRouter()
 
@@ -17,7 +16,7 @@ def connect_social_account(account: SocialAccountCreate, db: Session = Depends(g
     # 4. Store the tokens securely
     
     # For now, we'll just store the provided account info
-    db_account = SocialAccount(**account.dict())
+    db_account = SocialAccountModel(**account.dict())
     db.add(db_account)
     db.commit()
     db.refresh(db_account)
@@ -25,7 +24,7 @@ def connect_social_account(account: SocialAccountCreate, db: Session = Depends(g
 
 @router.get("/accounts", response_model=List[SocialAccount])
 def get_social_accounts(user_id: int, db: Session = Depends(get_db)):
-    accounts = db.query(SocialAccount).filter(SocialAccount.user_id == user_id).all()
+    accounts = db.query(SocialAccountModel).filter(SocialAccountModel.user_id == user_id).all()
     return accounts
 
 @router.post("/refresh/{account_id}")
@@ -34,7 +33,9 @@ def refresh_token(account_id: int, db: Session = Depends(get_db)):
     # 1. Use the refresh token to get a new access token
     # 2. Update the stored tokens
     
-    db_account = db.query(SocialAccount).filter(SocialAccount.id == account_id).first()
+    db_account = db.query(SocialAccountModel).filter(
+        SocialAccountModel.id == account_id, *tenant_criteria(db, SocialAccountModel.user_id)
+    ).first()
     if not db_account:
         raise HTTPException(status_code=404, detail="Social account not found")
     
@@ -43,7 +44,8 @@ def refresh_token(account_id: int, db: Session = Depends(get_db)):
 
 @router.post("/post/{user_id}/{platform}")
 def schedule_social_post(user_id: int, platform: str, content: str):
-    # Schedule social media post as a background task
+    # Schedule social media post as a background task (Celery is only imported when a post is scheduled)
+    from app.core.celery_app import process_social_media_post
     process_social_media_post.delay(user_id, platform, content)
     
     return {
@@ -53,7 +55,9 @@ def schedule_social_post(user_id: int, platform: str, content: str):
 
 @router.delete("/disconnect/{account_id}")
 def disconnect_social_account(account_id: int, db: Session = Depends(get_db)):
-    db_account = db.query(SocialAccount).filter(SocialAccount.id == account_id).first()
+    db_account = db.query(SocialAccountModel).filter(
+        SocialAccountModel.id == account_id, *tenant_criteria(db, SocialAccountModel.user_id)
+    ).first()
     if not db_account:
         raise HTTPException(status_code=404, detail="Social account not found")
     
@@ -1,14 +1,61 @@
 from celery import Celery
+import functools
 import os
 from dotenv import load_dotenv
+from kombu import Queue
+from typing import Callable, Dict, List, Optional, Sequence
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.database.database import shards
+from app.models.models import User as UserModel
+from app.core.scoring import refresh_stale_scores
+from app.core.segmentation import refresh_stale_segments
+from app.core.rollups import refresh_response_rollups, rebuild_daily_metrics
+from app.core.follow_ups import sweep_stale_customers
+from datetime import datetime, timedelta
 
 load_dotenv()
 
-celery_app = Celery(
-    "micro_entrepreneur_app",
-    broker=os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"),
-    backend=os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
-)
+# redis (default), memory (in-process broker, for local load tests without Redis)
+# or eager (tasks run inline in the caller)
+CELERY_MODE = os.getenv("CELERY_MODE", "redis")
+
+# Interactive work (single notifications, posts) never waits behind a campaign:
+# run separate workers per queue, e.g. `celery -A celery_worker worker -Q interactive`
+# and `celery -A celery_worker worker -Q bulk`
+INTERACTIVE_QUEUE = "interactive"
+BULK_QUEUE = "bulk"
+
+# Items processed per bulk task invocation
+BULK_CHUNK_SIZE = int(os.getenv("CELERY_BULK_CHUNK_SIZE", "500"))
+
+# Follow-up sweep (run by `celery -A celery_worker beat`): how often, and how many
+# tenants per run on each shard (0 = all; a limited run resumes where it stopped)
+FOLLOW_UP_SWEEP_MINUTES = float(os.getenv("FOLLOW_UP_SWEEP_MINUTES", "60"))
+FOLLOW_UP_SWEEP_TENANTS = int(os.getenv("FOLLOW_UP_SWEEP_TENANTS", "0"))
+
+# Periodic rescoring and re-segmentation of every tenant (beat), so time-driven
+# scores and segments stay current for tenants with no new interactions
+SCORE_REFRESH_MINUTES = float(os.getenv("SCORE_REFRESH_MINUTES", "60"))
+
+# How often beat folds every tenant's new interactions into the response rollups
+# behind /messaging/analytics
+ROLLUP_REFRESH_MINUTES = float(os.getenv("ROLLUP_REFRESH_MINUTES", "5"))
+
+if CELERY_MODE in ("memory", "eager"):
+    broker_url, result_backend = "memory://", "cache+memory://"
+else:
+    broker_url = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+    result_backend = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
+
+# Priority within a queue. Redis serves priority 0 first, AMQP brokers the
+# highest number first.
+if broker_url.startswith(("amqp", "pyamqp")):
+    URGENT, NORMAL, BACKGROUND = 9, 5, 0
+else:
+    URGENT, NORMAL, BACKGROUND = 0, 5, 9
+
+celery_app = Celery("micro_entrepreneur_app", broker=broker_url, backend=result_backend)
 
 celery_app.conf.update(
     task_serializer="json",
@@ -16,18 +63,90 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    task_queues=[
+        Queue(INTERACTIVE_QUEUE, queue_arguments={"x-max-priority": 10}),
+        Queue(BULK_QUEUE, queue_arguments={"x-max-priority": 10}),
+    ],
+    task_default_queue=INTERACTIVE_QUEUE,
+    task_default_priority=NORMAL,
+    task_routes={
+        "app.core.celery_app.send_follow_up_notification": {"queue": INTERACTIVE_QUEUE, "priority": URGENT},
+        "app.core.celery_app.process_social_media_post": {"queue": INTERACTIVE_QUEUE, "priority": NORMAL},
+        "app.core.celery_app.send_follow_up_notifications": {"queue": BULK_QUEUE, "priority": NORMAL},
+        "app.core.celery_app.refresh_*": {"queue": BULK_QUEUE, "priority": BACKGROUND},
+        "app.core.celery_app.catch_up_daily_metrics": {"queue": BULK_QUEUE, "priority": BACKGROUND},
+        "app.core.celery_app.sweep_follow_ups": {"queue": BULK_QUEUE, "priority": BACKGROUND},
+    },
+    beat_schedule={
+        "sweep-follow-ups": {
+            "task": "app.core.celery_app.sweep_follow_ups",
+            "schedule": FOLLOW_UP_SWEEP_MINUTES * 60,
+            "kwargs": {"max_tenants": FOLLOW_UP_SWEEP_TENANTS or None},
+            # A run still queued when the next one is due is dropped
+            "options": {"expires": FOLLOW_UP_SWEEP_MINUTES * 60},
+        },
+        "refresh-all-customer-scores": {
+            "task": "app.core.celery_app.refresh_all_customer_scores",
+            "schedule": SCORE_REFRESH_MINUTES * 60,
+            "options": {"expires": SCORE_REFRESH_MINUTES * 60},
+        },
+        "refresh-all-tenant-rollups": {
+            "task": "app.core.celery_app.refresh_all_tenant_rollups",
+            "schedule": ROLLUP_REFRESH_MINUTES * 60,
+            "options": {"expires": ROLLUP_REFRESH_MINUTES * 60},
+        },
+        "refresh-all-customer-segments": {
+            "task": "app.core.celery_app.refresh_all_customer_segments",
+            "schedule": SCORE_REFRESH_MINUTES * 60,
+            "options": {"expires": SCORE_REFRESH_MINUTES * 60},
+        },
+    },
+    broker_transport_options={
+        "queue_order_strategy": "priority", "priority_steps": list(range(10)), "sep": ":",
+        # The in-memory broker is polled; its 1 s default would dominate a local load test
+        **({"polling_interval": 0.005} if CELERY_MODE == "memory" else {}),
+    },
+    # One message at a time per worker process, so priorities apply to what is
+    # still queued rather than to a prefetched backlog
+    worker_prefetch_multiplier=1,
+    # Nothing reads task results; a caller that waits on one passes ignore_result=False
+    task_ignore_result=True,
+    task_always_eager=CELERY_MODE == "eager",
+    task_eager_propagates=True,
 )
 
+def _send_follow_up(customer_name: str, message: str) -> None:
+    # This is a placeholder - in reality, you would send the actual notification
+    print(f"Sending follow-up to {customer_name}: {message}")
+
 @celery_app.task
 def send_follow_up_notification(customer_name: str, message: str):
     """
     Send a follow-up notification to a customer.
     In a real implementation, this would integrate with email/SMS/WhatsApp services.
     """
-    # This is a placeholder - in reality, you would send the actual notification
-    print(f"Sending follow-up to {customer_name}: {message}")
+    _send_follow_up(customer_name, message)
     return {"status": "sent", "customer": customer_name, "message": message}
 
+@celery_app.task
+def send_follow_up_notifications(notifications: List[List[str]]):
+    """
+    Batched send_follow_up_notification for campaigns: one invocation sends
+    a whole chunk of [customer_name, message] pairs from the bulk queue.
+    """
+    for customer_name, message in notifications:
+        _send_follow_up(customer_name, message)
+    return {"status": "sent", "count": len(notifications)}
+
+def enqueue_follow_ups(notifications: Sequence[Sequence[str]], chunk_size: int = 0) -> int:
+    """Queue (customer_name, message) pairs on the bulk queue in chunks; returns tasks queued"""
+    size = chunk_size or BULK_CHUNK_SIZE
+    chunks = [[list(item) for item in notifications[start:start + size]]
+              for start in range(0, len(notifications), size)]
+    for chunk in chunks:
+        send_follow_up_notifications.delay(chunk)
+    return len(chunks)
+
 @celery_app.task
 def process_social_media_post(user_id: int, platform: str, content: str):
     """
@@ -36,4 +155,108 @@ def process_social_media_post(user_id: int, platform: str, content: str):
     """
     # This is a placeholder - in reality, you would post to the social platform
     print(f"Posting to {platform} for user {user_id}: {content}")
-    return {"status": "posted", "platform": platform, "user_id": user_id}
\ No newline at end of file
+    return {"status": "posted", "platform": platform, "user_id": user_id}
+
+@celery_app.task
+def refresh_customer_scores(user_id: int):
+    """
+    Rescore the customers of a tenant whose interactions changed since the last run,
+    or whose scores have aged past SCORE_MAX_AGE_HOURS.
+    """
+    db = shards.session(user_id)
+    try:
+        scored = refresh_stale_scores(db, user_id)
+    finally:
+        db.close()
+    return {"status": "scored", "user_id": user_id, "customers": scored}
+
+def _for_each_tenant(refresh: Callable[[Session, int], int]) -> Dict[str, int]:
+    """Run refresh(db, user_id) for every tenant, on all shards at once; totals by shard"""
+    def run(db: Session) -> int:
+        total, last_user_id = 0, 0
+        while True:
+            user_ids = db.execute(
+                select(UserModel.id).where(UserModel.id > last_user_id).order_by(UserModel.id).limit(500)
+            ).scalars().all()
+            if not user_ids:
+                return total
+            last_user_id = user_ids[-1]
+            for user_id in sorted(shards.tenants_on(db.info["shard"], user_ids)):
+                total += refresh(db, user_id)
+    return shards.scatter_gather(run)
+
+@celery_app.task
+def refresh_all_customer_scores():
+    """
+    Rescore stale customers of every tenant: those with new interactions and
+    those whose scores have aged past SCORE_MAX_AGE_HOURS.
+    """
+    return {"status": "scored", "shards": _for_each_tenant(refresh_stale_scores)}
+
+@celery_app.task
+def refresh_customer_segments(user_id: int):
+    """
+    Re-assign segments for the customers of a tenant that received new interactions,
+    or whose segments have aged past SEGMENT_MAX_AGE_HOURS.
+    """
+    db = shards.session(user_id)
+    try:
+        assigned = refresh_stale_segments(db, user_id)
+    finally:
+        db.close()
+    return {"status": "segmented", "user_id": user_id, "customers": assigned}
+
+@celery_app.task
+def refresh_all_customer_segments():
+    """
+    Re-assign stale segments of every tenant, so time-driven transitions
+    (new to active, active to at_risk to dormant) happen without new interactions.
+    """
+    return {"status": "segmented", "shards": _for_each_tenant(refresh_stale_segments)}
+
+@celery_app.task
+def refresh_tenant_rollups(user_id: int):
+    """
+    Fold a tenant's new interactions into the daily analytics rollups.
+    """
+    db = shards.session(user_id)
+    try:
+        processed = refresh_response_rollups(db, user_id)
+    finally:
+        db.close()
+    return {"status": "rolled_up", "user_id": user_id, "interactions": processed}
+
+@celery_app.task
+def refresh_all_tenant_rollups():
+    """
+    Fold every tenant's settled new interactions into the daily response rollups.
+    """
+    return {"status": "rolled_up", "shards": _for_each_tenant(refresh_response_rollups)}
+
+@celery_app.task
+def catch_up_daily_metrics(user_id: int, days: int = 2):
+    """
+    Recompute the most recent days of a tenant's daily metrics from the raw tables,
+    repairing anything the write path missed.
+    """
+    end = datetime.utcnow().date()
+    db = shards.session(user_id)
+    try:
+        rebuilt = rebuild_daily_metrics(db, user_id, end - timedelta(days=days - 1), end)
+    finally:
+        db.close()
+    return {"status": "rebuilt", "user_id": user_id, "days": rebuilt}
+
+@celery_app.task
+def sweep_follow_ups(max_tenants: Optional[int] = None):
+    """
+    Queue follow-ups for customers not contacted within their tenant's threshold,
+    on every shard at once. Each shard resumes from its own checkpoint and only
+    sweeps the tenants placed on it.
+    """
+    def sweep(db):
+        return sweep_stale_customers(
+            db, enqueue_follow_ups, max_tenants=max_tenants,
+            placed_here=functools.partial(shards.tenants_on, db.info["shard"])
+        )
+    return {"status": "swept", "shards": shards.scatter_gather(sweep)}
@@ -0,0 +1,174 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, delete, func, extract
+from app.models.models import Customer as CustomerModel, Interaction as InteractionModel, CustomerContactHistogram
+from app.core.scoring import inbound_clause, chunked, format_hour_window
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+from datetime import datetime
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Histograms are 7 days x 24 hours of inbound message counts (UTC), day 0 = Sunday
+# to match SQL's day-of-week numbering. Stored as a fixed 336-byte uint16 blob.
+DAYS = 7
+HOURS = 24
+BUCKETS = DAYS * HOURS
+# NumPy is imported inside the functions that need it, so these stay plain values
+HISTOGRAM_DTYPE = "<u2"
+MAX_COUNT = 0xFFFF
+DAY_NAMES = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+
+# Customers processed per pass when rebuilding, bounding the dense matrix size
+REBUILD_CHUNK_SIZE = 20000
+WINDOW_HOURS = 2
+
+def encode_histogram(histogram: "np.ndarray") -> bytes:
+    import numpy as np
+    return np.minimum(histogram, MAX_COUNT).astype(HISTOGRAM_DTYPE).tobytes()
+
+def decode_histogram(blob: Optional[bytes]) -> "np.ndarray":
+    import numpy as np
+    if not blob:
+        return np.zeros((DAYS, HOURS), dtype=HISTOGRAM_DTYPE)
+    return np.frombuffer(blob, dtype=HISTOGRAM_DTYPE).reshape(DAYS, HOURS).copy()
+
+def bucket_for(timestamp: datetime) -> tuple:
+    """(day, hour) bucket of a timestamp, Sunday = 0"""
+    return (timestamp.weekday() + 1) % 7, timestamp.hour
+
+def record_inbound_interaction(
+    db: Session,
+    customer_id: int,
+    user_id: int,
+    timestamp: Optional[datetime] = None
+) -> CustomerContactHistogram:
+    """O(1) histogram update for a single inbound interaction (caller commits)"""
+    timestamp = timestamp or datetime.utcnow()
+    row = db.get(CustomerContactHistogram, customer_id)
+    if row is None:
+        row = CustomerContactHistogram(customer_id=customer_id, user_id=user_id, total=0)
+        db.add(row)
+        # Sessions don't autoflush; make the new row visible to later calls in this transaction
+        db.flush()
+
+    histogram = decode_histogram(row.histogram)
+    day, hour = bucket_for(timestamp)
+    if histogram[day, hour] == MAX_COUNT:
+        # Halve everything instead of saturating so the shape keeps adapting
+        histogram >>= 1
+    histogram[day, hour] += 1
+
+    row.histogram = encode_histogram(histogram)
+    row.total = int(histogram.sum())
+    row.updated_at = datetime.utcnow()
+    return row
+
+def rebuild_histograms(db: Session, user_id: int, customer_ids: Optional[List[int]] = None) -> int:
+    """Rebuild histograms from the interactions table with a vectorized pass per chunk"""
+    import numpy as np
+    customer_query = select(CustomerModel.id).where(CustomerModel.user_id == user_id)
+    if customer_ids is not None:
+        customer_query = customer_query.where(CustomerModel.id.in_(customer_ids))
+    ids = db.execute(customer_query.order_by(CustomerModel.id)).scalars().all()
+
+    day = extract("dow", InteractionModel.timestamp)
+    hour = extract("hour", InteractionModel.timestamp)
+    now = datetime.utcnow()
+    rebuilt = 0
+
+    for chunk in chunked(ids, REBUILD_CHUNK_SIZE):
+        chunk_ids = np.array(chunk, dtype=np.int64)
+        stmt = select(
+            InteractionModel.customer_id, day, hour, func.count(InteractionModel.id)
+        ).where(
+            InteractionModel.customer_id.between(chunk[0], chunk[-1]),
+            InteractionModel.timestamp.isnot(None),
+            inbound_clause()
+        ).group_by(InteractionModel.customer_id, day, hour)
+
+        rows = np.array(
+            [tuple(row) for row in db.connection().execute(stmt)], dtype=np.int64
+        ).reshape(-1, 4)
+        # The id range can include other tenants' customers
+        rows = rows[np.isin(rows[:, 0], chunk_ids)]
+
+        matrix = np.zeros((len(chunk_ids), BUCKETS), dtype=np.int64)
+        idx = np.searchsorted(chunk_ids, rows[:, 0])
+        np.add.at(matrix, (idx, rows[:, 1] * HOURS + rows[:, 2]), rows[:, 3])
+
+        blobs = np.minimum(matrix, MAX_COUNT).astype(HISTOGRAM_DTYPE)
+        totals = blobs.sum(axis=1, dtype=np.int64)
+        has_data = totals > 0
+
+        for id_chunk in chunked(chunk):
+            db.execute(delete(CustomerContactHistogram).where(CustomerContactHistogram.customer_id.in_(id_chunk)))
+        mappings = [
+            {
+                "customer_id": customer_id,
+                "user_id": user_id,
+                "histogram": blob.tobytes(),
+                "total": total,
+                "updated_at": now,
+            }
+            for customer_id, blob, total in zip(
+                chunk_ids[has_data].tolist(), blobs[has_data], totals[has_data].tolist()
+            )
+        ]
+        if mappings:
+            db.execute(insert(CustomerContactHistogram.__table__), mappings)
+        rebuilt += len(mappings)
+
+    db.commit()
+    return rebuilt
+
+def best_contact_times(db: Session, user_id: int, customer_ids: List[int]) -> List[Dict[str, Any]]:
+    """Best contact window for many customers at once, in the order requested"""
+    import numpy as np
+    found_ids = []
+    blobs = []
+    for chunk in chunked(list(dict.fromkeys(customer_ids))):
+        rows = db.execute(
+            select(CustomerContactHistogram.customer_id, CustomerContactHistogram.histogram).where(
+                CustomerContactHistogram.customer_id.in_(chunk),
+                CustomerContactHistogram.user_id == user_id
+            )
+        ).all()
+        for customer_id, blob in rows:
+            found_ids.append(customer_id)
+            blobs.append(blob)
+
+    results = {}
+    if blobs:
+        histograms = np.frombuffer(b"".join(blobs), dtype=HISTOGRAM_DTYPE).reshape(-1, DAYS, HOURS)
+        by_hour = histograms.sum(axis=1, dtype=np.int64)
+        # Count for a window starting at each hour, wrapping past midnight
+        windows = sum(np.roll(by_hour, -offset, axis=1) for offset in range(WINDOW_HOURS))
+        best_hours = windows.argmax(axis=1)
+        best_days = histograms.sum(axis=2, dtype=np.int64).argmax(axis=1)
+        totals = by_hour.sum(axis=1)
+        confidence = windows.max(axis=1) / np.maximum(totals, 1)
+
+        for customer_id, hour, weekday, total, share in zip(
+            found_ids, best_hours.tolist(), best_days.tolist(), totals.tolist(), confidence.tolist()
+        ):
+            if total:
+                results[customer_id] = {
+                    "customer_id": customer_id,
+                    "best_hour": hour,
+                    "best_day": DAY_NAMES[weekday],
+                    "best_contact_time": format_hour_window(hour, WINDOW_HOURS),
+                    "confidence": round(share, 3),
+                    "samples": total,
+                }
+
+    return [
+        results.get(customer_id, {
+            "customer_id": customer_id,
+            "best_hour": None,
+            "best_day": None,
+            "best_contact_time": None,
+            "confidence": 0.0,
+            "samples": 0,
+        })
+        for customer_id in customer_ids
+    ]
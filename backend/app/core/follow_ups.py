@@ -0,0 +1,181 @@
+"""Automated follow-ups for customers nobody has contacted in a while.
+
+A sweep walks tenants in id order. For each one it reads the stale customers
+straight off ix_customers_user_last_contacted: a range scan in last_contacted
+order that stops at the tenant's remaining daily cap. Their last_contacted
+is bumped in the same transaction that advances the checkpoint, and their
+follow-ups are queued in chunks once that commits. Memory is bounded by a
+page of tenant ids and one tenant's cap. A sweep that is cut short (or
+limited with max_tenants) resumes after the last tenant it finished.
+"""
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from app.models.models import (
+    Customer as CustomerModel, User as UserModel, FollowUpPolicy, FollowUpDailyCount, FollowUpCheckpoint
+)
+from app.core.rollups import insert_missing, upsert_increment
+from app.core.scoring import chunked
+
+# Defaults for tenants without their own follow_up_policies row
+FOLLOW_UP_STALE_DAYS = int(os.getenv("FOLLOW_UP_STALE_DAYS", "30"))
+FOLLOW_UP_DAILY_CAP = int(os.getenv("FOLLOW_UP_DAILY_CAP", "50"))
+FOLLOW_UP_MESSAGE = os.getenv(
+    "FOLLOW_UP_MESSAGE", "Hi {customer_name}, it's been a while! Is there anything we can help you with?"
+)
+
+# A sweep holding the checkpoint without advancing it for this long is presumed
+# dead, and another worker may resume it
+FOLLOW_UP_LEASE_SECONDS = int(os.getenv("FOLLOW_UP_LEASE_SECONDS", "600"))
+
+SWEEP_NAME = "follow_ups"
+TENANT_PAGE_SIZE = 500
+CUSTOMER_PAGE_SIZE = 1000
+
+# Queues (customer_name, message) pairs; see app.core.celery_app.enqueue_follow_ups
+Enqueue = Callable[[Sequence[Tuple[str, str]]], int]
+
+def resolve_policy(policy: Optional[FollowUpPolicy]) -> Dict[str, Any]:
+    """A tenant's effective settings, falling back to the FOLLOW_UP_* defaults"""
+    def pick(value, default):
+        return default if value is None else value
+    return {
+        "enabled": pick(policy and policy.enabled, True),
+        "stale_days": pick(policy and policy.stale_days, FOLLOW_UP_STALE_DAYS),
+        "daily_cap": pick(policy and policy.daily_cap, FOLLOW_UP_DAILY_CAP),
+        "message": pick(policy and policy.message, FOLLOW_UP_MESSAGE),
+    }
+
+def render_message(template: str, customer_name: Optional[str]) -> str:
+    # Plain replacement: a tenant's template may contain other braces
+    return template.replace("{customer_name}", customer_name or "there")
+
+def _claim(db: Session, now: datetime) -> Optional[Tuple[datetime, int]]:
+    """Lock the sweep checkpoint, starting a new sweep if the last one finished.
+    Returns (started_at, last_user_id), or None while another worker holds it."""
+    table = FollowUpCheckpoint.__table__
+    clock = datetime.utcnow()  # locks use the real clock whatever `now` the sweep is run for
+    # Two first-ever sweeps may both get here: one row is created, and the update decides
+    insert_missing(db, table, {"name": SWEEP_NAME, "started_at": now, "last_user_id": 0})
+    claimed = db.execute(
+        update(table)
+        .where(table.c.name == SWEEP_NAME)
+        .where(table.c.locked_at.is_(None) | (table.c.locked_at < clock - timedelta(seconds=FOLLOW_UP_LEASE_SECONDS)))
+        .values(locked_at=clock)
+    ).rowcount
+    db.commit()
+    if not claimed:
+        return None
+    checkpoint = db.get(FollowUpCheckpoint, SWEEP_NAME)
+    db.refresh(checkpoint)
+    if checkpoint.finished_at is not None:
+        checkpoint.started_at, checkpoint.last_user_id, checkpoint.finished_at = now, 0, None
+        db.commit()
+    return checkpoint.started_at, checkpoint.last_user_id
+
+def _advance(db: Session, last_user_id: int, now: datetime, release: bool = False, finished: bool = False) -> None:
+    table = FollowUpCheckpoint.__table__
+    db.execute(update(table).where(table.c.name == SWEEP_NAME).values(
+        last_user_id=last_user_id,
+        locked_at=None if release else datetime.utcnow(),
+        **({"finished_at": now} if finished else {})
+    ))
+
+def sent_on(db: Session, user_id: int, day: date) -> int:
+    count = db.get(FollowUpDailyCount, (user_id, day))
+    return count.sent if count else 0
+
+def stale_customers(db: Session, user_id: int, cutoff: datetime, limit: int) -> List[Tuple[int, str]]:
+    """(id, name) of a tenant's customers last contacted before `cutoff`, longest-waiting first"""
+    return db.execute(
+        select(CustomerModel.id, CustomerModel.name)
+        .where(CustomerModel.user_id == user_id, CustomerModel.last_contacted < cutoff)
+        .order_by(CustomerModel.last_contacted, CustomerModel.id)
+        .limit(limit)
+    ).all()
+
+def sweep_stale_customers(
+    db: Session,
+    enqueue: Enqueue,
+    now: Optional[datetime] = None,
+    max_tenants: Optional[int] = None,
+    placed_here: Optional[Callable[[List[int]], Set[int]]] = None
+) -> Dict[str, Any]:
+    """Queue follow-ups for every tenant's stale customers, within each tenant's daily cap.
+
+    On a shard, `placed_here` picks the tenants from a page of user ids that
+    live there (see ShardRouter.tenants_on); the others are left to their own shard.
+    Customers never contacted (last_contacted is NULL) are not followed up.
+    Delivery is at most once: customers are marked contacted before their
+    follow-ups are queued, so a failed enqueue is not retried by the next sweep.
+    """
+    now = now or datetime.utcnow()
+    stats = {"tenants": 0, "customers": 0, "tasks": 0, "finished": False, "skipped": False}
+    claim = _claim(db, now)
+    if claim is None:
+        stats["skipped"] = True
+        return stats
+    started_at, last_user_id = claim
+    today = now.date()
+
+    while max_tenants is None or stats["tenants"] < max_tenants:
+        page_size = TENANT_PAGE_SIZE if max_tenants is None else min(TENANT_PAGE_SIZE, max_tenants - stats["tenants"])
+        user_ids = db.execute(
+            select(UserModel.id).where(UserModel.id > last_user_id).order_by(UserModel.id).limit(page_size)
+        ).scalars().all()
+        if not user_ids:
+            stats["finished"] = True
+            break
+        local = set(user_ids) if placed_here is None else placed_here(user_ids)
+
+        policies = {
+            policy.user_id: policy
+            for policy in db.query(FollowUpPolicy).filter(FollowUpPolicy.user_id.in_(user_ids))
+        }
+        sent_today = dict(db.execute(
+            select(FollowUpDailyCount.user_id, FollowUpDailyCount.sent)
+            .where(FollowUpDailyCount.day == today, FollowUpDailyCount.user_id.in_(user_ids))
+        ).all())
+
+        for user_id in user_ids:
+            stats["tenants"] += 1
+            last_user_id = user_id
+            if user_id not in local:
+                continue
+            policy = resolve_policy(policies.get(user_id))
+            remaining = policy["daily_cap"] - (sent_today.get(user_id) or 0)
+            if not policy["enabled"] or remaining <= 0:
+                continue
+            cutoff = started_at - timedelta(days=policy["stale_days"])
+            due = []
+            while remaining > 0:
+                limit = min(remaining, CUSTOMER_PAGE_SIZE)
+                page = stale_customers(db, user_id, cutoff, limit)
+                if not page:
+                    break
+                # Bumped as each page is read, so the next page starts past it
+                for ids in chunked([customer_id for customer_id, _ in page]):
+                    db.execute(
+                        update(CustomerModel).where(CustomerModel.id.in_(ids)).values(last_contacted=now),
+                        execution_options={"synchronize_session": False}
+                    )
+                due.extend((name, render_message(policy["message"], name)) for _, name in page)
+                remaining -= len(page)
+                if len(page) < limit:
+                    break
+            if not due:
+                continue
+            upsert_increment(db, FollowUpDailyCount.__table__, {"user_id": user_id, "day": today}, {"sent": len(due)})
+            _advance(db, user_id, now)
+            db.commit()
+            stats["tasks"] += enqueue(due)
+            stats["customers"] += len(due)
+
+        _advance(db, last_user_id, now)
+        db.commit()
+
+    _advance(db, last_user_id, now, release=True, finished=stats["finished"])
+    db.commit()
+    return stats
@@ -0,0 +1,28 @@
+import asyncio
+import weakref
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+
+# Outbound calls (Gemini) share one pooled client per event loop, so warm
+# requests and warm serverless invocations reuse TLS connections instead of
+# handshaking every time. Clients are created on first use.
+UPSTREAM_TIMEOUT = 30.0
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def get_http_client() -> "httpx.AsyncClient":
+    """The running loop's shared client; connections belong to the loop, so loops never share one"""
+    import httpx
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT)
+        _clients[loop] = client
+    return client
+
+async def close_http_client() -> None:
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,125 @@
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Iterable, List, Optional, Sequence
+from starlette.routing import BaseRoute, Match, NoMatchFound
+
+try:
+    from starlette.routing import get_route_path
+except ImportError:  # older Starlette matches on the raw path
+    def get_route_path(scope) -> str:
+        return scope["path"]
+
+logger = logging.getLogger("app.startup")
+
+# Routers are imported on the first request under their prefix unless this is false
+LAZY_ROUTERS = os.getenv("LAZY_ROUTERS", "true").lower() != "false"
+# "background" pre-imports routers and heavy dependencies on a thread after startup; "off" disables it
+WARM_UP = os.getenv("WARM_UP", "background").lower()
+
+# Optional or expensive modules the warm-up pre-loads (missing ones are skipped)
+HEAVY_MODULES = ("numpy", "httpx", "bleach", "celery", "google.genai", "PIL.Image")
+
+class LazyRouter(BaseRoute):
+    """Stands in for an APIRouter until a request reaches its prefix.
+
+    On first match the router module is imported, its routes are included in
+    the app where the placeholder stood, and the request is dispatched again.
+    """
+
+    def __init__(self, app, module: str, prefix: str, tags: Optional[List[str]] = None):
+        self.app = app
+        self.module = module
+        self.prefix = prefix
+        self.tags = tags
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def matches(self, scope):
+        if scope["type"] in ("http", "websocket") and not self.loaded:
+            path = get_route_path(scope)
+            if path == self.prefix or path.startswith(self.prefix + "/"):
+                return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params):
+        raise NoMatchFound(name, path_params)
+
+    def load(self) -> None:
+        with self._lock:
+            if self.loaded:
+                return
+            start = time.perf_counter()
+            router = importlib.import_module(self.module).router
+            routes = self.app.router.routes
+            before = len(routes)
+            self.app.include_router(router, prefix=self.prefix, tags=self.tags)
+            added = routes[before:]
+            del routes[before:]
+            position = routes.index(self)
+            routes[position:position + 1] = added
+            self.loaded = True
+            logger.info("Loaded %s in %.1f ms", self.module, (time.perf_counter() - start) * 1000)
+
+    async def handle(self, scope, receive, send):
+        self.load()
+        await self.app.router(scope, receive, send)
+
+def include_routers(app, routers: Sequence[tuple], lazy: Optional[bool] = None) -> None:
+    """Include (module, prefix, tags) routers now, or as placeholders loaded on demand"""
+    if lazy is None:
+        lazy = LAZY_ROUTERS
+    placeholders = []
+    for module, prefix, tags in routers:
+        if lazy:
+            placeholder = LazyRouter(app, module, prefix, tags)
+            app.router.routes.append(placeholder)
+            placeholders.append(placeholder)
+        else:
+            app.include_router(importlib.import_module(module).router, prefix=prefix, tags=tags)
+    app.state.lazy_routers = placeholders
+
+    if placeholders:
+        # The schema must list every route, so generating it loads them all
+        build_openapi = app.openapi
+
+        def openapi():
+            load_routers(app)
+            return build_openapi()
+
+        app.openapi = openapi
+
+def load_routers(app) -> None:
+    for placeholder in getattr(app.state, "lazy_routers", ()):
+        placeholder.load()
+
+def preload(modules: Iterable[str]) -> None:
+    """Import modules for their side effect of being cached; failures are only logged"""
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError as exc:
+            logger.debug("Warm-up skipped %s: %s", name, exc)
+        except Exception:
+            logger.exception("Warm-up failed to import %s", name)
+
+def start_warm_up(app) -> Optional[threading.Thread]:
+    """Import router modules and heavy dependencies off the request path.
+
+    Only imports happen on the thread; routes are still included on the event
+    loop by the first request, which then finds the modules cached.
+    """
+    if WARM_UP == "off":
+        return None
+    modules = [placeholder.module for placeholder in getattr(app.state, "lazy_routers", ())]
+
+    def run():
+        start = time.perf_counter()
+        preload([*modules, *HEAVY_MODULES])
+        logger.info("Warm-up finished in %.1f ms", (time.perf_counter() - start) * 1000)
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
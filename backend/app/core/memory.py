@@ -0,0 +1,187 @@
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from app.core.metrics import registry as metrics_registry, route_label
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("app.memory")
+
+# Per-request memory guard: log the top allocation sites when a request grows past this
+MEMORY_GUARD_MB = float(os.getenv("MEMORY_GUARD_MB", "0"))
+MEMORY_TRACKING_ENABLED = os.getenv("MEMORY_TRACKING_ENABLED", "true").lower() != "false"
+MAX_SNAPSHOTS = 5
+TOP_ALLOCATIONS = 10
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_statm = {"pid": None, "fd": None}
+
+def current_rss() -> Optional[int]:
+    """Resident set size in bytes (Linux /proc; None where unavailable)"""
+    pid = os.getpid()
+    # /proc/self is resolved at open time, so re-open after a fork
+    if _statm["pid"] != pid:
+        try:
+            _statm["fd"] = os.open("/proc/self/statm", os.O_RDONLY)
+        except OSError:
+            _statm["fd"] = None
+        _statm["pid"] = pid
+    if _statm["fd"] is None:
+        return None
+    return int(os.pread(_statm["fd"], 64, 0).split()[1]) * _PAGE_SIZE
+
+def peak_rss() -> Optional[int]:
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def memory_status() -> Dict[str, Any]:
+    traced, traced_peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+    return {
+        "pid": os.getpid(),
+        "rss_bytes": current_rss(),
+        "peak_rss_bytes": peak_rss(),
+        "tracemalloc": {
+            "tracing": tracemalloc.is_tracing(),
+            "frames": tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else None,
+            "traced_bytes": traced,
+            "traced_peak_bytes": traced_peak,
+        },
+        "snapshots": snapshots.list(),
+        "guard_mb": MEMORY_GUARD_MB,
+    }
+
+def _filtered(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+def _stat_dict(stat) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    entry = {
+        "file": frame.filename,
+        "line": frame.lineno,
+        "size_bytes": stat.size,
+        "count": stat.count,
+    }
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_bytes"] = stat.size_diff
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+def top_allocations(snapshot: Optional[tracemalloc.Snapshot] = None, limit: int = TOP_ALLOCATIONS) -> List[Dict[str, Any]]:
+    snapshot = snapshot or _filtered(tracemalloc.take_snapshot())
+    return [_stat_dict(stat) for stat in snapshot.statistics("lineno")[:limit]]
+
+class SnapshotStore:
+    """The last few tracemalloc snapshots, kept in memory for diffing"""
+
+    def __init__(self, max_snapshots: int = MAX_SNAPSHOTS):
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def take(self, label: Optional[str] = None) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        snapshot = _filtered(tracemalloc.take_snapshot())
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            self._snapshots[snapshot_id] = (snapshot, label, time.time())
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return {"id": snapshot_id, "label": label, "top": top_allocations(snapshot)}
+
+    def get(self, snapshot_id: int) -> tracemalloc.Snapshot:
+        with self._lock:
+            if snapshot_id not in self._snapshots:
+                raise KeyError(snapshot_id)
+            return self._snapshots[snapshot_id][0]
+
+    def diff(self, base_id: int, target_id: int, limit: int = 20) -> List[Dict[str, Any]]:
+        stats = self.get(target_id).compare_to(self.get(base_id), "lineno")
+        return [_stat_dict(stat) for stat in stats[:limit]]
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"id": snapshot_id, "label": label, "taken_at": taken_at,
+                 "traced_bytes": sum(stat.size for stat in snapshot.statistics("filename"))}
+                for snapshot_id, (snapshot, label, taken_at) in self._snapshots.items()
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+
+snapshots = SnapshotStore()
+
+def start_tracing(frames: int = 10) -> None:
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    tracemalloc.start(frames)
+
+def stop_tracing() -> None:
+    # Snapshots keep their own copy of the traces and stay diffable
+    tracemalloc.stop()
+
+class MemoryMiddleware:
+    """Records per-route RSS growth (and peak traced allocations when tracemalloc runs).
+
+    Both measures are process-wide, so concurrent requests share the blame; the
+    guard therefore logs allocation sites rather than failing the request.
+    """
+
+    def __init__(self, app, registry=metrics_registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not MEMORY_TRACKING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        rss_before = current_rss()
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            labels = (scope["method"], route_label(scope))
+            growth = 0
+            if rss_before is not None:
+                growth = max(current_rss() - rss_before, 0)
+                self.registry.observe("http_request_rss_growth_bytes", labels, growth)
+            if tracing and tracemalloc.is_tracing():
+                allocated = max(tracemalloc.get_traced_memory()[1] - traced_before, 0)
+                self.registry.observe("http_request_alloc_peak_bytes", labels, allocated)
+                growth = max(growth, allocated)
+            if MEMORY_GUARD_MB and growth >= MEMORY_GUARD_MB * 1024 * 1024:
+                self._report(labels, growth)
+
+    def _report(self, labels, growth: int) -> None:
+        if tracemalloc.is_tracing():
+            sites = "; ".join(
+                f"{entry['file']}:{entry['line']} {entry['size_bytes'] / 1024:.0f} KiB"
+                for entry in top_allocations()
+            )
+        else:
+            sites = "start tracemalloc via /admin/memory/tracemalloc/start to see allocation sites"
+        logger.warning(
+            "Memory guard: %s %s grew %.1f MiB (limit %.0f MiB); top allocations: %s",
+            labels[0], labels[1], growth / 1024 / 1024, MEMORY_GUARD_MB, sites
+        )
@@ -0,0 +1,299 @@
+import bisect
+import contextvars
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Latency buckets in seconds (Prometheus "le" bounds; +Inf is implicit)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Memory buckets in bytes, 1 MiB to 1 GiB
+MEMORY_BUCKETS = tuple(float(2 ** power) for power in range(20, 31, 2))
+
+# With several uvicorn workers each process writes its samples here and /metrics merges them
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+# The same statement shape run this many times in one request is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() != "false"
+
+logger = logging.getLogger("app.sql")
+
+HISTOGRAMS = {
+    "http_request_duration_seconds": ("Request latency by route and status", ("method", "route", "status")),
+    "http_request_db_seconds": ("Time spent in database calls per request", ("method", "route")),
+    "upstream_request_duration_seconds": ("Latency of calls to external services", ("service", "outcome")),
+    "http_request_rss_growth_bytes": ("Resident memory growth while handling a request", ("method", "route")),
+    "http_request_alloc_peak_bytes": ("Peak traced Python allocations during a request", ("method", "route")),
+}
+# Histograms not measured in seconds
+HISTOGRAM_BUCKETS = {
+    "http_request_rss_growth_bytes": MEMORY_BUCKETS,
+    "http_request_alloc_peak_bytes": MEMORY_BUCKETS,
+}
+GAUGES = {
+    "http_requests_in_flight": ("Requests currently being handled", ("method",)),
+}
+
+class RequestMetrics:
+    """Per-request accumulators, reachable from any code running for the request"""
+    __slots__ = ("db_seconds", "db_queries", "statements")
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.statements: Dict[str, int] = {}
+
+    def record_statement(self, shape: str, elapsed: float) -> None:
+        self.db_seconds += elapsed
+        self.db_queries += 1
+        self.statements[shape] = self.statements.get(shape, 0) + 1
+
+    def repeated_statements(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        return [(shape, count) for shape, count in self.statements.items() if count >= threshold]
+
+    def server_timing(self, elapsed: float) -> bytes:
+        return (
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_queries} queries", '
+            f"app;dur={elapsed * 1000:.1f}"
+        ).encode()
+
+current_request: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar(
+    "current_request_metrics", default=None
+)
+
+class MetricsRegistry:
+    """Histograms and gauges kept as plain lists under one lock; recording is a bisect and a few adds"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_sets = {name: bounds for name, bounds in HISTOGRAM_BUCKETS.items()}
+        # name -> labels -> [bucket counts..., +Inf count, sum]
+        self._histograms: Dict[str, Dict[tuple, List[float]]] = defaultdict(dict)
+        self._gauges: Dict[str, Dict[tuple, float]] = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        buckets = self.bucket_sets.get(name, self.buckets)
+        index = bisect.bisect_left(buckets, value)
+        with self._lock:
+            series = self._histograms[name].get(labels)
+            if series is None:
+                series = self._histograms[name][labels] = [0] * (len(buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def inc_gauge(self, name: str, labels: tuple, amount: float = 1) -> None:
+        with self._lock:
+            gauge = self._gauges[name]
+            gauge[labels] = gauge.get(labels, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "histograms": {
+                    name: [[list(labels), list(series)] for labels, series in values.items()]
+                    for name, values in self._histograms.items()
+                },
+                "gauges": {
+                    name: [[list(labels), value] for labels, value in values.items()]
+                    for name, values in self._gauges.items()
+                },
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._gauges.clear()
+
+registry = MetricsRegistry()
+
+@contextmanager
+def time_upstream(service: str):
+    """Record the latency of a call to an external service such as Gemini"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        registry.observe("upstream_request_duration_seconds", (service, outcome), time.perf_counter() - start)
+
+def route_label(scope) -> str:
+    """Route template for a handled request, e.g. /customers/{customer_id}/contact.
+
+    Taken from the matched route (scope["route"]); unmatched paths share one
+    label to keep cardinality bounded.
+    """
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return "unmatched"
+    # Newer FastAPI keeps included routes' own paths and applies the router prefix
+    # while matching, so the prefix is the part of the path before the route matched
+    regex = getattr(scope["route"], "path_regex", None)
+    path = scope.get("path", "")
+    if regex is not None:
+        for index, char in enumerate(path):
+            if char == "/" and regex.match(path[index:]):
+                return path[:index] + template
+    return template
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status, in-flight requests and DB time.
+
+    Also adds a Server-Timing header with the request's query count and DB time,
+    and logs statement shapes repeated often enough to look like an N+1.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        request = RequestMetrics()
+        token = current_request.set(request)
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if SERVER_TIMING_ENABLED:
+                    timing = request.server_timing(time.perf_counter() - start)
+                    message["headers"] = [*message.get("headers", ()), (b"server-timing", timing)]
+            await send(message)
+
+        self.registry.inc_gauge("http_requests_in_flight", (method,))
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = route_label(scope)
+            self.registry.inc_gauge("http_requests_in_flight", (method,), -1)
+            self.registry.observe("http_request_duration_seconds", (method, route, str(status_code)), elapsed)
+            if request.db_queries:
+                self.registry.observe("http_request_db_seconds", (method, route), request.db_seconds)
+                for shape, count in request.repeated_statements():
+                    logger.warning("Possible N+1 in %s %s: %d x %s", method, route, count, shape)
+            current_request.reset(token)
+
+# Multiprocess aggregation
+
+def _snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"metrics-{pid}.json")
+
+def flush(directory: Optional[str] = MULTIPROC_DIR) -> None:
+    """Write this process's samples for other workers' /metrics to merge"""
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    snapshot = registry.snapshot()
+    snapshot["pid"] = os.getpid()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as handle:
+        json.dump(snapshot, handle)
+    os.replace(tmp_path, _snapshot_path(directory, os.getpid()))
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def collect(directory: Optional[str] = MULTIPROC_DIR) -> dict:
+    """Merge samples from every worker (or just this process in single-process mode)"""
+    if not directory:
+        return registry.snapshot()
+    flush(directory)
+
+    histograms: Dict[str, Dict[tuple, List[float]]] = defaultdict(dict)
+    gauges: Dict[str, Dict[tuple, float]] = defaultdict(dict)
+    for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+        try:
+            with open(path) as handle:
+                snapshot = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        for name, values in snapshot["histograms"].items():
+            for labels, series in values:
+                merged = histograms[name].setdefault(tuple(labels), [0] * len(series))
+                for i, value in enumerate(series):
+                    merged[i] += value
+        # Counters outlive a worker; gauges of an exited worker no longer mean anything
+        if snapshot.get("pid") and _pid_alive(snapshot["pid"]):
+            for name, values in snapshot["gauges"].items():
+                for labels, value in values:
+                    gauges[name][tuple(labels)] = gauges[name].get(tuple(labels), 0) + value
+
+    return {
+        "histograms": {name: [[list(k), v] for k, v in values.items()] for name, values in histograms.items()},
+        "gauges": {name: [[list(k), v] for k, v in values.items()] for name, values in gauges.items()},
+    }
+
+_flusher: Optional[threading.Thread] = None
+
+def start_flusher(directory: Optional[str] = MULTIPROC_DIR, interval: float = FLUSH_SECONDS) -> None:
+    """Periodically flush in the background so scrapes see every worker"""
+    global _flusher
+    if not directory or _flusher is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                flush(directory)
+            except OSError:
+                pass
+
+    _flusher = threading.Thread(target=run, name="metrics-flusher", daemon=True)
+    _flusher.start()
+
+# Prometheus text exposition
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def render(snapshot: Optional[dict] = None) -> str:
+    snapshot = snapshot if snapshot is not None else collect()
+    lines = []
+    for name, (help_text, label_names) in HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, series in snapshot["histograms"].get(name, []):
+            cumulative = 0
+            buckets = HISTOGRAM_BUCKETS.get(name, LATENCY_BUCKETS)
+            for bound, count in zip(buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(label_names, labels, f'le="{le}"')
+                lines.append(f"{name}_bucket{bucket_labels} {int(cumulative)}")
+            lines.append(f"{name}_sum{_format_labels(label_names, labels)} {series[-1]}")
+            lines.append(f"{name}_count{_format_labels(label_names, labels)} {int(cumulative)}")
+    for name, (help_text, label_names) in GAUGES.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in snapshot["gauges"].get(name, []):
+            lines.append(f"{name}{_format_labels(label_names, labels)} {value:g}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+# Work factor for new hashes; existing hashes with another cost are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processes dedicated to bcrypt; 0 hashes on a worker thread instead (tests, serverless)
+POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Hash/verify jobs allowed in flight before callers get a 503
+MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", str(max(POOL_WORKERS, 1) * 8)))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+class PasswordPoolSaturated(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+# Synchronous primitives: run inside the pool, and by code that cannot await
+# (User.set_password, scripts)
+
+def hash_password_sync(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_password_sync(password: str, password_hash: Optional[str]) -> bool:
+    if not password_hash:
+        return False
+    return pwd_context.verify(password, password_hash)
+
+def verify_and_update_sync(password: str, password_hash: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """(matches, replacement hash if the stored one uses outdated settings)"""
+    if not password_hash:
+        return False, None
+    return pwd_context.verify_and_update(password, password_hash)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(MAX_PENDING)
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if POOL_WORKERS <= 0:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=POOL_WORKERS)
+    return _executor
+
+def shutdown_pool() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+async def _run(func, *args):
+    # Reject instead of queueing so a login burst cannot pile up unbounded work
+    if not _pending.acquire(blocking=False):
+        raise PasswordPoolSaturated()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), func, *args)
+    finally:
+        _pending.release()
+
+async def hash_password(password: str) -> str:
+    return await _run(hash_password_sync, password)
+
+async def verify_password(password: str, password_hash: Optional[str]) -> bool:
+    return await _run(verify_password_sync, password, password_hash)
+
+async def verify_and_update(password: str, password_hash: Optional[str]) -> Tuple[bool, Optional[str]]:
+    return await _run(verify_and_update_sync, password, password_hash)
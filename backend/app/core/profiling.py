@@ -0,0 +1,236 @@
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from starlette.routing import compile_path
+
+# Profiling is only available when an admin token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.getcwd(), "profiles"))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+MAX_CONCURRENT_PROFILES = 2
+
+PROFILE_FORMATS = ("speedscope", "collapsed")
+PROFILE_HEADER = b"x-profile"
+ADMIN_HEADER = b"x-admin-token"
+
+# Threads parked in these modules are waiting, not working for the request
+IDLE_MODULES = ("selectors.py", "threading.py", "queue.py", "socket.py")
+
+def is_admin_token(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class Sampler:
+    """Wall-clock sampling profiler: a thread snapshots every other thread's stack.
+
+    Async routes run on the event loop thread and sync ones in a worker thread,
+    so all busy threads are sampled; with concurrent traffic the profile can
+    include other requests' work as well.
+    """
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or SAMPLE_INTERVAL
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at = 0.0
+        self.duration = 0.0
+
+    def start(self) -> "Sampler":
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "Sampler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or os.path.basename(frame.f_code.co_filename) in IDLE_MODULES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+def to_collapsed(stacks: Counter) -> str:
+    """Brendan Gregg's collapsed format, readable by flamegraph.pl and speedscope"""
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.most_common())
+
+def to_speedscope(stacks: Counter, interval: float, name: str) -> dict:
+    frames: List[dict] = []
+    frame_index: Dict[str, int] = {}
+    samples, weights = [], []
+    for stack, count in stacks.items():
+        indices = []
+        for label in stack:
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                frames.append({"name": label})
+            indices.append(frame_index[label])
+        samples.append(indices)
+        weights.append(count * interval * 1000)
+    total = sum(weights)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": total,
+            "samples": samples,
+            "weights": weights,
+        }],
+        "exporter": "app.core.profiling",
+    }
+
+def save_profile(sampler: Sampler, fmt: str, name: str, directory: Optional[str] = None) -> str:
+    directory = directory or PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    if fmt == "collapsed":
+        filename = f"{name}.collapsed"
+        content = to_collapsed(sampler.stacks)
+    else:
+        filename = f"{name}.speedscope.json"
+        content = json.dumps(to_speedscope(sampler.stacks, sampler.interval, name))
+    with open(os.path.join(directory, filename), "w") as handle:
+        handle.write(content)
+    return filename
+
+class RollingProfiles:
+    """'Profile N% of requests to route X', aggregated per route into collapsed stacks"""
+
+    def __init__(self):
+        self.routes: Dict[str, Tuple[re.Pattern, float]] = {}
+        self.stacks: Dict[str, Counter] = {}
+        self.lock = threading.Lock()
+
+    def configure(self, route: str, rate: float) -> None:
+        if not 0 < rate <= 1:
+            raise ValueError("rate must be in (0, 1]")
+        regex, _, _ = compile_path(route)
+        with self.lock:
+            self.routes[route] = (regex, rate)
+            self.stacks.setdefault(route, Counter())
+
+    def remove(self, route: str) -> bool:
+        with self.lock:
+            self.stacks.pop(route, None)
+            return self.routes.pop(route, None) is not None
+
+    def match(self, path: str) -> Optional[str]:
+        if not self.routes:
+            return None
+        with self.lock:
+            for route, (regex, rate) in self.routes.items():
+                if regex.match(path):
+                    return route if random.random() < rate else None
+        return None
+
+    def add(self, route: str, stacks: Counter, directory: Optional[str] = None) -> None:
+        directory = directory or PROFILE_DIR
+        with self.lock:
+            aggregated = self.stacks.setdefault(route, Counter())
+            aggregated.update(stacks)
+            content = to_collapsed(aggregated)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, rolling_filename(route)), "w") as handle:
+            handle.write(content)
+
+    def status(self) -> List[dict]:
+        with self.lock:
+            return [
+                {
+                    "route": route,
+                    "rate": rate,
+                    "samples": sum(self.stacks.get(route, Counter()).values()),
+                    "file": rolling_filename(route),
+                }
+                for route, (_, rate) in self.routes.items()
+            ]
+
+def rolling_filename(route: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    return f"rolling-{slug}-{os.getpid()}.collapsed"
+
+rolling_profiles = RollingProfiles()
+_profile_slots = threading.BoundedSemaphore(MAX_CONCURRENT_PROFILES)
+
+def _requested_format(scope) -> Optional[str]:
+    """Profile format asked for via X-Profile or ?__profile=, if the caller is an admin"""
+    fmt = token = None
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER:
+            fmt = value.decode("latin-1").lower()
+        elif name == ADMIN_HEADER:
+            token = value.decode("latin-1")
+    query = scope.get("query_string", b"")
+    if fmt is None and b"__profile=" in query:
+        match = re.search(rb"(?:^|&)__profile=([a-z]+)", query)
+        fmt = match.group(1).decode() if match else None
+    if fmt is None or not is_admin_token(token):
+        return None
+    return fmt if fmt in PROFILE_FORMATS else "speedscope"
+
+class ProfilingMiddleware:
+    """Opt-in sampling profiles: per request for admins, or a rolling sample of chosen routes"""
+
+    def __init__(self, app, rolling: RollingProfiles = rolling_profiles):
+        self.app = app
+        self.rolling = rolling
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMIN_TOKEN:
+            await self.app(scope, receive, send)
+            return
+
+        fmt = _requested_format(scope)
+        rolling_route = None if fmt else self.rolling.match(scope["path"])
+        if (fmt is None and rolling_route is None) or not _profile_slots.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        name = f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        filename = f"{name}.collapsed" if fmt == "collapsed" else f"{name}.speedscope.json"
+
+        async def send_with_profile_header(message):
+            if fmt and message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), (b"x-profile-file", filename.encode())]
+            await send(message)
+
+        sampler = Sampler().start()
+        try:
+            await self.app(scope, receive, send_with_profile_header)
+        finally:
+            sampler.stop()
+            _profile_slots.release()
+            if fmt:
+                save_profile(sampler, fmt, name)
+            else:
+                self.rolling.add(rolling_route, sampler.stacks)
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Messages buffered per connection before it is treated as a slow consumer
+SUBSCRIBER_BUFFER_SIZE = int(os.getenv("PUBSUB_BUFFER_SIZE", "256"))
+CHANNEL_PREFIX = "events:"
+
+_CLOSED = object()
+
+class SubscriptionClosed(Exception):
+    pass
+
+def tenant_topic(user_id: int) -> str:
+    return f"tenant:{user_id}"
+
+class Subscription:
+    """One connection's bounded message queue, bound to the event loop that created it"""
+
+    def __init__(self, broker: "InMemoryBroker", topic: str, buffer_size: int):
+        self.broker = broker
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.closed = False
+        self.close_reason: Optional[str] = None
+
+    def deliver(self, message: str) -> None:
+        """Enqueue without waiting; must run on the subscription's loop"""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Never let one stalled socket hold up the fan-out to everyone else
+            self.close("slow_consumer")
+
+    def close(self, reason: str = "closed") -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.close_reason = reason
+        self.broker.unsubscribe(self)
+        # Drop whatever is buffered and wake the reader
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_CLOSED)
+
+    async def get(self) -> str:
+        message = await self.queue.get()
+        if message is _CLOSED:
+            raise SubscriptionClosed(self.close_reason)
+        return message
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        try:
+            return await self.get()
+        except SubscriptionClosed:
+            raise StopAsyncIteration
+
+def _deliver_all(subscriptions, message: str) -> None:
+    for subscription in subscriptions:
+        subscription.deliver(message)
+
+class InMemoryBroker:
+    """Process-local pub/sub; publish() is safe to call from sync routes running in threads"""
+
+    def __init__(self, buffer_size: int = SUBSCRIBER_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._topics: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(self, topic, self.buffer_size)
+        with self._lock:
+            self._topics[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[subscription.topic]
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        with self._lock:
+            if topic is not None:
+                return len(self._topics.get(topic, ()))
+            return sum(len(subscribers) for subscribers in self._topics.values())
+
+    def publish(self, topic: str, message: str) -> int:
+        """Fan a serialized message out to local subscribers; returns how many were reached"""
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        if not subscribers:
+            return 0
+
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+
+        # One loop callback per event loop rather than one per subscriber
+        by_loop = defaultdict(list)
+        for subscription in subscribers:
+            by_loop[subscription.loop].append(subscription)
+        for loop, group in by_loop.items():
+            if loop is current_loop:
+                _deliver_all(group, message)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(_deliver_all, group, message)
+        return len(subscribers)
+
+class RedisBroker:
+    """Cross-worker pub/sub over Redis.
+
+    Publishes go to Redis; each process holds a single pattern subscription and
+    relays incoming messages into a local InMemoryBroker, so socket fan-out stays
+    in-process no matter how many connections a worker serves.
+    """
+
+    def __init__(self, client, buffer_size: int = SUBSCRIBER_BUFFER_SIZE, prefix: str = CHANNEL_PREFIX):
+        self.client = client
+        self.prefix = prefix
+        self.local = InMemoryBroker(buffer_size)
+        self._listener: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def subscribe(self, topic: str) -> Subscription:
+        self._ensure_listener()
+        return self.local.subscribe(topic)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.local.unsubscribe(subscription)
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        return self.local.subscriber_count(topic)
+
+    def publish(self, topic: str, message: str) -> int:
+        return self.client.publish(self.prefix + topic, message)
+
+    def close(self) -> None:
+        self._stopping.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
+
+    def _ensure_listener(self) -> None:
+        with self._start_lock:
+            if self._listener is None:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.prefix + "*")
+                self._stopping.clear()
+                self._listener = threading.Thread(
+                    target=self._listen, args=(pubsub,), name="pubsub-listener", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self, pubsub) -> None:
+        try:
+            while not self._stopping.is_set():
+                try:
+                    message = pubsub.get_message(timeout=1.0)
+                except Exception:
+                    logger.exception("Redis pub/sub listener failed; retrying")
+                    self._stopping.wait(1.0)
+                    continue
+                if not message or message.get("type") not in ("message", "pmessage"):
+                    continue
+                channel = message["channel"]
+                data = message["data"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                if isinstance(data, bytes):
+                    data = data.decode()
+                self.local.publish(channel[len(self.prefix):], data)
+        finally:
+            pubsub.close()
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_broker():
+    """Process-wide broker; PUBSUB_BACKEND=redis shares events across workers"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                if os.getenv("PUBSUB_BACKEND", "memory").lower() == "redis":
+                    import redis
+                    client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+                    _broker = RedisBroker(client)
+                else:
+                    _broker = InMemoryBroker()
+    return _broker
+
+def set_broker(broker) -> None:
+    global _broker
+    _broker = broker
+
+def publish_event(user_id: int, event_type: str, data: Dict[str, Any]) -> int:
+    """Publish a tenant-scoped event; failures are logged and never break the write path"""
+    message = json.dumps({
+        "type": event_type,
+        "user_id": user_id,
+        "data": data,
+        "timestamp": datetime.utcnow().isoformat(),
+    }, default=str)
+    try:
+        return get_broker().publish(tenant_topic(user_id), message)
+    except Exception:
+        logger.exception("Failed to publish %s event", event_type)
+        return 0
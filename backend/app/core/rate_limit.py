@@ -0,0 +1,243 @@
+import functools
+import hashlib
+import inspect
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Callable, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from jose import JWTError
+from app.core.security import decode_access_token
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process record locks, use the local store
+    fcntl = None
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """Parse limits like 5/minute, 100/hours or 10 per hour into (amount, seconds)"""
+    amount, _, period = rate.replace(" per ", "/").partition("/")
+    period = period.strip().lower().rstrip("s")
+    if period not in PERIODS or not amount.strip().isdigit():
+        raise ValueError(f"Invalid rate limit: {rate!r}")
+    return int(amount), PERIODS[period]
+
+def refill(tokens: float, elapsed: float, capacity: float, rate: float, cost: float) -> Tuple[float, bool, float]:
+    """One token-bucket step: (remaining tokens, allowed, seconds until allowed)"""
+    tokens = min(capacity, tokens + max(elapsed, 0.0) * rate)
+    if tokens >= cost:
+        return tokens - cost, True, 0.0
+    return tokens, False, (cost - tokens) / rate
+
+class LocalBucketStore:
+    """Buckets in a dict; correct only for a single worker process"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> Tuple[bool, float]:
+        with self._lock:
+            now = self.clock()
+            tokens, last = self._buckets.get(key, (capacity, now))
+            tokens, allowed, retry_after = refill(tokens, now - last, capacity, rate, cost)
+            self._buckets[key] = (tokens, now)
+        return allowed, retry_after
+
+# Shared-memory slot: 64-bit key hash, tokens, last refill time
+SLOT = struct.Struct("<Qdd")
+
+def key_hash(key: str) -> int:
+    # Python's hash() is salted per process, so it can't address shared slots
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+def default_shm_path() -> str:
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"app-rate-limit-{os.getuid() if hasattr(os, 'getuid') else 0}")
+
+class SharedMemoryBucketStore:
+    """Buckets in an mmap'd file shared by every worker on the host.
+
+    The table is set-associative: a key hashes to one set of `ways` slots and
+    only that set's byte range is locked (fcntl record lock across processes,
+    plus a striped thread lock since record locks are per process). When a set
+    is full the least recently touched bucket is recycled, and the new key takes
+    over its tokens: otherwise cycling keys through a set would evict a drained
+    bucket and bring it back full.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        sets: int = 16384,
+        ways: int = 4,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.path = path or default_shm_path()
+        self.sets = sets
+        self.ways = ways
+        self.clock = clock
+        self.set_size = ways * SLOT.size
+        size = sets * self.set_size
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._thread_locks = [threading.Lock() for _ in range(64)]
+
+    def consume(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> Tuple[bool, float]:
+        h = key_hash(key)
+        set_index = h % self.sets
+        offset = set_index * self.set_size
+
+        with self._thread_locks[set_index % len(self._thread_locks)]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self.set_size, offset, os.SEEK_SET)
+            try:
+                now = self.clock()
+                victim, victim_tokens, victim_ts = offset, capacity, math.inf
+                for position in range(offset, offset + self.set_size, SLOT.size):
+                    slot_key, tokens, last = SLOT.unpack_from(self._map, position)
+                    if slot_key == h:
+                        break
+                    if slot_key == 0:
+                        tokens, last = capacity, -math.inf
+                    if last < victim_ts:
+                        victim, victim_tokens, victim_ts = position, tokens, last
+                else:
+                    # An unused slot starts full; a recycled one keeps the evicted bucket's state
+                    position, tokens = victim, min(victim_tokens, capacity)
+                    last = now if victim_ts == -math.inf else victim_ts
+
+                tokens, allowed, retry_after = refill(tokens, now - last, capacity, rate, cost)
+                SLOT.pack_into(self._map, position, h, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.set_size, offset, os.SEEK_SET)
+        return allowed, retry_after
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+# Atomic bucket update on the Redis server; uses server time so nodes need not agree on clocks
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local last = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - last, 0) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+class RedisBucketStore:
+    """Buckets in Redis, shared by every node"""
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def consume(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> Tuple[bool, float]:
+        allowed, retry_after = self._script(keys=[self.prefix + key], args=[capacity, rate, cost])
+        return bool(int(allowed)), float(retry_after)
+
+def create_store():
+    """Store selected by RATE_LIMIT_BACKEND: shared (default), local or redis"""
+    backend = os.getenv("RATE_LIMIT_BACKEND", "shared").lower()
+    if backend == "redis":
+        import redis
+        return RedisBucketStore(redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0")))
+    if backend == "shared" and fcntl is not None:
+        return SharedMemoryBucketStore(os.getenv("RATE_LIMIT_SHM_PATH"))
+    return LocalBucketStore()
+
+def user_or_ip_key(request: Request) -> str:
+    """Authenticated user (JWT subject) when present, otherwise the client address"""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            subject = decode_access_token(token).get("sub")
+        except JWTError:
+            subject = None
+        if subject:
+            return f"user:{subject}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+class RateLimiter:
+    """Token-bucket limits for route handlers: @limiter.limit("5/minute")
+
+    Like slowapi, the decorated endpoint must accept a `request: Request`.
+    """
+
+    def __init__(self, store=None, key_func: Callable[[Request], str] = user_or_ip_key):
+        self._store = store
+        self.key_func = key_func
+        self.enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() != "false"
+
+    @property
+    def store(self):
+        # Created on first use so importing the app doesn't touch /dev/shm or Redis
+        if self._store is None:
+            self._store = create_store()
+        return self._store
+
+    def check(self, request: Request, scope: str, limit: int, period: int) -> None:
+        if not self.enabled:
+            return
+        key = f"{scope}:{self.key_func(request)}"
+        allowed, retry_after = self.store.consume(key, limit, limit / period)
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Rate limit exceeded: {limit} per {period} seconds",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    def limit(self, rate: str):
+        limit, period = parse_rate(rate)
+
+        def decorator(func):
+            scope = f"{func.__module__}.{func.__name__}"
+
+            def find_request(args, kwargs) -> Request:
+                for value in list(kwargs.values()) + list(args):
+                    if isinstance(value, Request):
+                        return value
+                raise RuntimeError(f"{scope} needs a `request: Request` parameter to be rate limited")
+
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    self.check(find_request(args, kwargs), scope, limit, period)
+                    return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                self.check(find_request(args, kwargs), scope, limit, period)
+                return func(*args, **kwargs)
+            return wrapper
+
+        return decorator
@@ -0,0 +1,410 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, func, case, and_, or_, Date, DateTime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.exc import IntegrityError
+from app.models.models import (
+    Customer as CustomerModel, Interaction as InteractionModel, Referral as ReferralModel,
+    RollupWatermark, DailyResponseRollup, DailyTenantMetrics
+)
+from app.core.scoring import inbound_clause, outbound_clause
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, date, timedelta
+from collections import defaultdict
+
+RESPONSE_ROLLUP = "responses"
+DAILY_METRICS_ROLLUP = "daily_metrics"
+
+PLATFORMS = ["whatsapp", "sms", "email"]
+REFERRAL_STATUSES = ["pending", "accepted", "completed"]
+MAX_RANGE_DAYS = 366
+
+# Interactions younger than this are left for the next fold. Ids come from a
+# sequence, so a transaction still open can commit a lower id than one already
+# folded; waiting until timestamps settle keeps the id watermark from skipping it.
+ROLLUP_SETTLE_SECONDS = 300
+
+METRIC_COLUMNS = [
+    column.name for column in DailyTenantMetrics.__table__.columns
+    if column.name not in ("user_id", "day")
+]
+# Website views have no raw table behind them, so a rebuild keeps the recorded counts
+REBUILT_COLUMNS = [column for column in METRIC_COLUMNS if column != "website_views"]
+
+def _upsert(db: Session, table, keys: Dict[str, Any], values: Dict[str, Any], increment: bool) -> None:
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        stmt = dialect_insert(table).values(**keys, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={
+                column: table.c[column] + stmt.excluded[column] if increment else stmt.excluded[column]
+                for column in values
+            }
+        )
+        db.execute(stmt)
+        return
+
+    updated = db.execute(
+        update(table).where(*[table.c[column] == value for column, value in keys.items()]).values(
+            {column: table.c[column] + value if increment else value for column, value in values.items()}
+        )
+    ).rowcount
+    if not updated:
+        db.execute(insert(table).values(**keys, **values))
+
+def insert_missing(db: Session, table, row: Dict[str, Any]) -> None:
+    """Insert `row` unless its key is already present, without failing when a
+    concurrent transaction inserts it first"""
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        db.execute(dialect_insert(table).values(**row).on_conflict_do_nothing())
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(table).values(**row))
+    except IntegrityError:
+        pass
+
+def upsert_increment(db: Session, table, keys: Dict[str, Any], deltas: Dict[str, Any]) -> None:
+    """Add `deltas` to the row identified by `keys`, creating it when missing (one statement)"""
+    _upsert(db, table, keys, deltas, increment=True)
+
+def upsert_replace(db: Session, table, keys: Dict[str, Any], values: Dict[str, Any]) -> None:
+    """Overwrite `values` on the row identified by `keys`, creating it when missing"""
+    _upsert(db, table, keys, values, increment=False)
+
+def get_watermark(db: Session, user_id: int, name: str) -> int:
+    watermark = db.get(RollupWatermark, (user_id, name))
+    return watermark.last_interaction_id if watermark else 0
+
+def set_watermark(db: Session, user_id: int, name: str, last_interaction_id: int) -> None:
+    watermark = db.get(RollupWatermark, (user_id, name))
+    if watermark is None:
+        watermark = RollupWatermark(user_id=user_id, name=name)
+        db.add(watermark)
+    watermark.last_interaction_id = last_interaction_id
+    watermark.updated_at = datetime.utcnow()
+
+def claim_watermark(db: Session, user_id: int, name: str, expected: int, last_interaction_id: int) -> bool:
+    """Move a watermark from `expected` to `last_interaction_id` in the caller's
+    transaction. False when another fold moved it first; the caller must then
+    roll back rather than add the same interactions again."""
+    table = RollupWatermark.__table__
+    return bool(db.execute(
+        update(table).where(
+            table.c.user_id == user_id, table.c.name == name, table.c.last_interaction_id == expected
+        ).values(last_interaction_id=last_interaction_id, updated_at=datetime.utcnow())
+    ).rowcount)
+
+def refresh_response_rollups(db: Session, user_id: int, now: Optional[datetime] = None) -> int:
+    """Fold settled interactions newer than the tenant's watermark into daily response rollups.
+
+    Only the run of new ids up to the first one younger than ROLLUP_SETTLE_SECONDS
+    is folded, so the id watermark and the timestamp order agree on what is done.
+    Safe to run concurrently: the watermark is claimed with a compare-and-set.
+    """
+    now = now or datetime.utcnow()
+    insert_missing(db, RollupWatermark.__table__, {"user_id": user_id, "name": RESPONSE_ROLLUP, "last_interaction_id": 0})
+    db.commit()
+    watermark = get_watermark(db, user_id, RESPONSE_ROLLUP)
+
+    # New interactions are found with a primary-key range scan
+    new_ids = select(InteractionModel.id).join(
+        CustomerModel, CustomerModel.id == InteractionModel.customer_id
+    ).where(CustomerModel.user_id == user_id, InteractionModel.id > watermark)
+    unsettled = db.execute(
+        new_ids.with_only_columns(func.min(InteractionModel.id)).where(
+            InteractionModel.timestamp > now - timedelta(seconds=ROLLUP_SETTLE_SECONDS)
+        )
+    ).scalar()
+    if unsettled is not None:
+        new_ids = new_ids.where(InteractionModel.id < unsettled)
+    new_max = db.execute(new_ids.with_only_columns(func.max(InteractionModel.id))).scalar()
+    if new_max is None:
+        return 0
+
+    affected_customers = select(InteractionModel.customer_id).join(
+        CustomerModel, CustomerModel.id == InteractionModel.customer_id
+    ).where(
+        CustomerModel.user_id == user_id,
+        InteractionModel.id > watermark,
+        InteractionModel.id <= new_max
+    ).distinct()
+
+    # Pair every message with the previous agent/customer message in the same conversation
+    direction = case((outbound_clause(), "out"), else_="in")
+    window = {
+        "partition_by": InteractionModel.customer_id,
+        "order_by": (InteractionModel.timestamp, InteractionModel.id),
+    }
+    ordered = select(
+        InteractionModel.id,
+        InteractionModel.timestamp,
+        direction.label("direction"),
+        func.lag(direction).over(**window).label("prev_direction"),
+        func.lag(InteractionModel.timestamp, type_=DateTime).over(**window).label("prev_timestamp"),
+    ).where(
+        InteractionModel.customer_id.in_(affected_customers),
+        InteractionModel.id <= new_max,
+        or_(outbound_clause(), inbound_clause())
+    ).subquery()
+
+    rows = db.execute(
+        select(ordered.c.timestamp, ordered.c.direction, ordered.c.prev_direction, ordered.c.prev_timestamp).where(
+            ordered.c.id > watermark
+        )
+    ).all()
+
+    daily = defaultdict(lambda: {"outbound_count": 0, "responded_count": 0, "response_seconds_total": 0.0})
+    for timestamp, message_direction, prev_direction, prev_timestamp in rows:
+        if timestamp is None:
+            continue
+        if message_direction == "out":
+            daily[timestamp.date()]["outbound_count"] += 1
+        elif prev_direction == "out" and prev_timestamp is not None:
+            # A reply is credited to the day of the message it answers
+            day = daily[prev_timestamp.date()]
+            day["responded_count"] += 1
+            day["response_seconds_total"] += max((timestamp - prev_timestamp).total_seconds(), 0.0)
+
+    # Claimed before adding, so a concurrent fold of the same ids backs off
+    if not claim_watermark(db, user_id, RESPONSE_ROLLUP, watermark, new_max):
+        db.rollback()
+        return 0
+    table = DailyResponseRollup.__table__
+    for day, deltas in daily.items():
+        upsert_increment(db, table, {"user_id": user_id, "day": day}, deltas)
+    db.commit()
+    return len(rows)
+
+def format_duration(seconds: Optional[float]) -> Optional[str]:
+    """Human-readable duration, e.g. 8100 -> 2h 15m"""
+    if seconds is None:
+        return None
+    minutes = int(round(seconds / 60))
+    if minutes < 1:
+        return "<1m"
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+def response_analytics(
+    db: Session,
+    user_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> Dict[str, Any]:
+    """Response rate and average response time from the daily rollups (O(days))"""
+    query = db.query(
+        func.coalesce(func.sum(DailyResponseRollup.outbound_count), 0),
+        func.coalesce(func.sum(DailyResponseRollup.responded_count), 0),
+        func.coalesce(func.sum(DailyResponseRollup.response_seconds_total), 0.0),
+    ).filter(DailyResponseRollup.user_id == user_id)
+    if start is not None:
+        query = query.filter(DailyResponseRollup.day >= start)
+    if end is not None:
+        query = query.filter(DailyResponseRollup.day <= end)
+
+    outbound, responded, seconds = query.one()
+    avg_seconds = seconds / responded if responded else None
+    return {
+        "messages_awaiting_reply": outbound - responded,
+        "responded_messages": responded,
+        "response_rate": round(responded / outbound * 100, 1) if outbound else 0.0,
+        "avg_response_seconds": round(avg_seconds) if avg_seconds is not None else None,
+        "avg_response_time": format_duration(avg_seconds),
+    }
+
+def platform_column(platform: Optional[str]) -> str:
+    platform = (platform or "").lower()
+    return f"messages_{platform}" if platform in PLATFORMS else "messages_other"
+
+def referral_deltas(status: Optional[str], reward_points: Optional[int], sign: int = 1) -> Dict[str, int]:
+    """Metric deltas contributed by a referral in the given state"""
+    column = f"referrals_{status}" if status in REFERRAL_STATUSES else "referrals_other"
+    deltas = {column: sign}
+    if status == "completed" and reward_points:
+        deltas["rewards_earned"] = sign * reward_points
+    return deltas
+
+def merge_deltas(*deltas: Dict[str, int]) -> Dict[str, int]:
+    merged = defaultdict(int)
+    for delta in deltas:
+        for column, value in delta.items():
+            merged[column] += value
+    return dict(merged)
+
+def record_daily_metrics(db: Session, user_id: int, day: Optional[date] = None, **deltas: int) -> None:
+    """Increment a tenant's daily metrics inside the caller's transaction"""
+    deltas = {column: value for column, value in deltas.items() if value}
+    if not deltas:
+        return
+    upsert_increment(
+        db, DailyTenantMetrics.__table__,
+        {"user_id": user_id, "day": day or datetime.utcnow().date()},
+        deltas
+    )
+
+def rebuild_daily_metrics(
+    db: Session,
+    user_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> int:
+    """Catch-up job: recompute daily metrics from the raw tables for a date range"""
+
+    def by_day(stmt, column):
+        day = func.date(column, type_=Date)
+        if start is not None:
+            stmt = stmt.where(column >= datetime.combine(start, datetime.min.time()))
+        if end is not None:
+            stmt = stmt.where(column < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        return stmt.add_columns(day.label("day")).group_by(day)
+
+    def count_where(condition, value=1):
+        return func.sum(case((condition, value), else_=0))
+
+    days = defaultdict(lambda: {column: 0 for column in REBUILT_COLUMNS})
+
+    customers = by_day(
+        select(func.count(CustomerModel.id)).where(CustomerModel.user_id == user_id),
+        CustomerModel.created_at
+    )
+    for added, day in db.execute(customers):
+        if day is not None:
+            days[day]["customers_added"] = added
+
+    outbound = outbound_clause()
+    platform_counts = [
+        count_where(and_(outbound, or_(
+            InteractionModel.message.like(f"[{platform.upper()}]%"),
+            InteractionModel.message.like(f"[BULK-{platform.upper()}]%")
+        )))
+        for platform in PLATFORMS
+    ]
+    interactions = by_day(
+        select(count_where(outbound), func.sum(case((outbound, 0), else_=1)), *platform_counts).join(
+            CustomerModel, CustomerModel.id == InteractionModel.customer_id
+        ).where(CustomerModel.user_id == user_id),
+        InteractionModel.timestamp
+    )
+    for sent, received, *per_platform, day in db.execute(interactions):
+        if day is None:
+            continue
+        for platform, count in zip(PLATFORMS, per_platform):
+            days[day][f"messages_{platform}"] = count
+        days[day]["messages_other"] = sent - sum(per_platform)
+        days[day]["messages_received"] = received
+
+    status_counts = [count_where(ReferralModel.status == status) for status in REFERRAL_STATUSES]
+    referrals = by_day(
+        select(
+            func.count(ReferralModel.id),
+            *status_counts,
+            count_where(ReferralModel.status == "completed", func.coalesce(ReferralModel.reward_points, 0))
+        ).where(ReferralModel.user_id == user_id),
+        ReferralModel.created_at
+    )
+    for total, *per_status, rewards, day in db.execute(referrals):
+        if day is None:
+            continue
+        for status, count in zip(REFERRAL_STATUSES, per_status):
+            days[day][f"referrals_{status}"] = count
+        days[day]["referrals_other"] = total - sum(per_status)
+        days[day]["rewards_earned"] = rewards
+
+    # Days that no longer have raw data are zeroed rather than left stale
+    table = DailyTenantMetrics.__table__
+    reset = update(table).where(table.c.user_id == user_id)
+    if start is not None:
+        reset = reset.where(table.c.day >= start)
+    if end is not None:
+        reset = reset.where(table.c.day <= end)
+    db.execute(reset.values({column: 0 for column in REBUILT_COLUMNS}))
+
+    for day, values in days.items():
+        upsert_replace(db, table, {"user_id": user_id, "day": day}, values)
+
+    set_watermark(db, user_id, DAILY_METRICS_ROLLUP, 0)
+    db.commit()
+    return len(days)
+
+def ensure_daily_metrics(db: Session, user_id: int) -> None:
+    """Backfill a tenant's daily metrics the first time they are read"""
+    if db.get(RollupWatermark, (user_id, DAILY_METRICS_ROLLUP)) is None:
+        rebuild_daily_metrics(db, user_id)
+
+def resolve_date_range(
+    days: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    default_days: int = 30
+) -> Tuple[date, date]:
+    """Turn days/start/end query parameters into an inclusive, bounded date range.
+    Raises ValueError for an empty, reversed or over-long range."""
+    if days is not None and days < 1:
+        raise ValueError("days must be at least 1")
+    end = end or datetime.utcnow().date()
+    if start is None:
+        start = end - timedelta(days=(days or default_days) - 1)
+    if start > end:
+        raise ValueError("start_date must not be after end_date")
+    if (end - start).days + 1 > MAX_RANGE_DAYS:
+        raise ValueError(f"Date range is limited to {MAX_RANGE_DAYS} days")
+    return start, end
+
+def optional_date_range(
+    days: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> Tuple[Optional[date], Optional[date]]:
+    """Like resolve_date_range, but unbounded (all time) when no parameter is given"""
+    if days is None and start is None and end is None:
+        return None, None
+    return resolve_date_range(days, start, end)
+
+def daily_metrics_series(db: Session, user_id: int, start: date, end: date) -> List[Dict[str, Any]]:
+    """One row per day in [start, end], zero-filled; reads at most one rollup row per day"""
+    ensure_daily_metrics(db, user_id)
+    rows = {
+        row.day: row
+        for row in db.query(DailyTenantMetrics).filter(
+            DailyTenantMetrics.user_id == user_id,
+            DailyTenantMetrics.day >= start,
+            DailyTenantMetrics.day <= end
+        )
+    }
+
+    series = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        row = rows.get(day)
+        series.append({
+            "date": day.isoformat(),
+            **{column: (getattr(row, column) or 0) if row else 0 for column in METRIC_COLUMNS}
+        })
+    return series
+
+def daily_metrics_totals(
+    db: Session,
+    user_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> Dict[str, int]:
+    """Metric totals for a date range (all time when unbounded)"""
+    ensure_daily_metrics(db, user_id)
+    query = db.query(
+        *[func.coalesce(func.sum(getattr(DailyTenantMetrics, column)), 0) for column in METRIC_COLUMNS]
+    ).filter(DailyTenantMetrics.user_id == user_id)
+    if start is not None:
+        query = query.filter(DailyTenantMetrics.day >= start)
+    if end is not None:
+        query = query.filter(DailyTenantMetrics.day <= end)
+    return dict(zip(METRIC_COLUMNS, query.one()))
@@ -0,0 +1,291 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, delete, func, case, extract, and_, or_, not_
+from app.models.models import Customer as CustomerModel, Interaction as InteractionModel, CustomerScore
+from typing import TYPE_CHECKING, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Scoring parameters
+RECENCY_WINDOW_DAYS = 30        # interactions newer than this count towards frequency
+RECENCY_HALF_LIFE_DAYS = 14     # recency score halves every two weeks without contact
+FREQUENCY_SATURATION = 10       # recent interactions at which frequency approaches 100
+CHURN_HORIZON_DAYS = 45
+
+# Scores older than this are recomputed even without new interactions: recency
+# and churn decay with time (about 5% a day at a 14-day half-life)
+SCORE_MAX_AGE_HOURS = 24
+
+# Engagement level thresholds (engagement_score is 0-100)
+HIGH_ENGAGEMENT = 60
+MEDIUM_ENGAGEMENT = 30
+
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+ID_CHUNK_SIZE = 500
+
+def outbound_clause():
+    """Interactions sent by the agent ("user" or "user_<id>")"""
+    return InteractionModel.sent_by.like("user%")
+
+def inbound_clause():
+    """Interactions sent by the customer (anything not from the agent or the system)"""
+    return and_(not_(InteractionModel.sent_by.like("user%")), InteractionModel.sent_by != "system")
+
+def is_outbound(sent_by: Optional[str]) -> bool:
+    """Python counterpart of outbound_clause() for a single interaction"""
+    return bool(sent_by) and sent_by.startswith("user")
+
+def is_inbound(sent_by: Optional[str]) -> bool:
+    """Python counterpart of inbound_clause() for a single interaction"""
+    return bool(sent_by) and not sent_by.startswith("user") and sent_by != "system"
+
+def chunked(ids: List[int], size: int = ID_CHUNK_SIZE):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+def utc_epoch(value: datetime) -> float:
+    """Seconds since the epoch, treating naive datetimes as UTC like the rest of the app"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def fetch_interaction_aggregates(
+    db: Session,
+    user_id: int,
+    customer_ids: Optional[List[int]] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, "np.ndarray"]:
+    """Load per-customer interaction aggregates for a tenant as NumPy arrays"""
+    import numpy as np
+    now_ts = utc_epoch(now or datetime.utcnow())
+    recent_cutoff = datetime.utcfromtimestamp(now_ts - RECENCY_WINDOW_DAYS * 86400)
+
+    customer_query = select(CustomerModel.id).where(CustomerModel.user_id == user_id)
+    if customer_ids is not None:
+        customer_query = customer_query.where(CustomerModel.id.in_(customer_ids))
+    ids = np.array(db.execute(customer_query.order_by(CustomerModel.id)).scalars().all(), dtype=np.int64)
+
+    n = len(ids)
+    aggregates = {
+        "customer_ids": ids,
+        "count": np.zeros(n, dtype=np.int64),
+        "inbound": np.zeros(n, dtype=np.int64),
+        "recent": np.zeros(n, dtype=np.int64),
+        "last_ts": np.full(n, np.nan),
+        "last_id": np.zeros(n, dtype=np.int64),
+        "hour_counts": np.zeros((n, 24), dtype=np.int64),
+        "inbound_hour_counts": np.zeros((n, 24), dtype=np.int64),
+    }
+    if n == 0:
+        return aggregates
+
+    # One grouped query over (customer, hour of day); everything else is reduced in NumPy
+    hour = extract("hour", InteractionModel.timestamp)
+    stmt = select(
+        InteractionModel.customer_id,
+        hour,
+        func.count(InteractionModel.id),
+        func.sum(case((inbound_clause(), 1), else_=0)),
+        func.sum(case((InteractionModel.timestamp >= recent_cutoff, 1), else_=0)),
+        func.max(extract("epoch", InteractionModel.timestamp)),
+        func.max(InteractionModel.id),
+    ).join(
+        CustomerModel, CustomerModel.id == InteractionModel.customer_id
+    ).where(
+        CustomerModel.user_id == user_id,
+        InteractionModel.timestamp.isnot(None)
+    ).group_by(InteractionModel.customer_id, hour)
+    if customer_ids is not None:
+        stmt = stmt.where(InteractionModel.customer_id.in_(customer_ids))
+
+    # Core execution skips ORM row loading, which dominates for large tenants
+    rows = db.connection().execute(stmt).fetchall()
+    if not rows:
+        return aggregates
+
+    data = np.array([tuple(row) for row in rows], dtype=np.float64)
+    idx = np.searchsorted(ids, data[:, 0].astype(np.int64))
+    hours = data[:, 1].astype(np.int64)
+    counts = data[:, 2].astype(np.int64)
+    inbound = data[:, 3].astype(np.int64)
+
+    np.add.at(aggregates["count"], idx, counts)
+    np.add.at(aggregates["inbound"], idx, inbound)
+    np.add.at(aggregates["recent"], idx, data[:, 4].astype(np.int64))
+    np.add.at(aggregates["hour_counts"], (idx, hours), counts)
+    np.add.at(aggregates["inbound_hour_counts"], (idx, hours), inbound)
+
+    last_ts = np.full(n, -np.inf)
+    np.maximum.at(last_ts, idx, data[:, 5])
+    aggregates["last_ts"] = np.where(np.isfinite(last_ts), last_ts, np.nan)
+    np.maximum.at(aggregates["last_id"], idx, data[:, 6].astype(np.int64))
+
+    return aggregates
+
+def compute_scores(aggregates: Dict[str, "np.ndarray"], now_ts: float) -> Dict[str, "np.ndarray"]:
+    """Vectorized recency/frequency/engagement/churn scoring for a batch of customers"""
+    import numpy as np
+    count = aggregates["count"]
+    has_history = count > 0
+
+    days_since = np.where(has_history, (now_ts - np.nan_to_num(aggregates["last_ts"])) / 86400.0, np.inf)
+    days_since = np.maximum(days_since, 0.0)
+
+    recency = 100.0 * np.exp(-np.log(2.0) * days_since / RECENCY_HALF_LIFE_DAYS)
+    frequency = 100.0 * (1.0 - np.exp(-aggregates["recent"] / FREQUENCY_SATURATION))
+    responsiveness = np.divide(
+        aggregates["inbound"], count,
+        out=np.zeros(len(count), dtype=np.float64), where=has_history
+    )
+    engagement = 0.5 * recency + 0.35 * frequency + 15.0 * responsiveness
+
+    # Likelihood of losing the customer grows with silence and is damped by frequent contact
+    churn = (1.0 - np.exp(-days_since / CHURN_HORIZON_DAYS)) * (1.0 - 0.5 * frequency / 100.0)
+    churn = np.where(has_history, churn, 1.0)
+
+    # Prefer hours in which the customer replied; fall back to all activity
+    hour_counts = np.where(
+        (aggregates["inbound"] > 0)[:, None],
+        aggregates["inbound_hour_counts"],
+        aggregates["hour_counts"]
+    )
+    best_hour = np.where(hour_counts.sum(axis=1) > 0, hour_counts.argmax(axis=1), -1)
+
+    return {
+        "recency_score": recency,
+        "frequency_score": frequency,
+        "engagement_score": engagement,
+        "churn_risk": churn,
+        "best_contact_hour": best_hour,
+    }
+
+def refresh_customer_scores(
+    db: Session,
+    user_id: int,
+    customer_ids: Optional[List[int]] = None,
+    now: Optional[datetime] = None
+) -> int:
+    """Recompute and persist scores for a tenant, or for a subset of its customers"""
+    now = now or datetime.utcnow()
+    aggregates = fetch_interaction_aggregates(db, user_id, customer_ids, now)
+    ids = aggregates["customer_ids"]
+    if len(ids) == 0:
+        return 0
+
+    scores = compute_scores(aggregates, utc_epoch(now))
+    last_seen = [
+        datetime.utcfromtimestamp(ts) if ts == ts else None  # NaN marks "no interactions"
+        for ts in aggregates["last_ts"].tolist()
+    ]
+    best_hours = [hour if hour >= 0 else None for hour in scores["best_contact_hour"].tolist()]
+
+    columns = zip(
+        ids.tolist(),
+        aggregates["count"].tolist(),
+        aggregates["inbound"].tolist(),
+        aggregates["recent"].tolist(),
+        last_seen,
+        aggregates["last_id"].tolist(),
+        scores["recency_score"].tolist(),
+        scores["frequency_score"].tolist(),
+        scores["engagement_score"].tolist(),
+        scores["churn_risk"].tolist(),
+        best_hours,
+    )
+    rows = [
+        {
+            "customer_id": customer_id,
+            "user_id": user_id,
+            "interaction_count": count,
+            "inbound_count": inbound,
+            "recent_count": recent,
+            "last_interaction_at": last_at,
+            "last_interaction_id": last_id,
+            "recency_score": recency,
+            "frequency_score": frequency,
+            "engagement_score": engagement,
+            "churn_risk": churn,
+            "best_contact_hour": best_hour,
+            "computed_at": now,
+        }
+        for (customer_id, count, inbound, recent, last_at, last_id,
+             recency, frequency, engagement, churn, best_hour) in columns
+    ]
+
+    # Replace the previous rows in bulk
+    if customer_ids is None:
+        db.execute(delete(CustomerScore).where(CustomerScore.user_id == user_id))
+    else:
+        for chunk in chunked(ids.tolist()):
+            db.execute(delete(CustomerScore).where(CustomerScore.customer_id.in_(chunk)))
+    db.execute(insert(CustomerScore.__table__), rows)
+    db.commit()
+
+    return len(rows)
+
+def stale_customer_ids(
+    db: Session,
+    user_id: int,
+    model,
+    refreshed_at=None,
+    refreshed_before: Optional[datetime] = None
+) -> List[int]:
+    """Customers that have no row in `model` yet or have interactions newer than its
+    watermark, and with `refreshed_before`, those whose `refreshed_at` is older"""
+    latest = select(
+        InteractionModel.customer_id.label("customer_id"),
+        func.max(InteractionModel.id).label("max_id")
+    ).join(
+        CustomerModel, CustomerModel.id == InteractionModel.customer_id
+    ).where(
+        CustomerModel.user_id == user_id
+    ).group_by(InteractionModel.customer_id).subquery()
+
+    conditions = [model.customer_id.is_(None), func.coalesce(latest.c.max_id, 0) > model.last_interaction_id]
+    if refreshed_before is not None:
+        conditions += [refreshed_at.is_(None), refreshed_at < refreshed_before]
+
+    stmt = select(CustomerModel.id).outerjoin(
+        latest, latest.c.customer_id == CustomerModel.id
+    ).outerjoin(
+        model, model.customer_id == CustomerModel.id
+    ).where(CustomerModel.user_id == user_id, or_(*conditions))
+    return db.execute(stmt).scalars().all()
+
+def refresh_stale_scores(db: Session, user_id: int, now: Optional[datetime] = None) -> int:
+    """Incrementally rescore the customers whose interactions changed or whose
+    scores are older than SCORE_MAX_AGE_HOURS"""
+    now = now or datetime.utcnow()
+    customer_ids = stale_customer_ids(
+        db, user_id, CustomerScore, CustomerScore.computed_at, now - timedelta(hours=SCORE_MAX_AGE_HOURS)
+    )
+    if not customer_ids:
+        return 0
+    return refresh_customer_scores(db, user_id, customer_ids, now)
+
+def get_customer_score(db: Session, customer_id: int, user_id: int) -> CustomerScore:
+    """Read a customer's score, computing it on first access"""
+    score = db.get(CustomerScore, customer_id)
+    if score is None:
+        refresh_customer_scores(db, user_id, [customer_id])
+        score = db.get(CustomerScore, customer_id)
+    return score
+
+def engagement_level(engagement_score: float) -> str:
+    if engagement_score >= HIGH_ENGAGEMENT:
+        return "High"
+    if engagement_score >= MEDIUM_ENGAGEMENT:
+        return "Medium"
+    return "Low"
+
+def format_hour_window(hour: Optional[int], width: int = 2) -> Optional[str]:
+    """Format a contact window starting at `hour` (10 -> 10:00 AM - 12:00 PM)"""
+    if hour is None:
+        return None
+
+    def label(h: int) -> str:
+        h = h % 24
+        return f"{(h % 12) or 12}:00 {'AM' if h < 12 else 'PM'}"
+
+    return f"{label(hour)} - {label(hour + width)}"
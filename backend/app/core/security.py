@@ -1,10 +1,10 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from app.core.token_cache import token_cache
 import os
 from dotenv import load_dotenv
 
@@ -15,15 +15,8 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -34,10 +27,29 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def decode_access_token(token: str) -> dict:
+    """Verified claims of a token, served from the token cache when possible"""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+    if token_cache.is_revoked(token):
+        raise JWTError("Token has been revoked")
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    token_cache.put(token, payload)
+    return payload
+
+def revoke_access_token(token: str) -> None:
+    """Stop accepting a token in this process before it expires"""
+    try:
+        expires_at = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        expires_at = None
+    token_cache.revoke(token, expires_at)
+
 def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     """Extract user ID from JWT token"""
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(credentials.credentials)
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(
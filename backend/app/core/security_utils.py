@@ -90,30 +90,72 @@ class CustomerCreateSecure(BaseModel):
 
 # Security middleware
 from fastapi import Request
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from app.core.rate_limit import RateLimiter
 
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
+# Initialize rate limiter (token buckets shared by all workers, keyed by user then IP)
+limiter = RateLimiter()
 
 # Input sanitization
 import html
-import bleach
 
 def sanitize_input(text: str) -> str:
     """Sanitize user input to prevent XSS"""
+    # Imported on first use: bleach (and html5lib) is slow to import and most requests never sanitize
+    import bleach
     # Remove HTML tags and escape special characters
     cleaned = bleach.clean(text, tags=[], attributes={}, strip=True)
     return html.escape(cleaned)
 
 # Security headers middleware
-from starlette.middleware.base import BaseHTTPMiddleware
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        return response
\ No newline at end of file
+import time
+import uuid
+
+SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+]
+REQUEST_ID_HEADER = b"x-request-id"
+MAX_REQUEST_ID_LENGTH = 128
+
+def _client_request_id(scope) -> Optional[bytes]:
+    """Reuse a caller-supplied request id if it is short and printable"""
+    for name, value in scope.get("headers", ()):
+        if name == REQUEST_ID_HEADER:
+            if 0 < len(value) <= MAX_REQUEST_ID_LENGTH and value.isascii() and value.replace(b"-", b"").isalnum():
+                return value
+            return None
+    return None
+
+class SecurityHeadersMiddleware:
+    """Pure ASGI middleware: adds security headers, X-Request-ID and X-Response-Time.
+
+    Headers are injected into http.response.start; the body is passed through
+    untouched, so streaming responses keep streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        request_id = _client_request_id(scope) or uuid.uuid4().hex.encode()
+        # Available to handlers as request.state.request_id
+        scope.setdefault("state", {})["request_id"] = request_id.decode()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    *SECURITY_HEADERS,
+                    (REQUEST_ID_HEADER, request_id),
+                    (b"x-response-time", f"{elapsed_ms:.2f}ms".encode()),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
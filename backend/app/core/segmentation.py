@@ -0,0 +1,206 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, delete, func, case, extract
+from app.models.models import (
+    Customer as CustomerModel, Interaction as InteractionModel,
+    Referral as ReferralModel, CustomerSegment
+)
+from app.core.scoring import RECENCY_WINDOW_DAYS, chunked, utc_epoch, stale_customer_ids
+from typing import TYPE_CHECKING, Dict, List, Optional
+from datetime import datetime, timedelta
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Segments in priority order: a customer lands in the first rule that matches
+SEGMENTS = [
+    "new_engaged",
+    "new",
+    "high_value_dormant",
+    "loyal",
+    "dormant",
+    "at_risk",
+    "active",
+]
+
+NEW_CUSTOMER_DAYS = 30
+ENGAGED_RECENT_INTERACTIONS = 2
+HIGH_VALUE_THRESHOLD = 10.0     # see customer_value()
+AT_RISK_DAYS = 30
+HIGH_VALUE_DORMANT_DAYS = 60
+DORMANT_DAYS = 90
+
+# Segments older than this are re-assigned even without new interactions: the
+# rules above are in days, and referrals don't move the interaction watermark
+SEGMENT_MAX_AGE_HOURS = 24
+
+def build_feature_vectors(
+    db: Session,
+    user_id: int,
+    customer_ids: Optional[List[int]] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, "np.ndarray"]:
+    """Build per-customer feature arrays from customers, interactions and referrals"""
+    import numpy as np
+    now_ts = utc_epoch(now or datetime.utcnow())
+    recent_cutoff = datetime.utcfromtimestamp(now_ts - RECENCY_WINDOW_DAYS * 86400)
+
+    customer_query = select(
+        CustomerModel.id,
+        extract("epoch", CustomerModel.created_at),
+        extract("epoch", CustomerModel.last_contacted),
+    ).where(CustomerModel.user_id == user_id)
+    interaction_query = select(
+        InteractionModel.customer_id,
+        func.count(InteractionModel.id),
+        func.sum(case((InteractionModel.timestamp >= recent_cutoff, 1), else_=0)),
+        func.min(extract("epoch", InteractionModel.timestamp)),
+        func.max(extract("epoch", InteractionModel.timestamp)),
+        func.max(InteractionModel.id),
+    ).join(
+        CustomerModel, CustomerModel.id == InteractionModel.customer_id
+    ).where(CustomerModel.user_id == user_id).group_by(InteractionModel.customer_id)
+    referral_query = select(
+        ReferralModel.customer_id,
+        func.count(ReferralModel.id),
+        func.sum(case((ReferralModel.status == "completed", ReferralModel.reward_points), else_=0)),
+    ).where(ReferralModel.user_id == user_id).group_by(ReferralModel.customer_id)
+
+    if customer_ids is not None:
+        customer_query = customer_query.where(CustomerModel.id.in_(customer_ids))
+        interaction_query = interaction_query.where(InteractionModel.customer_id.in_(customer_ids))
+        referral_query = referral_query.where(ReferralModel.customer_id.in_(customer_ids))
+
+    connection = db.connection()
+    customers = np.array(
+        [tuple(row) for row in connection.execute(customer_query.order_by(CustomerModel.id))],
+        dtype=np.float64
+    ).reshape(-1, 3)
+    ids = customers[:, 0].astype(np.int64)
+    n = len(ids)
+
+    features = {
+        "customer_ids": ids,
+        "created_ts": customers[:, 1],  # NaN for rows created before the column existed
+        "last_contacted_ts": customers[:, 2],
+        "interaction_count": np.zeros(n, dtype=np.int64),
+        "recent_interactions": np.zeros(n, dtype=np.int64),
+        "first_interaction_ts": np.full(n, np.nan),
+        "last_interaction_ts": np.full(n, np.nan),
+        "last_interaction_id": np.zeros(n, dtype=np.int64),
+        "referral_count": np.zeros(n, dtype=np.int64),
+        "reward_points": np.zeros(n, dtype=np.float64),
+    }
+    if n == 0:
+        return features
+
+    interactions = np.array(
+        [tuple(row) for row in connection.execute(interaction_query)], dtype=np.float64
+    ).reshape(-1, 6)
+    if len(interactions):
+        idx = np.searchsorted(ids, interactions[:, 0].astype(np.int64))
+        features["interaction_count"][idx] = interactions[:, 1]
+        features["recent_interactions"][idx] = interactions[:, 2]
+        features["first_interaction_ts"][idx] = interactions[:, 3]
+        features["last_interaction_ts"][idx] = interactions[:, 4]
+        features["last_interaction_id"][idx] = interactions[:, 5]
+
+    referrals = np.array(
+        [tuple(row) for row in connection.execute(referral_query)], dtype=np.float64
+    ).reshape(-1, 3)
+    if len(referrals):
+        # Referrals may point at customers outside the requested set or with no customer at all
+        referrals = referrals[np.isin(referrals[:, 0], ids)]
+        idx = np.searchsorted(ids, referrals[:, 0].astype(np.int64))
+        features["referral_count"][idx] = referrals[:, 1]
+        features["reward_points"][idx] = np.nan_to_num(referrals[:, 2])
+
+    return features
+
+def customer_value(features: Dict[str, "np.ndarray"]) -> "np.ndarray":
+    """Relationship value: interactions plus weighted referrals and earned rewards"""
+    return (
+        features["interaction_count"]
+        + 3.0 * features["referral_count"]
+        + features["reward_points"] / 50.0
+    )
+
+def assign_segments(features: Dict[str, "np.ndarray"], now_ts: float) -> "np.ndarray":
+    """Vectorized rule buckets; returns an array of segment names"""
+    import numpy as np
+    # Tenure falls back to the first interaction for customers without created_at
+    created = np.where(np.isnan(features["created_ts"]), features["first_interaction_ts"], features["created_ts"])
+    tenure_days = np.where(np.isnan(created), np.inf, (now_ts - created) / 86400.0)
+
+    last_touch = np.fmax(features["last_interaction_ts"], features["last_contacted_ts"])
+    days_since = np.where(np.isnan(last_touch), np.inf, (now_ts - last_touch) / 86400.0)
+
+    is_new = tenure_days <= NEW_CUSTOMER_DAYS
+    engaged = features["recent_interactions"] >= ENGAGED_RECENT_INTERACTIONS
+    high_value = customer_value(features) >= HIGH_VALUE_THRESHOLD
+
+    conditions = [
+        is_new & engaged,
+        is_new,
+        high_value & (days_since >= HIGH_VALUE_DORMANT_DAYS),
+        high_value,
+        days_since >= DORMANT_DAYS,
+        days_since >= AT_RISK_DAYS,
+    ]
+    return np.select(conditions, SEGMENTS[:-1], default=SEGMENTS[-1])
+
+def refresh_segments(
+    db: Session,
+    user_id: int,
+    customer_ids: Optional[List[int]] = None,
+    now: Optional[datetime] = None
+) -> int:
+    """Re-assign and persist segments for a tenant, or for a subset of its customers"""
+    now = now or datetime.utcnow()
+    features = build_feature_vectors(db, user_id, customer_ids, now)
+    ids = features["customer_ids"]
+    if len(ids) == 0:
+        return 0
+
+    segments = assign_segments(features, utc_epoch(now))
+    rows = [
+        {
+            "customer_id": customer_id,
+            "user_id": user_id,
+            "segment": segment,
+            "last_interaction_id": last_id,
+            "assigned_at": now,
+        }
+        for customer_id, segment, last_id in zip(
+            ids.tolist(), segments.tolist(), features["last_interaction_id"].tolist()
+        )
+    ]
+
+    if customer_ids is None:
+        db.execute(delete(CustomerSegment).where(CustomerSegment.user_id == user_id))
+    else:
+        for chunk in chunked(ids.tolist()):
+            db.execute(delete(CustomerSegment).where(CustomerSegment.customer_id.in_(chunk)))
+    db.execute(insert(CustomerSegment.__table__), rows)
+    db.commit()
+
+    return len(rows)
+
+def refresh_stale_segments(db: Session, user_id: int, now: Optional[datetime] = None) -> int:
+    """Re-assign only customers with interactions newer than their stored segment,
+    or whose segment is older than SEGMENT_MAX_AGE_HOURS"""
+    now = now or datetime.utcnow()
+    customer_ids = stale_customer_ids(
+        db, user_id, CustomerSegment, CustomerSegment.assigned_at, now - timedelta(hours=SEGMENT_MAX_AGE_HOURS)
+    )
+    if not customer_ids:
+        return 0
+    return refresh_segments(db, user_id, customer_ids, now)
+
+def segment_counts(db: Session, user_id: int) -> Dict[str, int]:
+    """Number of customers per segment (answered from the segment index)"""
+    rows = db.query(CustomerSegment.segment, func.count(CustomerSegment.customer_id)).filter(
+        CustomerSegment.user_id == user_id
+    ).group_by(CustomerSegment.segment).all()
+    counts = {segment: 0 for segment in SEGMENTS}
+    counts.update({segment: count for segment, count in rows})
+    return counts
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Number of verified tokens kept per process
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+def token_digest(token: str) -> bytes:
+    """Cache key for a token; the raw bearer token is never stored"""
+    return hashlib.sha256(token.encode()).digest()
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified JWT claims, each entry kept until the token's exp"""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, clock=time.time):
+        self.max_size = max_size
+        self.clock = clock
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._revoked: Dict[bytes, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = token_digest(token)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, claims: Dict[str, Any]) -> None:
+        """Cache claims that were just verified; tokens without exp are not cached"""
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        key = token_digest(token)
+        with self._lock:
+            # A revoke may have landed while this token was being verified
+            if key in self._revoked or expires_at <= self.clock():
+                return
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def revoke(self, token: str, expires_at: Optional[float] = None) -> None:
+        """Evict a token and refuse it until it expires (process-local)"""
+        key = token_digest(token)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if expires_at is None:
+                expires_at = entry[1] if entry is not None else now + 24 * 3600
+            self._revoked[key] = expires_at
+            # Expired revocations are harmless to drop: the signature check rejects them anyway
+            self._revoked = {k: exp for k, exp in self._revoked.items() if exp > now}
+
+    def is_revoked(self, token: str) -> bool:
+        with self._lock:
+            return token_digest(token) in self._revoked
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._revoked.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "revoked": len(self._revoked),
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+token_cache = VerifiedTokenCache()
@@ -1,22 +1,152 @@
-from sqlalchemy import create_engine
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 import os
 from dotenv import load_dotenv
+import functools
+import logging
+import re
+import time
+from typing import Any, List, Optional
+from app.core.metrics import current_request
+from app.database.sharding import DEFAULT_SHARD, FROZEN, ShardRouter, parse_shard_urls
 
 load_dotenv()
 
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Connection pool for server databases (one pool per process; serverless instances want it small)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+
+def engine_options(url: str) -> dict:
+    """SQLite connections cross threads; server connections are checked before reuse,
+    since a frozen serverless instance can hold sockets the database already closed"""
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+# Created once per process; connections are only opened when a session first needs one
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Extra tenant databases, "name=url,name=url". DATABASE_URL stays the directory
+# (users and tenant placement) and the shard named "default".
+DATABASE_SHARDS = parse_shard_urls(os.getenv("DATABASE_SHARDS", ""))
+shards = ShardRouter({
+    DEFAULT_SHARD: engine,
+    **{name: create_engine(url, **engine_options(url)) for name, url in DATABASE_SHARDS.items()}
+})
+
 Base = declarative_base()
 
-def get_db():
+# Statements slower than this are logged with the shape of their parameters
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+logger = logging.getLogger("app.sql")
+
+_PLACEHOLDER = r"(?:\?|%\(\w+\)s|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)")
+
+@functools.lru_cache(maxsize=4096)
+def statement_shape(statement: str) -> str:
+    """Statement with whitespace normalised and expanded IN (...) lists collapsed"""
+    return _PLACEHOLDER_LIST.sub("(?, ...)", " ".join(statement.split()))
+
+def parameter_shape(parameters, executemany: bool = False) -> str:
+    """Types of the bound parameters, never their values"""
+    if executemany:
+        return f"{len(parameters)} x {parameter_shape(parameters[0]) if parameters else '()'}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in parameters or ()) + ")"
+
+# Statement timing for every engine, attributed to the request being served
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    request = current_request.get()
+    if request is not None:
+        request.record_statement(statement_shape(statement), elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.1f ms): %s -- params %s",
+            elapsed * 1000, statement_shape(statement), parameter_shape(parameters, executemany)
+        )
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Seconds a client is asked to wait while its tenant is being moved between shards
+TENANT_MOVE_RETRY_AFTER = "5"
+
+async def request_tenant(request: Request) -> Optional[int]:
+    """The tenant a request works on when sharded: user_id from the path, query
+    string or JSON body, or an X-Tenant-ID header"""
+    if not shards.sharded:
+        return None
+    value = (request.path_params.get("user_id") or request.query_params.get("user_id")
+             or request.headers.get("x-tenant-id"))
+    if value is None and request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        # String user_ids (sign-up, login) are logins, not tenants
+        if isinstance(body, dict) and isinstance(body.get("user_id"), int):
+            value = body["user_id"]
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+def get_db(request: Request, tenant: Optional[int] = Depends(request_tenant)):
+    """A session on the requesting tenant's shard. When sharded, a request that
+    names no tenant is refused rather than served from the directory database."""
+    if tenant is None:
+        if shards.sharded:
+            raise HTTPException(
+                status_code=400,
+                detail="Name the account with a user_id or an X-Tenant-ID header"
+            )
+        db = SessionLocal()
+    else:
+        shard, state = shards.placement(tenant)
+        if state == FROZEN and request.method not in READ_METHODS:
+            raise HTTPException(
+                status_code=503,
+                detail="This account is being moved to another database; retry shortly",
+                headers={"Retry-After": TENANT_MOVE_RETRY_AFTER}
+            )
+        db = shards.sessionmakers[shard]()
+        db.info["tenant"] = tenant
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_directory_db():
+    """A session on the directory database, for routes about users rather than a tenant's data"""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def tenant_criteria(db: Session, user_id_column) -> List[Any]:
+    """Filters keeping a lookup by id within the request's tenant: a shard holds
+    several tenants, and on SQLite shards their ids overlap"""
+    tenant = db.info.get("tenant")
+    return [] if tenant is None else [user_id_column == tenant]
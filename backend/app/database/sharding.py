@@ -0,0 +1,206 @@
+"""Tenant sharding: which database holds a tenant's rows.
+
+DATABASE_URL is the directory database. It holds every users row and the
+tenant_shards directory, and is itself the shard named "default"; extra
+shards come from DATABASE_SHARDS. A tenant lives on the shard its directory
+entry names, or, with no entry, on its consistent-hash ring position. Sign-up
+pins new tenants in the directory, so adding a shard to the ring never moves
+an existing tenant; only migrate_tenant.py does.
+"""
+import bisect
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple, TypeVar
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, insert, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+DEFAULT_SHARD = "default"
+ACTIVE = "active"
+FROZEN = "frozen"  # being moved: reads are served from the old shard, writes get a 503
+
+# Points per shard on the hash ring; more points give a more even split
+RING_REPLICAS = 64
+
+# How long a tenant's directory entry is trusted before it is read again.
+# migrate_tenant.py waits this long after every directory change.
+SHARD_DIRECTORY_CACHE_SECONDS = float(os.getenv("SHARD_DIRECTORY_CACHE_SECONDS", "30"))
+
+# Postgres shards hand out ids from disjoint ranges (shard n starts at n * span),
+# so a tenant's rows can be copied to another shard without renumbering
+SHARD_ID_SPAN = 2 ** 40
+
+directory_metadata = MetaData()
+
+tenant_shards = Table(
+    "tenant_shards", directory_metadata,
+    Column("user_id", Integer, primary_key=True),  # users.id
+    Column("shard", String, nullable=False),
+    Column("state", String, nullable=False, default=ACTIVE),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now(), onupdate=func.now()),
+)
+
+T = TypeVar("T")
+
+def parse_shard_urls(value: str) -> Dict[str, str]:
+    """Shards from "name=url,name=url" (URLs may contain "=", not ",")"""
+    shards = {}
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        name, _, url = (part.strip() for part in item.partition("="))
+        if not name or not url:
+            raise ValueError(f"DATABASE_SHARDS entries must be name=url, got {item!r}")
+        if name == DEFAULT_SHARD or name in shards:
+            raise ValueError(f"Duplicate shard name {name!r} in DATABASE_SHARDS")
+        shards[name] = url
+    return shards
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+class HashRing:
+    """Consistent hashing: adding a shard only moves the keys that land on its points"""
+
+    def __init__(self, names: Iterable[str], replicas: int = RING_REPLICAS):
+        points = sorted((_hash(f"{name}#{i}"), name) for name in names for i in range(replicas))
+        self._keys = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def get(self, key: Any) -> str:
+        return self._names[bisect.bisect(self._keys, _hash(str(key))) % len(self._keys)]
+
+class ShardRouter:
+    """Engines (each with its own pool) and sessions per shard, and tenant placement"""
+
+    def __init__(self, engines: Dict[str, Engine], directory: str = DEFAULT_SHARD):
+        self.engines = engines
+        self.directory = directory
+        self.sessionmakers = {
+            name: sessionmaker(autocommit=False, autoflush=False, bind=engine) for name, engine in engines.items()
+        }
+        self.ring = HashRing(engines)
+        # user_id -> (expires, shard, state)
+        self._cache: Dict[int, Tuple[float, str, str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.engines) > 1
+
+    def placement(self, user_id: int) -> Tuple[str, str]:
+        """(shard, state) for a tenant: its directory entry, else its ring position"""
+        if not self.sharded:
+            return self.directory, ACTIVE
+        now = time.monotonic()
+        cached = self._cache.get(user_id)
+        if cached is not None and cached[0] > now:
+            return cached[1], cached[2]
+        with self.engines[self.directory].connect() as conn:
+            row = conn.execute(
+                select(tenant_shards.c.shard, tenant_shards.c.state).where(tenant_shards.c.user_id == user_id)
+            ).first()
+        shard, state = (row.shard, row.state) if row is not None else (self.ring.get(user_id), ACTIVE)
+        with self._lock:
+            self._cache[user_id] = (now + SHARD_DIRECTORY_CACHE_SECONDS, shard, state)
+        return shard, state
+
+    def shard_for(self, user_id: int) -> str:
+        return self.placement(user_id)[0]
+
+    def session(self, user_id: Optional[int] = None) -> Session:
+        """A session on the tenant's shard; the directory database when no tenant is given"""
+        shard = self.directory if user_id is None else self.shard_for(user_id)
+        return self.sessionmakers[shard]()
+
+    def assign(self, user_id: int, shard: str, state: str = ACTIVE) -> None:
+        """Write a tenant's directory entry. Other processes see it within the cache TTL."""
+        if shard not in self.engines:
+            raise ValueError(f"Unknown shard {shard!r}")
+        with self.engines[self.directory].begin() as conn:
+            changed = conn.execute(
+                update(tenant_shards).where(tenant_shards.c.user_id == user_id).values(shard=shard, state=state)
+            ).rowcount
+            if not changed:
+                conn.execute(insert(tenant_shards).values(user_id=user_id, shard=shard, state=state))
+        self.forget(user_id)
+
+    def forget(self, user_id: int) -> None:
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+    def place(self, user_id: int) -> str:
+        """Pin a new tenant to its ring shard, so later ring changes leave it where it is"""
+        shard = self.ring.get(user_id) if self.sharded else self.directory
+        if self.sharded:
+            self.assign(user_id, shard)
+        return shard
+
+    def tenants_on(self, shard: str, user_ids: Iterable[int]) -> Set[int]:
+        """Those of `user_ids` that live on `shard` and aren't being moved. A shard's
+        users table also lists tenants placed elsewhere: the directory's lists every
+        tenant, and a move with --keep-source leaves a copy behind."""
+        user_ids = list(user_ids)
+        if not self.sharded:
+            return set(user_ids)
+        with self.engines[self.directory].connect() as conn:
+            pinned = {
+                row.user_id: (row.shard, row.state)
+                for row in conn.execute(
+                    select(tenant_shards.c.user_id, tenant_shards.c.shard, tenant_shards.c.state)
+                    .where(tenant_shards.c.user_id.in_(user_ids))
+                )
+            }
+        return {
+            user_id for user_id in user_ids
+            if pinned.get(user_id, (self.ring.get(user_id), ACTIVE)) == (shard, ACTIVE)
+        }
+
+    def replicate(self, user_id: int, table: Table, row: Dict[str, Any]) -> None:
+        """Copy a directory-owned row (the tenant's users row) onto the tenant's shard"""
+        shard = self.shard_for(user_id)
+        if shard == self.directory:
+            return
+        key = list(table.primary_key.columns)[0]
+        with self.engines[shard].begin() as conn:
+            # Updated in place: the tenant's rows on the shard reference it
+            if not conn.execute(update(table).where(key == row[key.name]).values(row)).rowcount:
+                conn.execute(insert(table).values(row))
+
+    def scatter_gather(self, fn: Callable[[Session], T], shards: Optional[Iterable[str]] = None) -> Dict[str, T]:
+        """Run fn on every shard at once, each with its own session (its shard name in
+        db.info["shard"]); results by shard name"""
+        names = list(shards or self.engines)
+
+        def run(name: str) -> T:
+            with self.sessionmakers[name]() as db:
+                db.info["shard"] = name
+                return fn(db)
+
+        if len(names) == 1:
+            return {names[0]: run(names[0])}
+        with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="scatter") as pool:
+            futures = {name: pool.submit(run, name) for name in names}
+            return {name: future.result() for name, future in futures.items()}
+
+    def create_all(self, metadata: MetaData) -> None:
+        """Create the schema on every shard and the directory table on the directory"""
+        directory_metadata.create_all(bind=self.engines[self.directory])
+        for index, (name, engine) in enumerate(self.engines.items()):
+            metadata.create_all(bind=engine)
+            if index and engine.dialect.name == "postgresql":
+                _offset_sequences(engine, metadata, index * SHARD_ID_SPAN)
+
+def _offset_sequences(engine: Engine, metadata: MetaData, start: int) -> None:
+    """Start a fresh Postgres shard's id sequences at its own range"""
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if "id" not in table.c or not table.c.id.primary_key:
+                continue
+            sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table.name}).scalar()
+            if sequence is None:
+                continue
+            is_called = conn.execute(text(f"SELECT is_called FROM {sequence}")).scalar()
+            if not is_called:
+                conn.execute(text("SELECT setval(:sequence, :start, false)"), {"sequence": sequence, "start": start})
@@ -4,12 +4,99 @@ import os
 # Add the parent directory to the path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database.database import engine, Base
-from app.models.models import User, SocialAccount, Customer, Referral, Interaction
+from sqlalchemy import inspect, text, select, update, delete, func
+from sqlalchemy.engine import Engine
+from app.database.database import Base, shards
+from app.core.rollups import DAILY_METRICS_ROLLUP
+from app.models.models import User, SocialAccount, Customer, Referral, Interaction, CustomerScore, CustomerSegment, CustomerContactHistogram, RollupWatermark, DailyResponseRollup, DailyTenantMetrics, FollowUpPolicy, FollowUpDailyCount, FollowUpCheckpoint
+
+# Columns added to tables that existing databases already have; create_all
+# doesn't alter existing tables, so init_db adds these where they are missing
+ADDED_COLUMNS = [
+    Customer.__table__.c.created_at,
+    Referral.__table__.c.created_at,
+]
+
+def add_missing_columns(engine: Engine, columns=ADDED_COLUMNS) -> list:
+    """Add each column to its table if the table exists without it. Existing rows
+    get NULL (see backfill_created_at); the server default only applies to rows inserted afterwards."""
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for column in columns:
+            table = column.table.name
+            if not inspector.has_table(table):
+                continue
+            if column.name in {existing["name"] for existing in inspector.get_columns(table)}:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column.name} {column_type}"))
+            # SQLite can't add a column defaulting to the current time; the model's
+            # Python-side default covers rows inserted through the app there
+            if column.server_default is not None and engine.dialect.name == "postgresql":
+                default = column.server_default.arg.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column.name} SET DEFAULT {default}"))
+            added.append(f"{table}.{column.name}")
+    return added
+
+def create_missing_indexes(engine: Engine, metadata=Base.metadata) -> list:
+    """Create the models' indexes that existing tables lack; create_all only
+    indexes the tables it creates"""
+    inspector = inspect(engine)
+    created = []
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                index.create(bind=engine, checkfirst=True)
+                created.append(index.name)
+    return created
+
+def backfill_created_at(engine: Engine) -> int:
+    """Date the rows that predate created_at, so daily metrics count them: a customer
+    by its first interaction, a referral by its customer, otherwise the upgrade time.
+    The affected tenants' daily metrics are rebuilt on their next read."""
+    customers, referrals = Customer.__table__, Referral.__table__
+    interactions, watermarks = Interaction.__table__, RollupWatermark.__table__
+    fills = [
+        (customers, select(func.min(interactions.c.timestamp)).where(
+            interactions.c.customer_id == customers.c.id
+        ).scalar_subquery()),
+        (referrals, select(customers.c.created_at).where(
+            customers.c.id == referrals.c.customer_id
+        ).scalar_subquery()),
+    ]
+    inspector = inspect(engine)
+    fills = [
+        (table, first_seen) for table, first_seen in fills
+        if "created_at" in {column["name"] for column in inspector.get_columns(table.name)}
+    ]
+    tenants = set()
+    with engine.begin() as conn:
+        for table, first_seen in fills:
+            undated = table.c.created_at.is_(None)
+            tenants.update(conn.execute(select(table.c.user_id).where(undated).distinct()).scalars())
+            conn.execute(update(table).where(undated).values(created_at=func.coalesce(first_seen, func.now())))
+        tenants.discard(None)
+        if tenants:
+            conn.execute(delete(watermarks).where(
+                watermarks.c.name == DAILY_METRICS_ROLLUP, watermarks.c.user_id.in_(tenants)
+            ))
+    return len(tenants)
 
 def init_db():
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    # Create all tables, on every shard when DATABASE_SHARDS is set
+    shards.create_all(Base.metadata)
+    for name, engine in shards.engines.items():
+        for column in add_missing_columns(engine):
+            print(f"Added {column} on {name}")
+        for index in create_missing_indexes(engine):
+            print(f"Created index {index} on {name}")
+        backfilled = backfill_created_at(engine)
+        if backfilled:
+            print(f"Dated older customers and referrals of {backfilled} tenants on {name}")
     print("Database tables created successfully!")
 
 if __name__ == "__main__":
@@ -4,18 +4,45 @@ import os
 # Add the parent directory to the path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import auth, customers, referrals, dashboard, social, ai_assistant, digital_presence, messaging, ai_image_generator
 from app.core.security_utils import SecurityHeadersMiddleware, limiter
-from slowapi.errors import RateLimitExceeded
-from slowapi import _rate_limit_exceeded_handler
+from app.core import metrics
+from app.core.profiling import ProfilingMiddleware
+from app.core.memory import MemoryMiddleware
+from app.core.lazy import include_routers, start_warm_up
+from app.core.http_client import close_http_client
 
-def create_app():
+# (module, prefix, tags); imported on the first request under the prefix unless LAZY_ROUTERS=false
+ROUTERS = [
+    ("app.api.auth", "/auth", ["auth"]),
+    ("app.api.customers", "/customers", ["customers"]),
+    ("app.api.referrals", "/referrals", ["referrals"]),
+    ("app.api.dashboard", "/dashboard", ["dashboard"]),
+    ("app.api.social", "/social", ["social"]),
+    ("app.api.ai_assistant", "/ai", ["ai"]),
+    ("app.api.ai_image_generator", "/ai", ["ai"]),
+    ("app.api.digital_presence", "/digital-presence", ["digital-presence"]),
+    ("app.api.messaging", "/messaging", ["messaging"]),
+    ("app.api.realtime", "/realtime", ["realtime"]),
+    ("app.api.admin", "/admin", ["admin"]),
+]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pre-import routers and heavy dependencies once the server is accepting requests
+    start_warm_up(app)
+    yield
+    await close_http_client()
+
+def create_app(lazy_routers=None):
     app = FastAPI(
         title="Micro-Entrepreneur Growth App",
         description="Backend API for Micro-Entrepreneur Growth App",
-        version="0.1.0"
+        version="0.1.0",
+        lifespan=lifespan
     )
     
     # Add security middleware
@@ -39,23 +66,28 @@ def create_app():
     
     # Add rate limiter
     app.state.limiter = limiter
-    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+    
+    # Per-route memory growth and the per-request memory guard
+    app.add_middleware(MemoryMiddleware)
+    
+    # Opt-in sampling profiles for admins (inactive unless ADMIN_TOKEN is set)
+    app.add_middleware(ProfilingMiddleware)
+    
+    # Outermost, so latency covers the whole stack
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.start_flusher()
     
     # Include routers
-    app.include_router(auth.router, prefix="/auth", tags=["auth"])
-    app.include_router(customers.router, prefix="/customers", tags=["customers"])
-    app.include_router(referrals.router, prefix="/referrals", tags=["referrals"])
-    app.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
-    app.include_router(social.router, prefix="/social", tags=["social"])
-    app.include_router(ai_assistant.router, prefix="/ai", tags=["ai"])
-    app.include_router(ai_image_generator.router, prefix="/ai", tags=["ai"])
-    app.include_router(digital_presence.router, prefix="/digital-presence", tags=["digital-presence"])
-    app.include_router(messaging.router, prefix="/messaging", tags=["messaging"])
+    include_routers(app, ROUTERS, lazy=lazy_routers)
     
     @app.get("/")
     async def root():
         return {"message": "Micro-Entrepreneur Growth App API"}
     
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+    
     return app
 
 app = create_app()
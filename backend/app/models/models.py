@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Float
+from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, Boolean, Float, Index, LargeBinary
 from sqlalchemy.sql import func
 from app.database.database import Base
-from passlib.hash import bcrypt
+from app.core.passwords import hash_password_sync, verify_password_sync
 
 class User(Base):
     __tablename__ = "users"
@@ -16,10 +16,10 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     def set_password(self, password):
-        self.password_hash = bcrypt.hash(password)
+        self.password_hash = hash_password_sync(password)
     
     def check_password(self, password):
-        return bcrypt.verify(password, self.password_hash)
+        return verify_password_sync(password, self.password_hash)
 
 class SocialAccount(Base):
     __tablename__ = "social_accounts"
@@ -33,6 +33,10 @@ class SocialAccount(Base):
 
 class Customer(Base):
     __tablename__ = "customers"
+    __table_args__ = (
+        # Follow-up sweep: WHERE user_id = ? AND last_contacted < ? ORDER BY last_contacted, id
+        Index("ix_customers_user_last_contacted", "user_id", "last_contacted", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -40,6 +44,8 @@ class Customer(Base):
     contact_info = Column(String)
     last_contacted = Column(DateTime(timezone=True))
     notes = Column(String)
+    # Added after launch (see init_db.ADDED_COLUMNS); older customers are dated by init_db.backfill_created_at
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), default=func.now())
 
 class Referral(Base):
     __tablename__ = "referrals"
@@ -50,12 +56,120 @@ class Referral(Base):
     referred_by = Column(String)  # Could be user_id or customer_id
     status = Column(String)  # pending, accepted, completed
     reward_points = Column(Integer)
+    # Added after launch (see init_db.ADDED_COLUMNS); older referrals are dated by init_db.backfill_created_at
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), default=func.now())
 
 class Interaction(Base):
     __tablename__ = "interactions"
+    __table_args__ = (
+        # Conversation reads and keyset paging: WHERE customer_id = ? ORDER BY timestamp, id
+        Index("ix_interactions_customer_ts_id", "customer_id", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.id"))
     message = Column(String)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
-    sent_by = Column(String)  # user_id or system
\ No newline at end of file
+    sent_by = Column(String)  # user_id or system
+
+class CustomerScore(Base):
+    __tablename__ = "customer_scores"
+    __table_args__ = (
+        Index("ix_customer_scores_user_engagement", "user_id", "engagement_score"),
+    )
+    
+    customer_id = Column(Integer, ForeignKey("customers.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    interaction_count = Column(Integer, default=0)
+    inbound_count = Column(Integer, default=0)
+    recent_count = Column(Integer, default=0)  # interactions in the recency window
+    last_interaction_at = Column(DateTime(timezone=True))
+    last_interaction_id = Column(Integer, default=0)  # watermark for incremental refresh
+    recency_score = Column(Float, default=0.0)
+    frequency_score = Column(Float, default=0.0)
+    engagement_score = Column(Float, default=0.0)
+    churn_risk = Column(Float, default=0.0)
+    best_contact_hour = Column(Integer)  # 0-23, None when there is no history
+    computed_at = Column(DateTime(timezone=True))
+
+class CustomerSegment(Base):
+    __tablename__ = "customer_segments"
+    __table_args__ = (
+        Index("ix_customer_segments_user_segment", "user_id", "segment", "customer_id"),
+    )
+    
+    customer_id = Column(Integer, ForeignKey("customers.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    segment = Column(String)  # see app.core.segmentation.SEGMENTS
+    last_interaction_id = Column(Integer, default=0)  # watermark for incremental re-assignment
+    assigned_at = Column(DateTime(timezone=True))
+
+class CustomerContactHistogram(Base):
+    __tablename__ = "customer_contact_histograms"
+    
+    customer_id = Column(Integer, ForeignKey("customers.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    histogram = Column(LargeBinary)  # 7x24 little-endian uint16 counts, see app.core.contact_time
+    total = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True))
+
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    name = Column(String, primary_key=True)  # which rollup this watermark belongs to
+    last_interaction_id = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True))
+
+class DailyResponseRollup(Base):
+    __tablename__ = "daily_response_rollups"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # day the outbound message was sent
+    outbound_count = Column(Integer, default=0)
+    responded_count = Column(Integer, default=0)  # outbound messages followed by a customer reply
+    response_seconds_total = Column(Float, default=0.0)
+
+class DailyTenantMetrics(Base):
+    __tablename__ = "daily_tenant_metrics"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    customers_added = Column(Integer, default=0)
+    messages_whatsapp = Column(Integer, default=0)  # messages sent by the agent, by platform
+    messages_sms = Column(Integer, default=0)
+    messages_email = Column(Integer, default=0)
+    messages_other = Column(Integer, default=0)
+    messages_received = Column(Integer, default=0)  # customer and system messages
+    referrals_pending = Column(Integer, default=0)  # referrals created that day, by current status
+    referrals_accepted = Column(Integer, default=0)
+    referrals_completed = Column(Integer, default=0)
+    referrals_other = Column(Integer, default=0)
+    rewards_earned = Column(Integer, default=0)
+    website_views = Column(Integer, default=0)
+
+class FollowUpPolicy(Base):
+    __tablename__ = "follow_up_policies"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    enabled = Column(Boolean, default=True)
+    stale_days = Column(Integer)  # None: FOLLOW_UP_STALE_DAYS
+    daily_cap = Column(Integer)  # None: FOLLOW_UP_DAILY_CAP
+    message = Column(String)  # None: FOLLOW_UP_MESSAGE; may use {customer_name}
+    updated_at = Column(DateTime(timezone=True))
+
+class FollowUpDailyCount(Base):
+    __tablename__ = "follow_up_daily_counts"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    sent = Column(Integer, default=0)  # automated follow-ups queued, counted against the daily cap
+
+class FollowUpCheckpoint(Base):
+    __tablename__ = "follow_up_checkpoints"
+    
+    name = Column(String, primary_key=True)  # which sweep this checkpoint belongs to
+    started_at = Column(DateTime(timezone=True))  # thresholds are measured from here
+    last_user_id = Column(Integer, default=0)  # tenants up to here are done
+    finished_at = Column(DateTime(timezone=True))  # None while a sweep is in progress
+    locked_at = Column(DateTime(timezone=True))  # set while a worker runs the sweep, refreshed per tenant
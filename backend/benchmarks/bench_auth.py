@@ -0,0 +1,61 @@
+"""Compare the cached and uncached JWT auth dependency.
+
+Reports per-call cost and the share of one CPU core the dependency would use
+at a target request rate (default 10k rps), e.g.:
+
+    python benchmarks/bench_auth.py --tokens 1000 --calls 100000 --rps 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+from app.core.security import create_access_token, get_current_user_id, SECRET_KEY, ALGORITHM
+from app.core.token_cache import token_cache
+
+def uncached_user_id(credentials: HTTPAuthorizationCredentials) -> str:
+    # What get_current_user_id did before the token cache
+    return jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+
+def run(dependency, requests) -> float:
+    start = time.perf_counter()
+    for credentials in requests:
+        dependency(credentials)
+    return (time.perf_counter() - start) / len(requests)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=1000, help="distinct active sessions")
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--rps", type=int, default=10000)
+    args = parser.parse_args()
+
+    tokens = [
+        HTTPAuthorizationCredentials(
+            scheme="Bearer",
+            credentials=create_access_token({"sub": f"user{i}"}, expires_delta=timedelta(minutes=30))
+        )
+        for i in range(args.tokens)
+    ]
+    requests = [random.choice(tokens) for _ in range(args.calls)]
+
+    token_cache.clear()
+    results = {
+        "uncached": run(uncached_user_id, requests),
+        "cached": run(get_current_user_id, requests),
+    }
+
+    print(f"{args.calls} calls over {args.tokens} tokens")
+    for name, seconds in results.items():
+        print(f"{name:>9}: {seconds * 1e6:8.2f} us/call  {seconds * args.rps * 100:6.1f}% of a core at {args.rps} rps")
+    print(f"  speedup: {results['uncached'] / results['cached']:.1f}x")
+    print(f"    cache: {token_cache.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Interactive task latency during a bulk campaign, one shared queue vs interactive + bulk queues.
+
+Runs in-process Celery workers on the in-memory broker (no Redis needed).
+A campaign of follow-ups is queued, then single notifications arrive while
+it drains; their wait from enqueue to send is reported. "shared" puts
+everything on one queue served by two workers (the old topology); "split"
+gives each queue its own worker. The campaign is queued once per
+item and once in chunks, to show the per-task overhead the chunks save:
+
+    python benchmarks/bench_celery.py --campaign 2000 --send-ms 1
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["CELERY_MODE"] = "memory"
+
+from celery.contrib.testing.worker import start_worker
+from app.core import celery_app as tasks
+from app.core.celery_app import celery_app, enqueue_follow_ups, send_follow_up_notification, BULK_QUEUE, INTERACTIVE_QUEUE
+
+sent = {}
+
+def fake_send(customer_name: str, message: str) -> None:
+    time.sleep(SEND_SECONDS)
+    sent[customer_name] = time.perf_counter()
+
+def wait_for(names, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while not all(name in sent for name in names):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{sum(name in sent for name in names)} of {len(names)} tasks ran")
+        time.sleep(0.005)
+
+def run(topology: str, campaign: int, probes: int, chunked: bool):
+    sent.clear()
+    # Two single-process workers either way, each on its own thread
+    workers = [(INTERACTIVE_QUEUE, BULK_QUEUE)] * 2 if topology == "shared" else [(INTERACTIVE_QUEUE,), (BULK_QUEUE,)]
+    # The shared topology is the old single queue: interactive work queues behind the campaign
+    probe_queue = BULK_QUEUE if topology == "shared" else INTERACTIVE_QUEUE
+    contexts = [start_worker(celery_app, pool="solo", queues=list(queues), perform_ping_check=False)
+                for queues in workers]
+    for context in contexts:
+        context.__enter__()
+    try:
+        campaign_names = [f"campaign-{i}" for i in range(campaign)]
+        start = time.perf_counter()
+        if chunked:
+            enqueue_follow_ups([(name, "Festival offer") for name in campaign_names])
+        else:
+            for name in campaign_names:
+                send_follow_up_notification.apply_async((name, "Festival offer"), queue=BULK_QUEUE)
+        queued = {}
+        for i in range(probes):
+            name = f"probe-{i}"
+            queued[name] = time.perf_counter()
+            send_follow_up_notification.apply_async((name, "Your order is ready"), queue=probe_queue)
+            time.sleep(0.01)
+        wait_for(list(queued) + campaign_names)
+        drained = time.perf_counter() - start
+    finally:
+        for context in reversed(contexts):
+            context.__exit__(None, None, None)
+    waits = sorted((sent[name] - queued[name]) * 1000 for name in queued)
+    return statistics.median(waits), waits[int(len(waits) * 0.95) - 1], drained
+
+def main():
+    global SEND_SECONDS
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--campaign", type=int, default=2000, help="follow-ups in the bulk campaign")
+    parser.add_argument("--probes", type=int, default=40, help="interactive notifications sent during it")
+    parser.add_argument("--send-ms", type=float, default=1.0, help="simulated time to send one message")
+    args = parser.parse_args()
+    SEND_SECONDS = args.send_ms / 1000
+    tasks._send_follow_up = fake_send
+
+    print(f"{'topology':<10}{'campaign':<10}{'p50 wait':>12}{'p95 wait':>12}{'drain':>10}")
+    for topology in ("shared", "split"):
+        for chunked in (False, True):
+            p50, p95, drained = run(topology, args.campaign, args.probes, chunked)
+            label = "chunked" if chunked else "per-item"
+            print(f"{topology:<10}{label:<10}{p50:>9.1f} ms{p95:>9.1f} ms{drained:>8.2f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Cold start to first response, eager vs lazy routers.
+
+Each sample is a fresh interpreter: it imports app.main, builds the app and
+sends its first requests through the ASGI transport. Times are measured
+from just before the process is spawned, so interpreter start-up counts:
+
+    python benchmarks/bench_cold_start.py --runs 10
+    python benchmarks/bench_cold_start.py --path /customers/ --path /dashboard/
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def child(paths, spawned_at: float) -> None:
+    import asyncio
+    started = time.time()
+    import httpx
+    from app.main import app
+    imported = time.time()
+
+    async def requests():
+        timings = []
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for path in paths:
+                response = await client.get(path)
+                timings.append({"path": path, "status": response.status_code, "at": time.time()})
+        return timings
+
+    timings = asyncio.run(requests())
+    print(json.dumps({
+        "interpreter_ms": (started - spawned_at) * 1000,
+        "import_ms": (imported - started) * 1000,
+        "responses": [{"path": t["path"], "status": t["status"], "ms": (t["at"] - spawned_at) * 1000}
+                      for t in timings],
+    }))
+
+def sample(paths, lazy: bool, database_url: str) -> dict:
+    env = dict(os.environ, LAZY_ROUTERS="true" if lazy else "false", DATABASE_URL=database_url,
+               RATE_LIMIT_ENABLED="false", WARM_UP="off")
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--spawned-at", repr(time.time())]
+    for path in paths:
+        command += ["--path", path]
+    result = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="fresh processes per mode")
+    parser.add_argument("--path", action="append", help="GET in order (default: / then the dashboard)")
+    parser.add_argument("--size", type=int, default=1000, help="customers in the seeded dataset")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--spawned-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.path, args.spawned_at)
+        return
+
+    import datasets
+    database_url = datasets.dataset_url(args.size, 42)
+    os.environ["DATABASE_URL"] = database_url
+    data = datasets.prepare(args.size, database_url=database_url)
+    paths = args.path or ["/", f"/dashboard/?user_id={data['user_id']}"]
+
+    for lazy in (False, True):
+        runs = [sample(paths, lazy, database_url) for _ in range(args.runs)]
+        print(f"{'lazy' if lazy else 'eager'} routers ({args.runs} runs, medians):")
+        print(f"  interpreter {statistics.median(r['interpreter_ms'] for r in runs):7.1f} ms")
+        print(f"  import      {statistics.median(r['import_ms'] for r in runs):7.1f} ms")
+        for i, path in enumerate(paths):
+            statuses = {r["responses"][i]["status"] for r in runs}
+            median = statistics.median(r["responses"][i]["ms"] for r in runs)
+            print(f"  first {path:<30} {median:7.1f} ms after spawn  (status {', '.join(map(str, statuses))})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Follow-up sweep cost at scale: time, statements and peak memory per sweep.
+
+Seeds a SQLite file with generate_data.py (Zipf-sized tenants, last_contacted
+spread over 2025), then runs one full sweep as of 2026-03-01 with a queue that
+only counts. Memory should stay flat as the customer count grows, since the
+sweep holds one page of tenants and one tenant's cap at a time:
+
+    python benchmarks/bench_follow_ups.py --customers 100000,1000000 --tenants 1000 --cap 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+import generate_data
+from app.database.database import Base
+from app.core import follow_ups
+
+NOW = datetime(2026, 3, 1)
+
+def run(customers: int, tenants: int, interactions: float):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'follow-ups.db')}")
+        Base.metadata.create_all(bind=engine)
+        generate_data.Generator(engine, seed=42, interactions_per_customer=interactions).run(tenants, customers)
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(1))
+        queued = []
+
+        def enqueue(notifications):
+            queued.append(len(notifications))
+            return 1
+
+        with Session(engine) as db:
+            tracemalloc.start()
+            start = time.perf_counter()
+            stats = follow_ups.sweep_stale_customers(db, enqueue, now=NOW)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        engine.dispose()
+    return stats, elapsed, len(statements), peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--customers", default="10000,100000", help="comma-separated dataset sizes")
+    parser.add_argument("--tenants", type=int, default=200)
+    parser.add_argument("--cap", type=int, default=50, help="daily follow-ups per tenant")
+    parser.add_argument("--stale-days", type=int, default=30)
+    parser.add_argument("--interactions", type=float, default=2, help="mean interactions per customer when seeding")
+    args = parser.parse_args()
+    follow_ups.FOLLOW_UP_DAILY_CAP = args.cap
+    follow_ups.FOLLOW_UP_STALE_DAYS = args.stale_days
+
+    print(f"{'customers':>10}{'tenants':>9}{'queued':>9}{'statements':>12}{'time':>10}{'peak memory':>14}")
+    for customers in (int(size) for size in args.customers.split(",")):
+        stats, elapsed, statements, peak = run(customers, args.tenants, args.interactions)
+        print(f"{customers:>10}{stats['tenants']:>9}{stats['customers']:>9}{statements:>12}"
+              f"{elapsed:>8.2f} s{peak / 2 ** 20:>11.1f} MB")
+
+if __name__ == "__main__":
+    main()
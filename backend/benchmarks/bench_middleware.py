@@ -0,0 +1,86 @@
+"""Per-request overhead of the security headers middleware, old vs new.
+
+Compares no middleware, the previous BaseHTTPMiddleware implementation and
+the pure-ASGI one on a plain route, a JSON list route and a streaming route:
+
+    python benchmarks/bench_middleware.py --requests 1000 --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.core.security_utils import SecurityHeadersMiddleware
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    # The implementation this replaced
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        return response
+
+def build_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+    if middleware is not None:
+        app.add_middleware(middleware)
+
+    customers = [{"id": i, "name": f"Customer {i}", "contact_info": f"c{i}@example.com"} for i in range(100)]
+
+    @app.get("/")
+    async def root():
+        return {"message": "ok"}
+
+    @app.get("/customers")
+    async def list_customers():
+        return customers
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(50):
+                yield f"data: {i}\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return app
+
+async def measure(app, path: str, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):
+            await client.get(path)
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get(path)
+        return (time.perf_counter() - start) / requests
+
+async def main(requests: int, rounds: int):
+    stacks = {
+        "none": build_app(),
+        "base_http": build_app(LegacySecurityHeadersMiddleware),
+        "pure_asgi": build_app(SecurityHeadersMiddleware),
+    }
+    for path in ("/", "/customers", "/stream"):
+        # Interleave the stacks and keep each one's best round to damp noise
+        best = {name: float("inf") for name in stacks}
+        for _ in range(rounds):
+            for name, app in stacks.items():
+                best[name] = min(best[name], await measure(app, path, requests))
+        print(path)
+        for name, seconds in best.items():
+            print(f"  {name:>10}: {seconds * 1e6:8.1f} us/request  overhead {(seconds - best['none']) * 1e6:7.1f} us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.rounds))
@@ -0,0 +1,45 @@
+"""Per-check overhead of the rate limiter stores.
+
+    python benchmarks/bench_rate_limit.py --checks 200000 --keys 1000
+    python benchmarks/bench_rate_limit.py --redis redis://localhost:6379/0
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.rate_limit import LocalBucketStore, SharedMemoryBucketStore, RedisBucketStore
+
+def run(store, keys, checks: int) -> float:
+    start = time.perf_counter()
+    for key in keys[:checks]:
+        store.consume(key, 5, 5 / 60)
+    return (time.perf_counter() - start) / checks
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checks", type=int, default=200000)
+    parser.add_argument("--keys", type=int, default=1000, help="distinct users being limited")
+    parser.add_argument("--redis", help="also measure the Redis store at this URL")
+    args = parser.parse_args()
+
+    keys = [f"app.api.ai_assistant.ai_assist:user:{random.randrange(args.keys)}" for _ in range(args.checks)]
+    with tempfile.TemporaryDirectory() as directory:
+        stores = {
+            "local": LocalBucketStore(),
+            "shared": SharedMemoryBucketStore(os.path.join(directory, "buckets")),
+        }
+        if args.redis:
+            import redis
+            stores["redis"] = RedisBucketStore(redis.Redis.from_url(args.redis))
+
+        for name, store in stores.items():
+            checks = args.checks if name != "redis" else min(args.checks, 20000)
+            print(f"{name:>7}: {run(store, keys, checks) * 1e6:7.2f} us/check")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""CPU per list request, response_model path vs the fast row serializers.
+
+Seeds an in-memory SQLite tenant, then for each page size measures process
+CPU time per request through the whole app (ASGI, no network) with
+FAST_JSON on and off, and checks that both return identical bodies:
+
+    python benchmarks/bench_serialization.py --pages 10,100,1000,5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database.database import Base, get_db
+from app.main import create_app
+from app.models.models import User, Customer, Referral
+from app.api import customers as customers_api, referrals as referrals_api, dashboard as dashboard_api
+
+MODULES = (customers_api, referrals_api, dashboard_api)
+
+def seed(customers: int):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        user_pk = conn.execute(insert(User).values(name="Bench", user_id="bench", password_hash="!")).inserted_primary_key[0]
+        conn.execute(insert(Customer), [
+            {"user_id": user_pk, "name": f"Customer {i}", "contact_info": f"+91 98{i:08d}",
+             "notes": "prefers WhatsApp" if i % 3 == 0 else None,
+             "last_contacted": start + timedelta(minutes=i * 7, microseconds=i)}
+            for i in range(customers)
+        ])
+        conn.execute(insert(Referral), [
+            {"user_id": user_pk, "customer_id": i + 1, "referred_by": f"Customer {i // 2}",
+             "status": "completed" if i % 2 else "pending", "reward_points": 100}
+            for i in range(customers)
+        ])
+    return engine, user_pk
+
+async def measure(client: httpx.AsyncClient, url: str, fast: bool, repeat: int):
+    for module in MODULES:
+        module.FAST_JSON = fast
+    body = (await client.get(url)).content  # warm-up, and the body to compare
+    start = time.process_time()
+    for _ in range(repeat):
+        await client.get(url)
+    return (time.process_time() - start) / repeat, body
+
+async def run(args):
+    pages = [int(page) for page in args.pages.split(",")]
+    engine, user_pk = seed(max(pages))
+    session = sessionmaker(bind=engine)()
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: session
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'endpoint':<22}{'page':>7}{'response_model':>16}{'fast':>10}{'speedup':>9}")
+        for page in pages:
+            urls = {
+                "/customers/": f"/customers/?user_id={user_pk}&limit={page}",
+                "/referrals/": f"/referrals/?user_id={user_pk}&limit={page}",
+            }
+            for name, url in urls.items():
+                repeat = max(3, args.rows // page)
+                slow, slow_body = await measure(client, url, False, repeat)
+                fast, fast_body = await measure(client, url, True, repeat)
+                assert fast_body == slow_body, f"{name} bodies differ"
+                print(f"{name:<22}{page:>7}{slow * 1000:>13.2f} ms{fast * 1000:>7.2f} ms{slow / fast:>8.1f}x")
+        # Unpaged: search returns every match, reports the whole tenant
+        for name, url in (("/customers/search", f"/customers/search?user_id={user_pk}&query=Customer%201"),
+                          ("/dashboard/reports", f"/dashboard/reports?user_id={user_pk}")):
+            slow, slow_body = await measure(client, url, False, 5)
+            fast, fast_body = await measure(client, url, True, 5)
+            assert fast_body == slow_body, f"{name} bodies differ"
+            body = httpx.Response(200, content=fast_body).json()
+            rows = len(body) if isinstance(body, list) else sum(len(items) for items in body.values())
+            print(f"{name:<22}{rows:>7}{slow * 1000:>13.2f} ms{fast * 1000:>7.2f} ms{slow / fast:>8.1f}x")
+    session.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", default="10,100,1000,5000", help="comma-separated page sizes")
+    parser.add_argument("--rows", type=int, default=50000, help="rows serialized per measurement")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,150 @@
+"""Cold and warm invocations of the serverless entry point (api/index.py).
+
+Simulates the function lifecycle locally: each instance is a fresh process
+that imports api/index.py (the cold start) and then serves a run of
+invocations, optionally idling between them as a frozen instance would.
+Requests go through the /api prefix like Vercel's rewrites, against a seeded
+dataset with Gemini mocked. Per instance it records how many database
+connections and HTTP clients were created, which should stay flat however
+many warm invocations follow:
+
+    python benchmarks/bench_serverless.py --instances 5 --invocations 50
+    python benchmarks/bench_serverless.py --idle-ms 200
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINT = os.path.join(os.path.dirname(BACKEND_DIR), "api", "index.py")
+sys.path.append(BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def invocations(data: dict) -> List[tuple]:
+    """(method, path, body) cycled through by every instance"""
+    user_id, customer_id = data["user_id"], data["first_customer_id"]
+    return [
+        ("GET", f"/api/dashboard/?user_id={user_id}", None),
+        ("GET", f"/api/customers/?user_id={user_id}&limit=20", None),
+        ("GET", f"/api/messaging/conversations/{customer_id}?user_id={user_id}", None),
+        ("POST", "/api/ai/marketing-content",
+         {"user_id": user_id, "content_type": "social_media", "topic": "Diwali offers"}),
+        ("GET", f"/api/referrals/stats?user_id={user_id}", None),
+    ]
+
+def instance(data: dict, count: int, idle: float, spawned_at: float) -> None:
+    import asyncio
+    import importlib.util
+    import httpx
+
+    started = time.time()
+    spec = importlib.util.spec_from_file_location("serverless_index", ENTRY_POINT)
+    index = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(index)
+    imported = time.time()
+
+    from sqlalchemy import event
+    from app.database.database import engine
+    from app.core import http_client
+    connects = []
+    event.listen(engine, "connect", lambda *args: connects.append(1))
+    clients = set()
+
+    async def serve():
+        results = []
+        requests = invocations(data)
+        transport = httpx.ASGITransport(app=index.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://function", timeout=60) as client:
+            for i in range(count):
+                method, path, body = requests[i % len(requests)]
+                begin = time.time()
+                response = await client.request(method, path, json=body)
+                results.append({"path": path.split("?")[0], "status": response.status_code,
+                                "ms": (time.time() - begin) * 1000, "at": time.time()})
+                clients.update(id(c) for c in http_client._clients.values())
+                if idle:
+                    await asyncio.sleep(idle)
+        return results
+
+    results = asyncio.run(serve())
+    print(json.dumps({
+        "interpreter_ms": (started - spawned_at) * 1000,
+        "import_ms": (imported - started) * 1000,
+        "cold_ms": (results[0]["at"] - spawned_at) * 1000,
+        "invocations": results,
+        "db_connections": len(connects),
+        "http_clients": len(clients),
+    }))
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--instances", type=int, default=5, help="cold starts")
+    parser.add_argument("--invocations", type=int, default=50, help="per instance, the first is cold")
+    parser.add_argument("--idle-ms", type=float, default=0, help="pause between invocations")
+    parser.add_argument("--size", type=int, default=1000, help="customers in the seeded dataset")
+    parser.add_argument("--gemini-latency-ms", type=float, default=50)
+    parser.add_argument("--instance", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.instance:
+        spawned_at, data = json.loads(args.instance)
+        instance(data, args.invocations, args.idle_ms / 1000, spawned_at)
+        return
+
+    import datasets
+    from mock_gemini import MockGemini
+    database_url = datasets.dataset_url(args.size, 42)
+    os.environ["DATABASE_URL"] = database_url
+    data = datasets.prepare(args.size, database_url=database_url)
+
+    mock = MockGemini(latency=args.gemini_latency_ms / 1000).start()
+    environment = dict(os.environ, DATABASE_URL=database_url, GEMINI_API_KEY="bench", GEMINI_API_URL=mock.url,
+                       RATE_LIMIT_ENABLED="false", PUBSUB_BACKEND="memory")
+    runs = []
+    try:
+        for _ in range(args.instances):
+            command = [sys.executable, os.path.abspath(__file__), "--invocations", str(args.invocations),
+                       "--idle-ms", str(args.idle_ms), "--instance", json.dumps([time.time(), data])]
+            result = subprocess.run(command, cwd=BACKEND_DIR, env=environment, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise SystemExit(result.stderr[-2000:])
+            runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    finally:
+        mock.stop()
+
+    print(f"{args.instances} instances x {args.invocations} invocations (medians across instances):")
+    print(f"  interpreter start   {statistics.median(r['interpreter_ms'] for r in runs):7.1f} ms")
+    print(f"  import api/index.py {statistics.median(r['import_ms'] for r in runs):7.1f} ms")
+    print(f"  cold invocation     {statistics.median(r['cold_ms'] for r in runs):7.1f} ms after spawn "
+          f"({runs[0]['invocations'][0]['path']})")
+
+    by_path = {}
+    for run in runs:
+        seen = {run["invocations"][0]["path"]}
+        for invocation in run["invocations"][1:]:
+            # Each path's first call in an instance still imports its router
+            key = "first" if invocation["path"] not in seen else "warm"
+            seen.add(invocation["path"])
+            by_path.setdefault(invocation["path"], {"first": [], "warm": [], "status": set()})
+            by_path[invocation["path"]][key].append(invocation["ms"])
+            by_path[invocation["path"]]["status"].add(invocation["status"])
+    print("  per path (first call in a warm instance / warm p50 / warm p95):")
+    for path, timings in by_path.items():
+        first = f"{statistics.median(timings['first']):7.1f}" if timings["first"] else "      -"
+        warm = timings["warm"] or [float("nan")]
+        print(f"    {path:<36} {first} / {statistics.median(warm):6.1f} / {percentile(warm, 0.95):6.1f} ms"
+              f"  (status {', '.join(map(str, sorted(timings['status'])))})")
+    print(f"  database connections per instance: {sorted({r['db_connections'] for r in runs})}")
+    print(f"  HTTP clients per instance:         {sorted({r['http_clients'] for r in runs})}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Seeded benchmark datasets, built once per (size, seed) and reused.
+
+The rows come from generate_data.py: one tenant owning every customer, so
+each size stresses a single shop's queries. SQLite files are cached under
+benchmarks/.data; any other DATABASE_URL (e.g. Postgres) is seeded in place
+the first time it is used.
+"""
+import os
+import sys
+from typing import Dict, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+
+def dataset_url(customers: int, seed: int) -> str:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return f"sqlite:///{os.path.join(DATA_DIR, f'synthetic-{customers}-seed{seed}.db')}"
+
+def prepare(
+    customers: int,
+    seed: int = 42,
+    database_url: Optional[str] = None,
+    interactions_per_customer: float = 10
+) -> Dict[str, object]:
+    """Create (or reuse) the dataset and describe the benchmark tenant"""
+    # Imported here: the app binds its engine to DATABASE_URL on first import,
+    # so callers get the chance to point it at the dataset first
+    import generate_data
+    from sqlalchemy.orm import Session
+    from app.database.database import Base
+    from app.models.models import User, Customer
+    from app.core.rollups import rebuild_daily_metrics
+
+    database_url = database_url or dataset_url(customers, seed)
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+
+    with engine.connect() as conn:
+        user_pk = conn.execute(select(User.id).where(User.user_id == generate_data.tenant_user_id(seed, 1))).scalar()
+    if user_pk is None:
+        generator = generate_data.Generator(engine, seed=seed, interactions_per_customer=interactions_per_customer)
+        user_pk = generator.run(tenants=1, customers=customers)[0]["user_id"]
+        # Dashboards and referral stats read the daily rollups
+        with Session(engine) as db:
+            rebuild_daily_metrics(db, user_pk)
+
+    with engine.connect() as conn:
+        low, high, count = conn.execute(
+            select(func.min(Customer.id), func.max(Customer.id), func.count(Customer.id))
+            .where(Customer.user_id == user_pk)
+        ).one()
+    engine.dispose()
+    return {
+        "database_url": database_url,
+        "user_id": user_pk,
+        "first_customer_id": low,
+        "last_customer_id": high,
+        "customers": count,
+        "search_terms": [f"{first} {last}" for first in generate_data.FIRST_NAMES[:5]
+                         for last in generate_data.LAST_NAMES[:5]],
+    }
@@ -0,0 +1,89 @@
+"""Import-time report for the app's cold start (python -X importtime).
+
+Imports a module in a fresh interpreter, then lists the slowest imports by
+cumulative and self time. With --budget-ms or --forbid it exits non-zero
+when the import is too slow or pulls in a module that should be deferred,
+so it can run as a CI check:
+
+    python benchmarks/importtime.py
+    python benchmarks/importtime.py --budget-ms 1000 --forbid numpy,bleach,celery,httpx
+    python benchmarks/importtime.py --json importtime.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure(module: str) -> List[Dict[str, object]]:
+    """One row per imported module: name, depth, self_us, cumulative_us"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({
+            "name": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return rows
+
+def top_level_packages(rows: List[Dict[str, object]]) -> Dict[str, int]:
+    """Self time summed per top-level package (app.* is split one level further)"""
+    totals: Dict[str, int] = {}
+    for row in rows:
+        parts = row["name"].split(".")
+        key = ".".join(parts[:2]) if parts[0] == "app" else parts[0]
+        totals[key] = totals.get(key, 0) + row["self_us"]
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, help="fail if the import takes longer")
+    parser.add_argument("--forbid", default="", help="comma-separated modules that must not be imported")
+    parser.add_argument("--json", help="also write the rows to this file")
+    args = parser.parse_args()
+
+    rows = measure(args.module)
+    total_us = next((row["cumulative_us"] for row in rows if row["name"] == args.module), 0)
+
+    print(f"import {args.module}: {total_us / 1000:.1f} ms, {len(rows)} modules\n")
+    print("Slowest packages (self time):")
+    packages = sorted(top_level_packages(rows).items(), key=lambda item: -item[1])
+    for name, self_us in packages[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+    print("\nSlowest imports (cumulative):")
+    for row in sorted(rows, key=lambda row: -row["cumulative_us"])[:args.top]:
+        print(f"  {row['cumulative_us'] / 1000:8.1f} ms  {'  ' * row['depth']}{row['name']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"module": args.module, "total_us": total_us, "imports": rows}, f, indent=2)
+
+    failures = []
+    if args.budget_ms is not None and total_us / 1000 > args.budget_ms:
+        failures.append(f"import took {total_us / 1000:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    imported = {row["name"] for row in rows}
+    for name in filter(None, args.forbid.split(",")):
+        if name.strip() in imported:
+            failures.append(f"{name.strip()} is imported at startup")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
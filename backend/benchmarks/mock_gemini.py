@@ -0,0 +1,70 @@
+"""Stand-in for the Gemini generateContent API with a fixed response time.
+
+Point the app at it with GEMINI_API_URL; run_suite.py starts one automatically:
+
+    python benchmarks/mock_gemini.py --port 8765 --latency-ms 300
+"""
+import argparse
+import asyncio
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+def create_mock(latency: float) -> FastAPI:
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.post("/v1beta/models/{model}:generateContent")
+    async def generate_content(model: str, request: Request):
+        await request.body()
+        app.state.calls += 1
+        await asyncio.sleep(latency)
+        return {
+            "candidates": [{
+                "content": {"parts": [{"text": "Fresh stock just arrived! Visit us this week for 10% off."}]},
+                "finishReason": "STOP",
+            }]
+        }
+
+    return app
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class MockGemini:
+    """Mock server on a background thread; `url` is what GEMINI_API_URL should be"""
+
+    def __init__(self, latency: float = 0.3, port: int = 0):
+        self.port = port or free_port()
+        self.app = create_mock(latency)
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, name="mock-gemini", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1beta/models/gemini-2.5-flash:generateContent"
+
+    def start(self) -> "MockGemini":
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("mock Gemini did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    args = parser.parse_args()
+    uvicorn.run(create_mock(args.latency_ms / 1000), host="127.0.0.1", port=args.port)
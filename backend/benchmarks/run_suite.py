@@ -0,0 +1,312 @@
+"""Reproducible load test: a mixed workload against the whole app.
+
+Boots create_app() in-process (httpx ASGI transport) or under uvicorn,
+against a seeded dataset (see datasets.py) with Gemini replaced by a local
+mock, and drives a weighted mix of dashboard polls, searches, conversation
+reads, sends, bulk sends and AI calls from closed-loop virtual users.
+Throughput and p50/p95/p99 per endpoint are written as JSON so runs of
+different commits can be compared:
+
+    python benchmarks/run_suite.py --size 1k --duration 30
+    python benchmarks/run_suite.py --size 1k,100k,1m --mode uvicorn --workers 4
+    python benchmarks/run_suite.py --size 100k --compare benchmarks/results/baseline.json
+
+The same seed gives the same dataset and the same request sequence per
+virtual user; latencies of course still depend on the machine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+import numpy as np
+import datasets
+from mock_gemini import MockGemini, free_port
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BULK_RECIPIENTS = 50
+PLATFORMS = ("whatsapp", "sms", "email")
+
+# name -> (weight, request builder); builders return (method, url, params, json)
+Request = Tuple[str, str, Optional[dict], Optional[dict]]
+
+def _customer(rng: random.Random, data: dict) -> int:
+    return rng.randint(data["first_customer_id"], data["last_customer_id"])
+
+SCENARIOS: Dict[str, Tuple[int, Callable[[random.Random, dict], Request]]] = {
+    "dashboard": (25, lambda rng, data: (
+        "GET", "/dashboard/", {"user_id": data["user_id"]}, None)),
+    "search": (15, lambda rng, data: (
+        "GET", "/customers/search",
+        {"user_id": data["user_id"],
+         "query": rng.choice(data["search_terms"])}, None)),
+    "conversation": (20, lambda rng, data: (
+        "GET", f"/messaging/conversations/{_customer(rng, data)}", {"user_id": data["user_id"]}, None)),
+    "conversation_sync": (10, lambda rng, data: (
+        "GET", f"/messaging/conversations/{_customer(rng, data)}/sync",
+        {"user_id": data["user_id"], "limit": 50}, None)),
+    "referral_stats": (10, lambda rng, data: (
+        "GET", "/referrals/stats", {"user_id": data["user_id"]}, None)),
+    "send": (10, lambda rng, data: (
+        "POST", "/messaging/send", None,
+        {"user_id": data["user_id"], "customer_id": _customer(rng, data),
+         "message": "Your order is ready for pickup", "platform": rng.choice(PLATFORMS)})),
+    "bulk_send": (5, lambda rng, data: (
+        "POST", "/messaging/bulk-message", None,
+        {"user_id": data["user_id"],
+         "customer_ids": sorted({_customer(rng, data) for _ in range(BULK_RECIPIENTS)}),
+         "message": "Festival sale this weekend!", "platform": "whatsapp"})),
+    "ai_marketing": (5, lambda rng, data: (
+        "POST", "/ai/marketing-content", None,
+        {"user_id": data["user_id"], "content_type": "social_media", "topic": "Diwali offers"})),
+}
+
+def git_revision() -> Dict[str, object]:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--", "."))}
+
+def summarize(samples: List[Tuple[float, bool]], seconds: float) -> dict:
+    latencies = np.array([latency for latency, _ in samples]) * 1000
+    errors = sum(1 for _, ok in samples if not ok)
+    if not len(latencies):
+        return {"requests": 0, "errors": 0, "rps": 0.0}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4),
+        "rps": round(len(samples) / seconds, 2),
+        "latency_ms": {
+            "mean": round(float(latencies.mean()), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(latencies.max()), 3),
+        },
+    }
+
+async def drive(client: httpx.AsyncClient, data: dict, args) -> dict:
+    """Closed-loop virtual users; samples from the warm-up period are discarded"""
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[name][0] for name in names]
+    samples: Dict[str, List[Tuple[float, bool]]] = {name: [] for name in names}
+    statuses: Dict[str, Dict[str, int]] = {name: {} for name in names}
+    started = time.perf_counter()
+    measure_from = started + args.warmup
+    stop_at = measure_from + args.duration
+
+    async def user(index: int):
+        rng = random.Random(args.seed * 1000 + index)
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            name = rng.choices(names, weights)[0]
+            method, url, params, body = SCENARIOS[name][1](rng, data)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, params=params, json=body)
+                status, ok = str(response.status_code), response.status_code < 400
+            except httpx.HTTPError as exc:
+                status, ok = type(exc).__name__, False
+            if start >= measure_from:
+                samples[name].append((time.perf_counter() - start, ok))
+                statuses[name][status] = statuses[name].get(status, 0) + 1
+
+    await asyncio.gather(*(user(i) for i in range(args.concurrency)))
+    measured = time.perf_counter() - measure_from
+
+    endpoints = {}
+    for name in names:
+        endpoints[name] = {**summarize(samples[name], measured), "status_codes": statuses[name]}
+    everything = [sample for values in samples.values() for sample in values]
+    return {"seconds": round(measured, 3), "endpoints": endpoints, "total": summarize(everything, measured)}
+
+def bench_environment(database_url: str, gemini_url: str) -> Dict[str, str]:
+    return {
+        "DATABASE_URL": database_url,
+        "GEMINI_API_KEY": "bench",
+        "GEMINI_API_URL": gemini_url,
+        # The suite measures throughput, not the limiter's 429s
+        "RATE_LIMIT_ENABLED": "false",
+        "PUBSUB_BACKEND": "memory",
+    }
+
+async def run_in_process(data: dict, args) -> dict:
+    from app.main import create_app
+
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+        return await drive(client, data, args)
+
+async def run_uvicorn(data: dict, args, environment: Dict[str, str]) -> dict:
+    port = free_port()
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"]
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **environment})
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    await client.get("/")
+                    break
+                except httpx.TransportError:
+                    if server.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError("uvicorn did not start")
+                    await asyncio.sleep(0.2)
+            return await drive(client, data, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def run_one(size: str, args) -> dict:
+    customers = datasets.SIZES[size]
+    print(f"Preparing {size} dataset ({customers} customers, seed {args.seed})...", file=sys.stderr)
+    database_url = args.database_url or datasets.dataset_url(customers, args.seed)
+    os.environ["DATABASE_URL"] = database_url
+    started = time.perf_counter()
+    data = datasets.prepare(customers, args.seed, database_url)
+    prepare_seconds = time.perf_counter() - started
+
+    mock = MockGemini(latency=args.gemini_latency_ms / 1000).start()
+    environment = bench_environment(data["database_url"], mock.url)
+    # In-process mode reads these when the app is imported below
+    os.environ.update(environment)
+    try:
+        print(f"Running {args.mode} for {args.duration}s with {args.concurrency} users...", file=sys.stderr)
+        if args.mode == "uvicorn":
+            results = asyncio.run(run_uvicorn(data, args, environment))
+        else:
+            results = asyncio.run(run_in_process(data, args))
+    finally:
+        mock.stop()
+
+    return {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "size": size,
+            "customers": data["customers"],
+            "seed": args.seed,
+            "mode": args.mode,
+            "workers": args.workers if args.mode == "uvicorn" else 1,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "gemini_latency_ms": args.gemini_latency_ms,
+            "database": data["database_url"].split(":", 1)[0],
+            "dataset_prepare_seconds": round(prepare_seconds, 2),
+            "mix": {name: weight for name, (weight, _) in SCENARIOS.items()},
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        **results,
+    }
+
+def print_summary(run: dict, baseline: Optional[dict] = None) -> None:
+    meta = run["meta"]
+    print(f"\n{meta['size']} / {meta['mode']} / {meta['concurrency']} users / {run['seconds']}s", file=sys.stderr)
+    print(f"{'endpoint':<20}{'reqs':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}", file=sys.stderr)
+    for name, stats in [*run["endpoints"].items(), ("TOTAL", run["total"])]:
+        if not stats["requests"]:
+            continue
+        latency = stats["latency_ms"]
+        line = (f"{name:<20}{stats['requests']:>8}{stats['errors']:>6}{stats['rps']:>9.1f}"
+                f"{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}")
+        previous = (baseline or {}).get("endpoints", {}).get(name) if name != "TOTAL" else (baseline or {}).get("total")
+        if previous and previous.get("requests"):
+            change = (latency["p95"] / previous["latency_ms"]["p95"] - 1) * 100
+            line += f"   p95 {change:+.0f}% vs baseline"
+        print(line, file=sys.stderr)
+
+def find_baseline(path: Optional[str], size: str) -> Optional[dict]:
+    if not path:
+        return None
+    with open(path) as handle:
+        report = json.load(handle)
+    for run in report.get("runs", [report]):
+        if run.get("meta", {}).get("size") == size:
+            return run
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="1k", help=f"comma-separated, from {', '.join(datasets.SIZES)}")
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds first")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300)
+    parser.add_argument("--database-url", help="seed and use this database instead of a cached SQLite file")
+    parser.add_argument("--output", help="JSON report path (default: benchmarks/results/...)")
+    parser.add_argument("--compare", help="previous JSON report to compare p95 against")
+    args = parser.parse_args()
+
+    sizes = [size.strip().lower() for size in args.size.split(",")]
+    unknown = [size for size in sizes if size not in datasets.SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+
+    if len(sizes) > 1:
+        # The app binds its engine at import time, so each size runs in a fresh process
+        runs = []
+        for size in sizes:
+            output = os.path.join(RESULTS_DIR, f".partial-{size}-{os.getpid()}.json")
+            command = [sys.executable, os.path.abspath(__file__), *_forwarded(sys.argv[1:]),
+                       "--size", size, "--output", output]
+            if args.compare:
+                command += ["--compare", args.compare]
+            subprocess.run(command, check=True)
+            with open(output) as handle:
+                runs.append(json.load(handle))
+            os.remove(output)
+        report = {"runs": runs}
+    else:
+        report = run_one(sizes[0], args)
+        print_summary(report, find_baseline(args.compare, sizes[0]))
+
+    revision = (report.get("meta") or report["runs"][0]["meta"])["commit"] or "unknown"
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{'-'.join(sizes)}-{args.mode}-{revision[:10]}-{int(time.time())}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"\nWrote {output}", file=sys.stderr)
+
+def _forwarded(argv: List[str]) -> List[str]:
+    """Command-line options minus the ones each per-size run gets its own value for"""
+    skip = {"--size", "--output", "--compare"}
+    forwarded, skip_next = [], False
+    for arg in argv:
+        if skip_next:
+            skip_next = False
+            continue
+        name = arg.split("=", 1)[0]
+        if name in skip:
+            skip_next = "=" not in arg
+            continue
+        forwarded.append(arg)
+    return forwarded
+
+if __name__ == "__main__":
+    main()
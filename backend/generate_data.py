@@ -0,0 +1,268 @@
+"""Deterministic synthetic data at realistic volumes.
+
+Creates N tenants whose customer counts follow a Zipf distribution (a few
+big shops, a long tail of small ones), each with heavy-tailed interaction
+histories, referrals and social accounts. Rows are streamed to the database
+in batched Core inserts, so memory stays flat and 10M interactions take
+minutes. The same seed always produces the same rows, whatever the batch size:
+
+    python generate_data.py --tenants 1000 --customers 1000000 --interactions 10
+    python generate_data.py --database-url postgresql://localhost/growth --seed 7
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# Add the parent directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.engine import Engine
+from app.database.database import Base
+from app.models.models import User, SocialAccount, Customer, Referral, Interaction
+
+DEFAULT_BATCH_SIZE = 5_000
+# Fixed anchor so the same seed gives the same timestamps on any day
+ANCHOR = datetime(2025, 1, 1)
+
+FIRST_NAMES = ["Rajesh", "Priya", "Amit", "Sunita", "Vikram", "Anjali", "Sanjay", "Neha", "Deepak", "Kavita",
+               "Arjun", "Meera", "Rohit", "Pooja", "Karan", "Divya", "Suresh", "Lakshmi", "Manoj", "Asha"]
+LAST_NAMES = ["Kumar", "Sharma", "Patel", "Verma", "Singh", "Mehta", "Gupta", "Reddy", "Nair", "Joshi",
+              "Iyer", "Das", "Rao", "Bose", "Pillai", "Shah", "Menon", "Chopra", "Yadav", "Khan"]
+NOTES = ["", "", "", "Interested in premium products", "Price conscious customer", "Seasonal buyer",
+         "B2B customer, large orders", "Prefers eco-friendly options", "Frequently asks for discounts"]
+PLATFORMS = ["whatsapp", "sms", "email"]
+OUTBOUND_MESSAGES = ["Hello {name}, new stock has arrived!", "Your order is ready for pickup",
+                     "Thank you for your purchase, {name}", "Festival offer: 10% off this week"]
+INBOUND_MESSAGES = ["Thanks!", "What are your opening hours?", "Is this available in blue?",
+                    "I'll visit tomorrow", "Please share the price list"]
+REFERRAL_STATUSES = ["pending", "accepted", "completed"]
+REFERRAL_WEIGHTS = [5, 2, 3]
+SOCIAL_PLATFORMS = ["facebook", "instagram", "whatsapp_business", "google_business"]
+
+def tenant_user_id(seed: int, rank: int) -> str:
+    return f"tenant-{seed}-{rank:06d}"
+
+def zipf_counts(total: int, buckets: int, exponent: float) -> List[int]:
+    """Split `total` over `buckets` in proportion to 1 / rank ** exponent (largest remainder)"""
+    weights = [1 / rank ** exponent for rank in range(1, buckets + 1)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    remainders = sorted(range(buckets), key=lambda i: (counts[i] - weights[i] * scale, i))
+    for i in remainders[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+def history_length(rng: random.Random, mean: float, cap: int) -> int:
+    """Heavy-tailed interaction count: Pareto(2) scaled to the requested mean"""
+    if mean <= 0:
+        return 0
+    return min(int(rng.paretovariate(2.0) * mean / 2), cap)
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _next_id(conn, column) -> int:
+    return (conn.execute(select(func.max(column))).scalar() or 0) + 1
+
+class Generator:
+    """Streams one tenant at a time; every kind of row draws from its own seeded stream"""
+
+    def __init__(
+        self,
+        engine: Engine,
+        seed: int = 42,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        interactions_per_customer: float = 10,
+        referral_rate: float = 0.1,
+        days: int = 365,
+        password_hash: str = "!",
+        progress: Optional[Callable[[str], None]] = None
+    ):
+        self.engine = engine
+        self.seed = seed
+        self.batch_size = batch_size
+        self.interactions_per_customer = interactions_per_customer
+        self.referral_rate = referral_rate
+        self.span = days * 86400
+        self.password_hash = password_hash
+        self.progress = progress or (lambda message: None)
+        self.counts = {"tenants": 0, "customers": 0, "interactions": 0, "referrals": 0, "social_accounts": 0}
+
+    def _rng(self, rank: int, kind: str) -> random.Random:
+        return random.Random(f"{self.seed}:{rank}:{kind}")
+
+    def _insert(self, conn, table, rows: Iterable[dict], counter: str) -> None:
+        for batch in _batches(rows, self.batch_size):
+            conn.execute(insert(table), batch)
+            conn.commit()
+            self.counts[counter] += len(batch)
+
+    def run(self, tenants: int, customers: int, zipf_exponent: float = 1.1) -> List[Dict[str, int]]:
+        Base.metadata.create_all(bind=self.engine)
+        created = []
+        with self.engine.connect() as conn:
+            if self.engine.dialect.name == "sqlite":
+                # Bulk load: durability of a half-written synthetic dataset doesn't matter
+                conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            existing = conn.execute(select(User.id).where(User.user_id == tenant_user_id(self.seed, 1))).scalar()
+            if existing is not None:
+                raise RuntimeError(f"Seed {self.seed} was already generated into this database")
+
+            for rank, count in enumerate(zipf_counts(customers, tenants, zipf_exponent), start=1):
+                created.append(self._tenant(conn, rank, count))
+                if rank % 100 == 0 or rank == tenants:
+                    self.progress(f"{rank}/{tenants} tenants, {self.counts['customers']} customers, "
+                                  f"{self.counts['interactions']} interactions")
+            self._sync_sequences(conn)
+        return created
+
+    def _tenant(self, conn, rank: int, customer_count: int) -> Dict[str, int]:
+        rng = self._rng(rank, "tenant")
+        user_pk = _next_id(conn, User.id)
+        conn.execute(insert(User).values(
+            id=user_pk,
+            name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} Stores {rank}",
+            email=f"{tenant_user_id(self.seed, rank)}@example.com",
+            user_id=tenant_user_id(self.seed, rank),
+            password_hash=self.password_hash,
+            created_at=ANCHOR,
+        ))
+        self.counts["tenants"] += 1
+
+        social = [
+            {"user_id": user_pk, "platform_name": platform,
+             "access_token": f"synthetic-{self.seed}-{rank}-{platform}", "refresh_token": None,
+             "expiry_date": ANCHOR + timedelta(days=rng.randrange(30, 400))}
+            for platform in SOCIAL_PLATFORMS if rng.random() < 0.5
+        ]
+        self._insert(conn, SocialAccount.__table__, social, "social_accounts")
+
+        first_id = _next_id(conn, Customer.id)
+        customer_rng = self._rng(rank, "customers")
+        interaction_rng = self._rng(rank, "interactions")
+        referral_rng = self._rng(rank, "referrals")
+        cap = max(int(self.interactions_per_customer * 50), 1)
+        agent = f"user_{user_pk}"
+
+        # Chunks of customers with their histories; each stream is read in the
+        # same order whatever the chunk size, so the output doesn't depend on it
+        for chunk_start in range(0, customer_count, self.batch_size):
+            customers, interactions, referrals = [], [], []
+            for customer_id in range(first_id + chunk_start, first_id + min(chunk_start + self.batch_size, customer_count)):
+                name = f"{customer_rng.choice(FIRST_NAMES)} {customer_rng.choice(LAST_NAMES)}"
+                created_at = ANCHOR + timedelta(seconds=customer_rng.randrange(self.span))
+                customer = {
+                    "id": customer_id,
+                    "user_id": user_pk,
+                    "name": name,
+                    "contact_info": f"{name.lower().replace(' ', '.')}.{customer_id}@example.com",
+                    "notes": customer_rng.choice(NOTES),
+                    "created_at": created_at,
+                    "last_contacted": None,
+                }
+                customers.append(customer)
+
+                # Mostly agent-initiated, with customer replies minutes to days later
+                at = created_at
+                for _ in range(history_length(interaction_rng, self.interactions_per_customer, cap)):
+                    at += timedelta(seconds=interaction_rng.randrange(60, 3 * 86400))
+                    if interaction_rng.random() < 0.4:
+                        interactions.append({"customer_id": customer_id, "sent_by": "customer", "timestamp": at,
+                                             "message": interaction_rng.choice(INBOUND_MESSAGES)})
+                    else:
+                        platform = interaction_rng.choice(PLATFORMS)
+                        message = interaction_rng.choice(OUTBOUND_MESSAGES).format(name=name.split()[0])
+                        interactions.append({"customer_id": customer_id, "sent_by": agent, "timestamp": at,
+                                             "message": f"[{platform.upper()}] {message}"})
+                        customer["last_contacted"] = at
+
+                if referral_rng.random() < self.referral_rate:
+                    status = referral_rng.choices(REFERRAL_STATUSES, REFERRAL_WEIGHTS)[0]
+                    referrals.append({
+                        "user_id": user_pk,
+                        "customer_id": customer_id,
+                        "referred_by": referral_rng.choice(["existing_customer", "social_media", "walk_in"]),
+                        "status": status,
+                        "reward_points": 100 if status == "completed" else 50 if status == "accepted" else 0,
+                        "created_at": created_at + timedelta(days=referral_rng.randrange(30)),
+                    })
+
+            self._insert(conn, Customer.__table__, customers, "customers")
+            self._insert(conn, Interaction.__table__, interactions, "interactions")
+            self._insert(conn, Referral.__table__, referrals, "referrals")
+
+        return {
+            "rank": rank,
+            "user_id": user_pk,
+            "first_customer_id": first_id,
+            "last_customer_id": first_id + customer_count - 1,
+            "customers": customer_count,
+        }
+
+    def _sync_sequences(self, conn) -> None:
+        # Explicit ids don't advance Postgres sequences
+        if self.engine.dialect.name != "postgresql":
+            return
+        for table in ("users", "customers"):
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT COALESCE(MAX(id), 1) FROM {table}))"
+            ))
+        conn.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./app.db"))
+    parser.add_argument("--tenants", type=int, default=100)
+    parser.add_argument("--customers", type=int, default=10_000, help="total across all tenants")
+    parser.add_argument("--interactions", type=float, default=10, help="mean interactions per customer")
+    parser.add_argument("--zipf", type=float, default=1.1, help="exponent of the tenant size distribution")
+    parser.add_argument("--referral-rate", type=float, default=0.1)
+    parser.add_argument("--days", type=int, default=365, help="span of customer sign-ups from 2025-01-01")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", help="give every tenant this password (hashed once); default: no login")
+    args = parser.parse_args()
+
+    if args.customers < args.tenants:
+        parser.error("--customers must be at least --tenants")
+
+    password_hash = "!"
+    if args.password:
+        from app.core.passwords import hash_password_sync
+        password_hash = hash_password_sync(args.password)
+
+    engine = create_engine(args.database_url)
+    generator = Generator(
+        engine,
+        seed=args.seed,
+        batch_size=args.batch_size,
+        interactions_per_customer=args.interactions,
+        referral_rate=args.referral_rate,
+        days=args.days,
+        password_hash=password_hash,
+        progress=print
+    )
+    start = time.perf_counter()
+    try:
+        generator.run(args.tenants, args.customers, args.zipf)
+    except RuntimeError as exc:
+        sys.exit(str(exc))
+    elapsed = time.perf_counter() - start
+    counts = ", ".join(f"{value} {name}" for name, value in generator.counts.items())
+    print(f"Created {counts} in {elapsed:.1f}s (seed {args.seed})")
+    print(f"Tenant logins: {tenant_user_id(args.seed, 1)} ... {tenant_user_id(args.seed, args.tenants)}")
+
+if __name__ == "__main__":
+    main()
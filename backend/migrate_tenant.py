@@ -0,0 +1,326 @@
+"""Move one tenant's rows to another shard while it keeps working.
+
+The tenant's rows are copied in keyset batches while it is still served from
+its old shard. It is then frozen for the catch-up: writes get a 503 with
+Retry-After, reads keep working. Rows written during the copy are brought
+across, row counts are checked on both sides, and the directory is flipped to
+the new shard. Finally the old shard's rows are deleted in batches. A failure
+before the flip removes the partial copy and leaves the tenant where it was.
+
+    python migrate_tenant.py --user-id 42 --to shard2
+    python migrate_tenant.py --user-id 42 --to default --keep-source
+    python migrate_tenant.py --pin-existing    # before changing DATABASE_SHARDS
+    python migrate_tenant.py --list
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+# Add the parent directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import Table, bindparam, delete, func, insert, select, update
+from sqlalchemy.engine import Engine
+from app.database import sharding
+from app.database.database import shards
+from app.database.sharding import ACTIVE, FROZEN, ShardRouter, tenant_shards
+from app.models.models import (
+    User, SocialAccount, Customer, Referral, Interaction, CustomerScore, CustomerSegment,
+    CustomerContactHistogram, RollupWatermark, DailyResponseRollup, DailyTenantMetrics, FollowUpPolicy,
+    FollowUpDailyCount
+)
+
+DEFAULT_BATCH_SIZE = 5_000
+
+# Tenant tables in foreign-key order (parents first), with their single-column key;
+# None marks composite keys, copied whole (per-tenant rollups are small)
+TENANT_TABLES = [
+    (SocialAccount.__table__, "id"),
+    (Customer.__table__, "id"),
+    (Referral.__table__, "id"),
+    (Interaction.__table__, "id"),
+    (CustomerScore.__table__, "customer_id"),
+    (CustomerSegment.__table__, "customer_id"),
+    (CustomerContactHistogram.__table__, "customer_id"),
+    (RollupWatermark.__table__, None),
+    (DailyResponseRollup.__table__, None),
+    (DailyTenantMetrics.__table__, None),
+    (FollowUpPolicy.__table__, "user_id"),
+    (FollowUpDailyCount.__table__, None),
+]
+
+# Never updated, so the catch-up only copies rows the target is missing
+# (not just those past the last copied key: SQLite reuses deleted top ids)
+INSERT_ONLY = {Interaction.__table__.name}
+
+USERS = User.__table__
+
+class TenantMove:
+    def __init__(self, router: ShardRouter, user_id: int, target: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 settle_seconds: Optional[float] = None, progress: Optional[Callable[[str], None]] = None):
+        if target not in router.engines:
+            raise RuntimeError(f"Unknown shard {target!r}; shards: {', '.join(router.engines)}")
+        self.router = router
+        self.user_id = user_id
+        self.target = target
+        self.batch_size = batch_size
+        # How long other processes may keep using a cached directory entry
+        self.settle_seconds = sharding.SHARD_DIRECTORY_CACHE_SECONDS if settle_seconds is None else settle_seconds
+        self.progress = progress or (lambda message: None)
+        self.copied: Dict[str, int] = {}
+
+    def tenant_rows(self, table: Table):
+        if table is USERS:
+            return USERS.c.id == self.user_id
+        if table is Interaction.__table__:
+            customers = Customer.__table__
+            return table.c.customer_id.in_(select(customers.c.id).where(customers.c.user_id == self.user_id))
+        return table.c.user_id == self.user_id
+
+    def run(self, keep_source: bool = False) -> Dict[str, int]:
+        """Move the tenant; returns its row count per table"""
+        router = self.router
+        router.forget(self.user_id)
+        source, state = router.placement(self.user_id)
+        if state == FROZEN:
+            raise RuntimeError(f"Tenant {self.user_id} is already being moved (frozen on {source})")
+        if source == self.target:
+            raise RuntimeError(f"Tenant {self.user_id} is already on {source}")
+        with router.engines[router.directory].connect() as conn:
+            if conn.execute(select(USERS.c.id).where(USERS.c.id == self.user_id)).first() is None:
+                raise RuntimeError(f"No user with id {self.user_id}")
+        self.source, self.dest = router.engines[source], router.engines[self.target]
+        self.check_target()
+
+        try:
+            # Pinned first, so a ring change can't move the tenant mid-copy
+            router.assign(self.user_id, source)
+            self.copy_user()
+            for table, key in TENANT_TABLES:
+                self.copy(table, key)
+                self.progress(f"Copied {self.copied.get(table.name, 0)} {table.name}")
+
+            router.assign(self.user_id, source, FROZEN)
+            self.settle()
+            for table, key in TENANT_TABLES:
+                self.catch_up(table, key)
+            for table, key in reversed(TENANT_TABLES):
+                if key is not None:
+                    self.remove_deleted(table, key)
+            counts = self.verify()
+        except BaseException:
+            self.delete_tenant(self.dest, delete_user=self.target != router.directory)
+            router.assign(self.user_id, source)
+            raise
+
+        router.assign(self.user_id, self.target)
+        self.progress(f"Tenant {self.user_id} now on {self.target}")
+        if not keep_source:
+            # Anything still holding the old entry finishes against the old rows first
+            self.settle()
+            self.delete_tenant(self.source, delete_user=source != router.directory)
+            self.progress(f"Deleted tenant {self.user_id} from {source}")
+        return counts
+
+    def settle(self) -> None:
+        time.sleep(self.settle_seconds)
+
+    def check_target(self) -> None:
+        """Refuse to start if the target already has this tenant's rows or any of its ids"""
+        with self.dest.connect() as dest:
+            for table, key in TENANT_TABLES:
+                if dest.execute(select(func.count()).select_from(table).where(self.tenant_rows(table))).scalar():
+                    raise RuntimeError(f"{self.target} already has {table.name} rows for tenant {self.user_id}")
+                if key != "id":
+                    continue
+                for ids in self.key_batches(self.source, table, table.c.id):
+                    taken = dest.execute(select(func.count()).select_from(table).where(table.c.id.in_(ids))).scalar()
+                    if taken:
+                        raise RuntimeError(
+                            f"{taken} of tenant {self.user_id}'s {table.name} ids are already used on {self.target}"
+                        )
+
+    def key_batches(self, engine: Engine, table: Table, key):
+        last = None
+        while True:
+            query = select(key).where(self.tenant_rows(table)).order_by(key).limit(self.batch_size)
+            if last is not None:
+                query = query.where(key > last)
+            with engine.connect() as conn:
+                ids = conn.execute(query).scalars().all()
+            if not ids:
+                return
+            yield ids
+            last = ids[-1]
+
+    def copy_user(self) -> None:
+        # The directory keeps the real users row; shards get a copy without credentials
+        if self.target == self.router.directory:
+            return
+        with self.router.engines[self.router.directory].connect() as conn:
+            row = dict(conn.execute(select(USERS).where(USERS.c.id == self.user_id)).mappings().one())
+        row["password_hash"] = None
+        with self.dest.begin() as conn:
+            # Left behind by an earlier --keep-source move, perhaps
+            if not conn.execute(update(USERS).where(USERS.c.id == self.user_id).values(row)).rowcount:
+                conn.execute(insert(USERS).values(row))
+
+    def copy(self, table: Table, key_name: Optional[str]) -> None:
+        """Keyset-batched copy of the tenant's rows"""
+        if key_name is None:
+            with self.source.connect() as conn:
+                rows = conn.execute(select(table).where(self.tenant_rows(table))).mappings().all()
+            self.insert(table, rows)
+            return
+        key = table.c[key_name]
+        last = None
+        while True:
+            query = select(table).where(self.tenant_rows(table)).order_by(key).limit(self.batch_size)
+            if last is not None:
+                query = query.where(key > last)
+            with self.source.connect() as conn:
+                rows = conn.execute(query).mappings().all()
+            if not rows:
+                return
+            self.insert(table, rows)
+            last = rows[-1][key_name]
+
+    def insert(self, table: Table, rows) -> None:
+        for start in range(0, len(rows), self.batch_size):
+            chunk = [dict(row) for row in rows[start:start + self.batch_size]]
+            with self.dest.begin() as conn:
+                conn.execute(insert(table), chunk)
+            self.copied[table.name] = self.copied.get(table.name, 0) + len(chunk)
+
+    def catch_up(self, table: Table, key_name: Optional[str]) -> None:
+        """Bring across what changed since the copy (the tenant is frozen now)"""
+        if key_name is None:
+            with self.dest.begin() as conn:
+                conn.execute(delete(table).where(self.tenant_rows(table)))
+            self.copy(table, None)
+        elif table.name in INSERT_ONLY:
+            self.copy_missing(table, key_name)
+        else:
+            self.refresh(table, key_name)
+
+    def refresh(self, table: Table, key_name: str) -> None:
+        """Update copied rows in place (other tables reference them) and insert new ones"""
+        key = table.c[key_name]
+        columns = [column for column in table.c if column is not key]
+        statement = update(table).where(key == bindparam("row_key")).values(
+            {column.name: bindparam(f"row_{column.name}") for column in columns}
+        )
+        for ids in self.key_batches(self.source, table, key):
+            with self.source.connect() as conn:
+                rows = conn.execute(select(table).where(key.in_(ids))).mappings().all()
+            with self.dest.begin() as conn:
+                existing = set(conn.execute(select(key).where(key.in_(ids))).scalars())
+                updates = [
+                    {"row_key": row[key_name], **{f"row_{column.name}": row[column.name] for column in columns}}
+                    for row in rows if row[key_name] in existing
+                ]
+                if updates:
+                    conn.execute(statement, updates)
+            self.insert(table, [row for row in rows if row[key_name] not in existing])
+
+    def copy_missing(self, table: Table, key_name: str) -> None:
+        key = table.c[key_name]
+        missing = sorted(self.keys(self.source, table, key) - self.keys(self.dest, table, key))
+        for start in range(0, len(missing), self.batch_size):
+            with self.source.connect() as conn:
+                rows = conn.execute(select(table).where(key.in_(missing[start:start + self.batch_size]))).mappings().all()
+            self.insert(table, rows)
+
+    def keys(self, engine: Engine, table: Table, key) -> Set:
+        with engine.connect() as conn:
+            return set(conn.execute(select(key).where(self.tenant_rows(table))).scalars())
+
+    def remove_deleted(self, table: Table, key_name: str) -> None:
+        """Drop copied rows the tenant deleted during the copy (children first)"""
+        key = table.c[key_name]
+        gone = sorted(self.keys(self.dest, table, key) - self.keys(self.source, table, key))
+        for start in range(0, len(gone), self.batch_size):
+            with self.dest.begin() as conn:
+                conn.execute(delete(table).where(key.in_(gone[start:start + self.batch_size])))
+
+    def verify(self) -> Dict[str, int]:
+        counts = {}
+        for table, _ in TENANT_TABLES:
+            query = select(func.count()).select_from(table).where(self.tenant_rows(table))
+            with self.source.connect() as source, self.dest.connect() as dest:
+                expected, actual = source.execute(query).scalar(), dest.execute(query).scalar()
+            if expected != actual:
+                raise RuntimeError(f"{table.name}: {expected} rows on the source, {actual} copied")
+            counts[table.name] = expected
+        return counts
+
+    def delete_tenant(self, engine: Engine, delete_user: bool) -> None:
+        """Delete the tenant's rows from one shard in batches, children first"""
+        for table, key_name in reversed(TENANT_TABLES):
+            if key_name is None:
+                with engine.begin() as conn:
+                    conn.execute(delete(table).where(self.tenant_rows(table)))
+                continue
+            key = table.c[key_name]
+            for ids in self.key_batches(engine, table, key):
+                with engine.begin() as conn:
+                    conn.execute(delete(table).where(key.in_(ids)))
+        if delete_user:
+            with engine.begin() as conn:
+                conn.execute(delete(USERS).where(USERS.c.id == self.user_id))
+
+def pin_existing(router: ShardRouter) -> int:
+    """Give every tenant placed only by the ring a directory entry for its current shard"""
+    directory = router.engines[router.directory]
+    with directory.connect() as conn:
+        unpinned = conn.execute(
+            select(USERS.c.id).where(USERS.c.id.not_in(select(tenant_shards.c.user_id)))
+        ).scalars().all()
+    if unpinned:
+        with directory.begin() as conn:
+            conn.execute(insert(tenant_shards), [
+                {"user_id": user_id, "shard": router.ring.get(user_id), "state": ACTIVE} for user_id in unpinned
+            ])
+    return len(unpinned)
+
+def tenant_counts(router: ShardRouter) -> List[Dict[str, object]]:
+    directory = router.engines[router.directory]
+    with directory.connect() as conn:
+        entries = dict(conn.execute(select(tenant_shards.c.shard, func.count()).group_by(tenant_shards.c.shard)).all())
+    return [{"shard": name, "pinned_tenants": entries.get(name, 0)} for name in router.engines]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", type=int, help="users.id of the tenant to move")
+    parser.add_argument("--to", help="name of the destination shard (see DATABASE_SHARDS)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--keep-source", action="store_true", help="leave the old rows in place after the move")
+    parser.add_argument("--pin-existing", action="store_true",
+                        help="record every ring-placed tenant in the directory, so shard changes don't move it")
+    parser.add_argument("--list", action="store_true", help="show shards and pinned tenants per shard")
+    args = parser.parse_args()
+
+    sharding.directory_metadata.create_all(bind=shards.engines[shards.directory])
+    if args.list:
+        for row in tenant_counts(shards):
+            print(f"{row['shard']:<20}{row['pinned_tenants']:>10} pinned tenants")
+        return
+    if args.pin_existing:
+        print(f"Pinned {pin_existing(shards)} tenants")
+        return
+    if args.user_id is None or not args.to:
+        parser.error("--user-id and --to are required to move a tenant")
+
+    start = time.perf_counter()
+    move = TenantMove(shards, args.user_id, args.to, batch_size=args.batch_size, progress=print)
+    try:
+        counts = move.run(keep_source=args.keep_source)
+    except RuntimeError as exc:
+        sys.exit(str(exc))
+    elapsed = time.perf_counter() - start
+    print(f"Moved {', '.join(f'{value} {name}' for name, value in counts.items())} in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,6 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database.database import SessionLocal
 from app.models.models import User as UserModel
-from app.core.security import verify_password
 
 def test_login(user_id, password):
     # Test using the actual API
@@ -0,0 +1,100 @@
+import sqlite3
+from contextlib import contextmanager
+from typing import List, Optional
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database.database import Base, statement_shape
+
+class CountingCursor(sqlite3.Cursor):
+    """Counts fetched rows against the statement that produced them"""
+    record: Optional[list] = None
+
+    def _count(self, rows):
+        if self.record is not None:
+            self.record[2] += len(rows)
+        return rows
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None and self.record is not None:
+            self.record[2] += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        return self._count(super().fetchmany(*args, **kwargs))
+
+    def fetchall(self):
+        return self._count(super().fetchall())
+
+class CountingConnection(sqlite3.Connection):
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+class QueryCounter:
+    """SQL statements (and rows fetched by each) run against the test engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        # [statement, parameters, rows fetched]
+        self.statements: List[list] = []
+        event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        record = [statement, parameters, 0]
+        self.statements.append(record)
+        if isinstance(cursor, CountingCursor):
+            cursor.record = record
+
+    def close(self) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    @contextmanager
+    def budget(self, queries: int, rows: Optional[int] = None, label: str = ""):
+        """Fail if the block runs more than `queries` statements or fetches more than `rows` rows"""
+        start = len(self.statements)
+        yield
+        taken = self.statements[start:]
+        fetched = sum(record[2] for record in taken)
+        if len(taken) > queries or (rows is not None and fetched > rows):
+            # Consecutive repeats of one statement (the usual N+1) are shown once with a count
+            lines, i = [], 0
+            while i < len(taken):
+                shape = statement_shape(taken[i][0])
+                j = i
+                while j + 1 < len(taken) and statement_shape(taken[j + 1][0]) == shape:
+                    j += 1
+                repeat = f"{j - i + 1} x " if j > i else ""
+                rows_fetched = sum(record[2] for record in taken[i:j + 1])
+                lines.append(f"  {i + 1}. {repeat}[{rows_fetched} rows] {shape}")
+                i = j + 1
+            listing = "\n".join(lines)
+            pytest.fail(
+                f"{label or 'Block'} ran {len(taken)} queries (budget {queries}) and fetched "
+                f"{fetched} rows (budget {rows if rows is not None else 'unlimited'}):\n{listing}",
+                pytrace=False
+            )
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False, "factory": CountingConnection},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+@pytest.fixture
+def query_counter(engine):
+    counter = QueryCounter(engine)
+    yield counter
+    counter.close()
@@ -0,0 +1,41 @@
+import pytest
+from app.core import celery_app as tasks
+from app.core.celery_app import celery_app, enqueue_follow_ups, BULK_QUEUE, INTERACTIVE_QUEUE, URGENT, BACKGROUND
+
+@pytest.fixture
+def eager(monkeypatch):
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+    sent = []
+    monkeypatch.setattr(tasks, "_send_follow_up", lambda customer_name, message: sent.append(customer_name))
+    return sent
+
+@pytest.mark.parametrize("task, queue", [
+    (tasks.send_follow_up_notification, INTERACTIVE_QUEUE),
+    (tasks.process_social_media_post, INTERACTIVE_QUEUE),
+    (tasks.send_follow_up_notifications, BULK_QUEUE),
+    (tasks.refresh_customer_scores, BULK_QUEUE),
+    (tasks.refresh_tenant_rollups, BULK_QUEUE),
+    (tasks.catch_up_daily_metrics, BULK_QUEUE),
+])
+def test_tasks_are_routed_to_their_queue(task, queue):
+    route = celery_app.amqp.router.route({}, task.name)
+
+    assert route["queue"].name == queue
+    assert task.ignore_result
+
+def test_single_notifications_outrank_background_refreshes():
+    urgent = celery_app.amqp.router.route({}, tasks.send_follow_up_notification.name)["priority"]
+    background = celery_app.amqp.router.route({}, tasks.refresh_customer_segments.name)["priority"]
+
+    assert (urgent, background) == (URGENT, BACKGROUND) and urgent != background
+
+def test_follow_ups_are_enqueued_in_chunks(eager, monkeypatch):
+    calls = []
+    batch = tasks.send_follow_up_notifications
+    monkeypatch.setattr(batch, "delay", lambda chunk: calls.append(len(chunk)) or batch.apply((chunk,)))
+
+    queued = enqueue_follow_ups([(f"Customer {i}", "Festival offer") for i in range(1201)], chunk_size=500)
+
+    assert queued == 3 and calls == [500, 500, 201]
+    assert eager == [f"Customer {i}" for i in range(1201)]
+    assert enqueue_follow_ups([]) == 0
@@ -0,0 +1,72 @@
+from datetime import datetime
+import numpy as np
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.database.database import get_db
+from app.models.models import User, Customer, Interaction, CustomerContactHistogram
+from app.core.contact_time import decode_histogram, record_inbound_interaction, rebuild_histograms, best_contact_times
+
+# 2024-06-03 is a Monday
+REPLIES = [datetime(2024, 6, 3, 10, 15), datetime(2024, 6, 3, 11, 5), datetime(2024, 6, 10, 10, 40),
+           datetime(2024, 6, 8, 21, 0)]
+
+def seed(db):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    customer = Customer(user_id=user.id, name="Asha", contact_info="asha@example.com")
+    quiet = Customer(user_id=user.id, name="Quiet", contact_info="quiet@example.com")
+    db.add_all([customer, quiet])
+    db.commit()
+    return user, customer, quiet
+
+def test_incremental_updates_match_rebuild(db):
+    user, customer, quiet = seed(db)
+    for timestamp in REPLIES:
+        db.add(Interaction(customer_id=customer.id, message="reply", sent_by="customer", timestamp=timestamp))
+        record_inbound_interaction(db, customer.id, user.id, timestamp)
+    db.add(Interaction(customer_id=customer.id, message="ping", sent_by=f"user_{user.id}",
+                       timestamp=datetime(2024, 6, 4, 3, 0)))
+    db.commit()
+    incremental = decode_histogram(db.get(CustomerContactHistogram, customer.id).histogram)
+
+    assert rebuild_histograms(db, user.id) == 1
+    db.expire_all()
+    row = db.get(CustomerContactHistogram, customer.id)
+    assert len(row.histogram) == 7 * 24 * 2
+    assert np.array_equal(decode_histogram(row.histogram), incremental)
+    assert row.total == len(REPLIES)
+
+    best, missing = best_contact_times(db, user.id, [customer.id, quiet.id])
+    assert best["best_hour"] == 10
+    assert best["best_day"] == "Monday"
+    assert best["best_contact_time"] == "10:00 AM - 12:00 PM"
+    assert missing["best_hour"] is None
+
+def test_bulk_best_time_endpoint(db):
+    user, customer, quiet = seed(db)
+    for timestamp in REPLIES:
+        record_inbound_interaction(db, customer.id, user.id, timestamp)
+    db.commit()
+
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        response = client.get("/customers/best-time", params={"user_id": user.id, "ids": f"{customer.id},{quiet.id}"})
+        assert response.status_code == 200
+        assert [r["best_hour"] for r in response.json()] == [10, None]
+
+        response = client.get("/customers/best-time", params={"user_id": user.id, "ids": "1,x"})
+        assert response.status_code == 400
+
+def test_deleting_a_customer_removes_its_histogram(db):
+    user, customer, quiet = seed(db)
+    for timestamp in REPLIES:
+        record_inbound_interaction(db, customer.id, user.id, timestamp)
+    db.commit()
+
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        assert client.delete(f"/customers/{customer.id}", params={"user_id": user.id}).status_code == 200
+    assert db.get(CustomerContactHistogram, customer.id) is None
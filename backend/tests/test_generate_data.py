@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.pool import StaticPool
+from generate_data import Generator, zipf_counts, tenant_user_id
+from app.models.models import User, Customer, Interaction, Referral
+
+def _dump(engine):
+    with engine.connect() as conn:
+        return {
+            model.__tablename__: conn.execute(select(model.__table__).order_by(model.id)).all()
+            for model in (User, Customer, Interaction, Referral)
+        }
+
+def _generate(batch_size: int, seed: int = 7):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    generator = Generator(engine, seed=seed, batch_size=batch_size, interactions_per_customer=5)
+    tenants = generator.run(tenants=10, customers=500)
+    return engine, generator, tenants
+
+def test_zipf_counts_are_skewed_and_exact():
+    counts = zipf_counts(10_000, 100, 1.1)
+
+    assert sum(counts) == 10_000
+    assert counts == sorted(counts, reverse=True)
+    assert counts[0] > 10 * counts[50]
+
+def test_generator_is_deterministic_regardless_of_batch_size():
+    first, generator, tenants = _generate(batch_size=1000)
+    second, _, _ = _generate(batch_size=37)
+
+    assert _dump(first) == _dump(second)
+    assert generator.counts["customers"] == 500
+    assert [tenant["customers"] for tenant in tenants] == zipf_counts(500, 10, 1.1)
+    with first.connect() as conn:
+        assert conn.execute(select(func.count(Interaction.id))).scalar() == generator.counts["interactions"] > 0
+        user_ids = conn.execute(select(User.user_id).order_by(User.id)).scalars().all()
+    assert user_ids == [tenant_user_id(7, rank) for rank in range(1, 11)]
+
+def test_generator_refuses_to_duplicate_a_seed():
+    engine, _, _ = _generate(batch_size=100)
+
+    with pytest.raises(RuntimeError, match="already generated"):
+        Generator(engine, seed=7).run(tenants=10, customers=500)
@@ -0,0 +1,116 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from datetime import datetime
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.database.database import Base, get_db
+from app.init_db import add_missing_columns, backfill_created_at, create_missing_indexes
+from app.models.models import User, Customer, Referral, DailyTenantMetrics
+from app.core.rollups import daily_metrics_totals
+
+def test_missing_columns_are_added_to_existing_tables():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        # customers as created before created_at existed
+        conn.execute(text(
+            "CREATE TABLE customers (id INTEGER PRIMARY KEY, user_id INTEGER, name VARCHAR, "
+            "contact_info VARCHAR, last_contacted DATETIME, notes VARCHAR)"
+        ))
+        conn.execute(text("INSERT INTO customers (id, user_id, name) VALUES (1, 1, 'Old')"))
+        conn.execute(text(
+            "CREATE TABLE referrals (id INTEGER PRIMARY KEY, user_id INTEGER, customer_id INTEGER, "
+            "referred_by VARCHAR, status VARCHAR, reward_points INTEGER)"
+        ))
+    Base.metadata.create_all(bind=engine)
+
+    assert add_missing_columns(engine) == ["customers.created_at", "referrals.created_at"]
+    assert add_missing_columns(engine) == []
+    assert "created_at" in {column["name"] for column in inspect(engine).get_columns("customers")}
+
+    db = sessionmaker(bind=engine)()
+    db.add(Customer(user_id=1, name="New", contact_info="n"))
+    db.commit()
+    created = {customer.name: customer.created_at for customer in db.query(Customer)}
+    assert created["Old"] is None and created["New"] is not None
+    db.close()
+    engine.dispose()
+
+def _old_schema_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE customers (id INTEGER PRIMARY KEY, user_id INTEGER, name VARCHAR, "
+            "contact_info VARCHAR, last_contacted DATETIME, notes VARCHAR)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE referrals (id INTEGER PRIMARY KEY, user_id INTEGER, customer_id INTEGER, "
+            "referred_by VARCHAR, status VARCHAR, reward_points INTEGER)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE interactions (id INTEGER PRIMARY KEY, customer_id INTEGER, "
+            "message VARCHAR, sent_by VARCHAR, timestamp DATETIME)"
+        ))
+    return engine
+
+def test_rows_predating_created_at_are_counted(monkeypatch):
+    engine = _old_schema_engine()
+    with engine.begin() as conn:
+        for customer_id in range(1, 4):
+            conn.execute(text(f"INSERT INTO customers (id, user_id, name) VALUES ({customer_id}, 1, 'Old')"))
+        conn.execute(text(
+            "INSERT INTO interactions (customer_id, message, sent_by, timestamp) "
+            "VALUES (1, 'hi', 'customer', '2024-05-02 10:00:00.000000')"
+        ))
+        for referral_id in range(1, 6):
+            status = "completed" if referral_id <= 3 else "pending"
+            conn.execute(text(
+                "INSERT INTO referrals (id, user_id, customer_id, referred_by, status, reward_points) "
+                f"VALUES ({referral_id}, 1, {referral_id % 3 + 1}, 'x', '{status}', 10)"
+            ))
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(User(id=1, name="Agent", user_id="agent1", password_hash="x"))
+    db.commit()
+    # Metrics built before the backfill (by an earlier init_db) miss every undated row
+    assert daily_metrics_totals(db, 1)["referrals_completed"] == 0
+
+    assert backfill_created_at(engine) == 1
+    assert backfill_created_at(engine) == 0
+    db.expire_all()
+    dated = {customer.id: customer.created_at for customer in db.query(Customer)}
+    assert dated[1] == datetime(2024, 5, 2, 10, 0) and None not in dated.values()
+    assert db.query(Referral).filter(Referral.created_at.is_(None)).count() == 0
+
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        stats = client.get("/referrals/stats", params={"user_id": 1}).json()
+        assert (stats["total_referrals"], stats["completed_referrals"], stats["total_earnings"]) == (5, 3, 30)
+
+        # Updating a legacy referral moves it between statuses on its own day
+        assert client.put("/referrals/4", json={"customer_id": 2, "referred_by": "x", "status": "completed",
+                                                "reward_points": 10}).status_code == 200
+        stats = client.get("/referrals/stats", params={"user_id": 1}).json()
+        assert (stats["total_referrals"], stats["completed_referrals"], stats["pending_referrals"]) == (5, 4, 1)
+    totals = daily_metrics_totals(db, 1)
+    assert totals["customers_added"] == 3
+    assert min(getattr(row, "referrals_pending") or 0 for row in db.query(DailyTenantMetrics)) >= 0
+    db.close()
+    engine.dispose()
+
+def test_missing_indexes_are_created_on_existing_tables():
+    engine = _old_schema_engine()
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+
+    created = create_missing_indexes(engine)
+    # Keyset pagination for conversation sync and history
+    assert "ix_interactions_customer_ts_id" in created
+    assert "ix_interactions_customer_ts_id" in {index["name"] for index in inspect(engine).get_indexes("interactions")}
+    # Follow-up sweep pages through stale customers on this index
+    assert "ix_customers_user_last_contacted" in created
+    assert "ix_customers_user_last_contacted" in {index["name"] for index in inspect(engine).get_indexes("customers")}
+    assert create_missing_indexes(engine) == []
+    engine.dispose()
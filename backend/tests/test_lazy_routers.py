@@ -0,0 +1,71 @@
+from fastapi.testclient import TestClient
+from app.main import create_app, ROUTERS
+from app.database.database import get_db
+from app.models.models import User
+from app.core.lazy import LazyRouter, load_routers, preload
+
+def _client(db, lazy):
+    app = create_app(lazy_routers=lazy)
+    app.dependency_overrides[get_db] = lambda: db
+    return app, TestClient(app)
+
+def test_router_loads_on_first_request_under_its_prefix(db):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    app, client = _client(db, lazy=True)
+    placeholders = {placeholder.module: placeholder for placeholder in app.state.lazy_routers}
+
+    with client:
+        assert client.get("/").status_code == 200
+        assert not placeholders["app.api.dashboard"].loaded
+
+        response = client.get("/dashboard/", params={"user_id": user.id})
+        assert response.status_code == 200
+        assert placeholders["app.api.dashboard"].loaded
+        assert not placeholders["app.api.customers"].loaded
+        # The dashboard routes took the placeholder's place; later requests hit them directly
+        assert placeholders["app.api.dashboard"] not in app.router.routes
+        assert client.get("/dashboard/", params={"user_id": user.id}).json() == response.json()
+
+def test_routers_sharing_a_prefix_load_in_turn(db):
+    app, client = _client(db, lazy=True)
+
+    with client:
+        # An image generator route: the assistant router is imported first and does not match
+        response = client.get("/ai/generate-image")
+
+    assert response.status_code == 405
+    assert {p.module for p in app.state.lazy_routers if p.loaded} == {"app.api.ai_assistant", "app.api.ai_image_generator"}
+
+def test_unknown_paths_still_404(db):
+    _, client = _client(db, lazy=True)
+
+    with client:
+        assert client.get("/customers/no/such/route").status_code == 404
+        assert client.get("/nowhere").status_code == 404
+
+def test_lazy_and_eager_apps_expose_the_same_routes(db):
+    lazy_app, lazy_client = _client(db, lazy=True)
+    eager_app, eager_client = _client(db, lazy=False)
+
+    assert eager_app.state.lazy_routers == []
+    with lazy_client, eager_client:
+        lazy_schema = lazy_client.get("/openapi.json").json()
+        assert lazy_schema["paths"] == eager_client.get("/openapi.json").json()["paths"]
+    # Building the schema loaded every router
+    assert all(placeholder.loaded for placeholder in lazy_app.state.lazy_routers)
+    assert not any(isinstance(route, LazyRouter) for route in lazy_app.router.routes)
+    assert len(lazy_app.state.lazy_routers) == len(ROUTERS)
+
+def test_load_routers_is_idempotent(db):
+    app, _ = _client(db, lazy=True)
+
+    load_routers(app)
+    routes = list(app.router.routes)
+    load_routers(app)
+
+    assert app.router.routes == routes
+
+def test_preload_skips_missing_modules():
+    preload(["json", "module_that_does_not_exist"])
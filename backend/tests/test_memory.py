@@ -0,0 +1,46 @@
+import logging
+import tracemalloc
+import pytest
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.database.database import get_db
+from app.core import memory, metrics, profiling
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        yield client
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    memory.snapshots.clear()
+
+def test_snapshot_diff_shows_growth(client):
+    assert client.post("/admin/memory/snapshots", headers=ADMIN).status_code == 409
+    client.post("/admin/memory/tracemalloc/start", headers=ADMIN, json={"frames": 5})
+    base = client.post("/admin/memory/snapshots", headers=ADMIN, params={"label": "before"}).json()["id"]
+
+    hoard = [bytearray(1024) for _ in range(2000)]
+    diff = client.get("/admin/memory/snapshots/diff", headers=ADMIN, params={"base": base}).json()
+    assert diff["top"][0]["size_diff_bytes"] >= 2000 * 1024
+    assert diff["top"][0]["file"].endswith("test_memory.py")
+    del hoard
+
+    status = client.get("/admin/memory", headers=ADMIN).json()
+    assert status["tracemalloc"]["tracing"] and len(status["snapshots"]) == 2
+    assert client.get("/admin/memory/snapshots/diff", headers=ADMIN, params={"base": 99}).status_code == 404
+
+def test_memory_guard_logs_allocation_sites(client, monkeypatch, caplog):
+    metrics.registry.reset()
+    monkeypatch.setattr(memory, "MEMORY_GUARD_MB", 0.001)
+    tracemalloc.start(5)
+    with caplog.at_level(logging.WARNING, logger="app.memory"):
+        client.get("/dashboard/", params={"user_id": 1})
+
+    assert any("Memory guard: GET /dashboard/" in record.getMessage() for record in caplog.records)
+    body = client.get("/metrics").text
+    assert 'http_request_alloc_peak_bytes_count{method="GET",route="/dashboard/"} 1' in body
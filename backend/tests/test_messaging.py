@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.database.database import get_db
+from app.models.models import User, Customer, Interaction
+
+START = datetime(2024, 6, 1, 9, 0)
+
+def test_conversation_sync_and_history(db):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    customer = Customer(user_id=user.id, name="Asha", contact_info="a@example.com")
+    db.add(customer)
+    db.commit()
+    # Two messages share a timestamp; the id breaks the tie
+    for minutes in [0, 1, 1, 2, 3]:
+        db.add(Interaction(customer_id=customer.id, message=f"m{minutes}", sent_by="customer",
+                           timestamp=START + timedelta(minutes=minutes)))
+    db.commit()
+
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    url = f"/messaging/conversations/{customer.id}"
+    with TestClient(app) as client:
+        page = client.get(f"{url}/history", params={"user_id": user.id, "limit": 2}).json()
+        assert [m["message"] for m in page["messages"]] == ["m3", "m2"]
+        assert page["has_more"]
+
+        older = client.get(f"{url}/history", params={"user_id": user.id, "limit": 2, "before": page["before"]}).json()
+        oldest = client.get(f"{url}/history", params={"user_id": user.id, "limit": 2, "before": older["before"]}).json()
+        ids = [m["id"] for p in (page, older, oldest) for m in p["messages"]]
+        assert len(set(ids)) == 5 and not oldest["has_more"]
+
+        token = page["sync_token"]
+        delta = client.get(f"{url}/sync", params={"user_id": user.id, "since": token}).json()
+        assert delta["messages"] == [] and delta["sync_token"] == token
+
+        db.add(Interaction(customer_id=customer.id, message="new", sent_by="user_1",
+                           timestamp=START + timedelta(minutes=3)))
+        db.commit()
+        delta = client.get(f"{url}/sync", params={"user_id": user.id, "since": token}).json()
+        assert [m["message"] for m in delta["messages"]] == ["new"]
+        assert delta["sync_token"] != token
+
+        full = client.get(f"{url}/sync", params={"user_id": user.id, "limit": 4}).json()
+        assert [m["message"] for m in full["messages"]] == ["m0", "m1", "m1", "m2"]
+
+        assert client.get(f"{url}/sync", params={"user_id": user.id, "since": "garbage!"}).status_code == 400
+        assert client.get(f"{url}/sync", params={"user_id": user.id + 1}).status_code == 404
+
+def test_cursor_on_deleted_message_is_gone(db):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    customer = Customer(user_id=user.id, name="Asha", contact_info="a@example.com")
+    db.add(customer)
+    db.commit()
+    for minutes in range(3):
+        db.add(Interaction(customer_id=customer.id, message=f"m{minutes}", sent_by="customer",
+                           timestamp=START + timedelta(minutes=minutes)))
+    db.commit()
+
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    url = f"/messaging/conversations/{customer.id}"
+    with TestClient(app) as client:
+        page = client.get(f"{url}/history", params={"user_id": user.id, "limit": 2}).json()
+        newest = db.get(Interaction, page["messages"][0]["id"])
+        oldest_shown = db.get(Interaction, page["messages"][-1]["id"])
+        db.delete(newest)
+        db.delete(oldest_shown)
+        db.commit()
+
+        # Without the cursor's row the keyset matches nothing; the client is told to start over
+        sync = client.get(f"{url}/sync", params={"user_id": user.id, "since": page["sync_token"]})
+        assert sync.status_code == 410
+        history = client.get(f"{url}/history", params={"user_id": user.id, "before": page["before"]})
+        assert history.status_code == 410
+
+        restart = client.get(f"{url}/sync", params={"user_id": user.id}).json()
+        assert [m["message"] for m in restart["messages"]] == ["m0"]
@@ -0,0 +1,46 @@
+import json
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.database.database import get_db
+from app.models.models import User
+from app.core import metrics
+
+def test_routes_are_recorded_and_exposed(db):
+    metrics.registry.reset()
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        client.get("/customers/", params={"user_id": user.id})
+        client.get("/customers/", params={"user_id": user.id})
+        client.get("/no-such-route")
+        client.get("/referrals/link/1")
+        body = client.get("/metrics").text
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/customers/",status="200"} 2' in body
+    assert 'route="unmatched",status="404"' in body
+    assert 'route="/referrals/link/{user_id}",status="200"' in body
+    assert 'http_request_db_seconds_count{method="GET",route="/customers/"} 2' in body
+    assert 'http_requests_in_flight{method="GET"} 1' in body  # the scrape itself
+
+def test_multiprocess_snapshots_are_merged(tmp_path):
+    metrics.registry.reset()
+    metrics.registry.observe("http_request_duration_seconds", ("GET", "/", "200"), 0.02)
+    metrics.registry.inc_gauge("http_requests_in_flight", ("GET",))
+
+    # A worker that has since exited: its counters stay, its gauges don't
+    exited = {
+        "pid": 2 ** 22 + 7,
+        "histograms": {"http_request_duration_seconds": [[["GET", "/", "200"], [1] + [0] * 12 + [0.001]]]},
+        "gauges": {"http_requests_in_flight": [[["GET"], 5]]},
+    }
+    (tmp_path / "metrics-exited.json").write_text(json.dumps(exited))
+
+    body = metrics.render(metrics.collect(str(tmp_path)))
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"} 2' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/",status="200",le="0.005"} 1' in body
+    assert 'http_requests_in_flight{method="GET"} 1' in body
+    metrics.registry.reset()
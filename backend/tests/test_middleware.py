@@ -0,0 +1,38 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.core.security_utils import SecurityHeadersMiddleware
+
+def test_security_headers_and_request_id():
+    with TestClient(create_app()) as client:
+        response = client.get("/")
+        assert response.headers["X-Frame-Options"] == "DENY"
+        assert response.headers["X-Content-Type-Options"] == "nosniff"
+        assert len(response.headers["X-Request-ID"]) == 32
+        assert response.headers["X-Response-Time"].endswith("ms")
+
+        assert client.get("/", headers={"X-Request-ID": "abc-123"}).headers["X-Request-ID"] == "abc-123"
+        assert client.get("/", headers={"X-Request-ID": "bad id\\x"}).headers["X-Request-ID"] != "bad id\\x"
+
+def test_streaming_body_passes_through_unwrapped():
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        for chunk in (b"a", b"b"):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+    asyncio.run(SecurityHeadersMiddleware(streaming_app)(scope, receive, send))
+
+    assert [m["type"] for m in sent] == ["http.response.start"] + ["http.response.body"] * 3
+    assert [m["body"] for m in sent[1:]] == [b"a", b"b", b""]
+    assert (b"x-frame-options", b"DENY") in sent[0]["headers"]
+    assert scope["state"]["request_id"]
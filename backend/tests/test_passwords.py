@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+from sqlalchemy import event
+from app.main import create_app
+from app.database.database import get_db, get_directory_db
+from app.models.models import User
+from app.core import passwords
+
+@pytest.fixture
+def fast_hashing(monkeypatch):
+    monkeypatch.setattr(passwords, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+    monkeypatch.setattr(passwords, "POOL_WORKERS", 0)
+
+@pytest.fixture
+def client(db):
+    app = create_app()
+    app.dependency_overrides[get_db] = app.dependency_overrides[get_directory_db] = lambda: db
+    with TestClient(app) as client:
+        yield client
+
+def test_login_rehashes_outdated_cost(db, client, fast_hashing):
+    old_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+    user = User(name="Agent", user_id="agent1", password_hash=old_context.hash("secret"))
+    db.add(user)
+    db.commit()
+
+    response = client.post("/auth/login", json={"user_id": "agent1", "password": "secret"})
+    assert response.status_code == 200
+    db.refresh(user)
+    assert user.password_hash.startswith("$2b$05$")
+    assert user.check_password("secret")
+
+    response = client.post("/auth/login", json={"user_id": "agent1", "password": "wrong"})
+    assert response.status_code == 400
+
+def test_saturated_pool_returns_503(db, client, fast_hashing, monkeypatch):
+    user = User(name="Agent", user_id="agent1")
+    user.set_password("secret")
+    db.add(user)
+    db.commit()
+
+    full = threading.BoundedSemaphore(1)
+    full.acquire()
+    monkeypatch.setattr(passwords, "_pending", full)
+    response = client.post("/auth/login", json={"user_id": "agent1", "password": "secret"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_process_pool_verifies(monkeypatch):
+    monkeypatch.setattr(passwords, "POOL_WORKERS", 1)
+    password_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+    try:
+        assert asyncio.run(passwords.verify_password("secret", password_hash))
+        assert not asyncio.run(passwords.verify_password("nope", password_hash))
+    finally:
+        passwords.shutdown_pool()
+
+def _loop_running() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+def test_auth_queries_stay_off_the_event_loop(db, client, fast_hashing):
+    on_loop = []
+    listener = lambda *args: on_loop.append(_loop_running())
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        assert client.post("/auth/signup", json={"name": "Agent", "user_id": "agent1", "password": "secret"}).status_code == 200
+        assert client.post("/auth/login", json={"user_id": "agent1", "password": "secret"}).status_code == 200
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+    assert on_loop and not any(on_loop)
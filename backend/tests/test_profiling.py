@@ -0,0 +1,59 @@
+import json
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.database.database import get_db
+from app.core import profiling
+from app.core.profiling import Sampler, to_collapsed
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+@pytest.fixture
+def client(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        yield client
+
+def busy_work(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def test_sampler_captures_busy_function():
+    sampler = Sampler(interval=0.001).start()
+    busy_work(0.05)
+    sampler.stop()
+    assert sampler.samples > 0
+    assert "busy_work (test_profiling.py" in to_collapsed(sampler.stacks)
+
+def test_profile_requires_admin_token(client):
+    response = client.get("/dashboard/", params={"user_id": 1, "__profile": "speedscope"})
+    assert "X-Profile-File" not in response.headers
+    assert client.get("/admin/profiling").status_code == 403
+
+def test_request_profile_is_saved_and_downloadable(client):
+    response = client.get("/dashboard/", params={"user_id": 1}, headers={**ADMIN, "X-Profile": "speedscope"})
+    assert response.status_code == 200
+    filename = response.headers["X-Profile-File"]
+
+    profile = client.get(f"/admin/profiles/{filename}", headers=ADMIN).json()
+    assert profile["profiles"][0]["type"] == "sampled"
+    assert filename in client.get("/admin/profiling", headers=ADMIN).json()["files"]
+    assert client.get("/admin/profiles/..%2Fsecret", headers=ADMIN).status_code in (400, 404)
+
+def test_rolling_route_profile(client, tmp_path):
+    response = client.put("/admin/profiling/routes", headers=ADMIN, json={"route": "/dashboard/", "rate": 1.0})
+    assert response.status_code == 200
+    client.get("/dashboard/", params={"user_id": 1})
+    client.get("/", params={"user_id": 1})
+
+    status = client.get("/admin/profiling", headers=ADMIN).json()["rolling"]
+    assert [entry["route"] for entry in status] == ["/dashboard/"]
+    assert (tmp_path / status[0]["file"]).exists()
+
+    assert client.delete("/admin/profiling/routes", params={"route": "/dashboard/"}, headers=ADMIN).status_code == 200
+    assert client.put("/admin/profiling/routes", headers=ADMIN, json={"route": "/x", "rate": 2}).status_code == 400
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import queue
+import pytest
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.database.database import get_db
+from app.models.models import User, Customer
+from app.core import pubsub
+from app.core.pubsub import InMemoryBroker, RedisBroker, SubscriptionClosed
+
+class FakeRedis:
+    """Just enough of redis-py's publish/pubsub API for the broker"""
+
+    def __init__(self):
+        self.listeners = []
+
+    def publish(self, channel, message):
+        for listener in self.listeners:
+            listener.put({"type": "pmessage", "pattern": b"events:*",
+                          "channel": channel.encode(), "data": message.encode()})
+        return len(self.listeners)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        fake = self
+
+        class FakePubSub:
+            def __init__(self):
+                self.messages = queue.Queue()
+
+            def psubscribe(self, pattern):
+                fake.listeners.append(self.messages)
+
+            def get_message(self, timeout=0.0):
+                try:
+                    return self.messages.get(timeout=timeout)
+                except queue.Empty:
+                    return None
+
+            def close(self):
+                fake.listeners.remove(self.messages)
+
+        return FakePubSub()
+
+@pytest.fixture
+def broker():
+    broker = InMemoryBroker(buffer_size=4)
+    pubsub.set_broker(broker)
+    yield broker
+    pubsub.set_broker(None)
+
+def test_slow_consumer_is_disconnected():
+    async def scenario():
+        broker = InMemoryBroker(buffer_size=2)
+        fast = broker.subscribe("tenant:1")
+        slow = broker.subscribe("tenant:1")
+        other = broker.subscribe("tenant:2")
+        for n in range(3):
+            broker.publish("tenant:1", str(n))
+            await fast.get()
+        with pytest.raises(SubscriptionClosed):
+            await slow.get()
+        assert slow.close_reason == "slow_consumer"
+        assert broker.subscriber_count("tenant:1") == 1
+        assert other.queue.empty()
+
+    asyncio.run(scenario())
+
+def test_redis_broker_relays_between_workers():
+    async def scenario():
+        client = FakeRedis()
+        worker_a, worker_b = RedisBroker(client), RedisBroker(client)
+        subscription = worker_b.subscribe("tenant:7")
+        worker_a.publish("tenant:7", "hello")
+        assert await asyncio.wait_for(subscription.get(), timeout=5) == "hello"
+        worker_b.close()
+
+    asyncio.run(scenario())
+
+def test_websocket_receives_tenant_events(db, broker):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    customer = Customer(user_id=user.id, name="Asha", contact_info="a@example.com")
+    db.add(customer)
+    db.commit()
+
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/realtime/ws?user_id={user.id}") as websocket:
+            response = client.post("/messaging/send", json={
+                "customer_id": customer.id, "message": "Hi", "user_id": user.id
+            })
+            assert response.status_code == 200
+            event = websocket.receive_json()
+            assert event["type"] == "message.sent"
+            assert event["data"]["customer_id"] == customer.id
+
+            client.post(f"/customers/{customer.id}/contact", json={"message": "Thanks", "sent_by": "customer"})
+            assert websocket.receive_json()["type"] == "customer.contacted"
+
+            # Other tenants' events are not delivered
+            pubsub.publish_event(user.id + 1, "message.sent", {})
+            pubsub.publish_event(user.id, "referral.created", {})
+            assert websocket.receive_json()["type"] == "referral.created"
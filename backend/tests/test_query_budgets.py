@@ -0,0 +1,100 @@
+"""Per-endpoint SQL budgets: a regression that adds queries (an N+1, a lost
+join) or fetches far more rows than it returns fails here with the
+offending statements listed.
+
+Budgets are for steady state: the tenant's rollups are backfilled first.
+"""
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.database.database import get_db
+from app.models.models import User, Customer, Interaction, Referral
+from app.core.rollups import rebuild_daily_metrics
+
+CUSTOMERS = 120
+
+@pytest.fixture
+def tenant(db):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    customers = [Customer(user_id=user.id, name=f"Customer {i}", contact_info=f"c{i}@example.com")
+                 for i in range(CUSTOMERS)]
+    db.add_all(customers)
+    db.commit()
+    start = datetime(2024, 6, 1)
+    for i, customer in enumerate(customers):
+        for n in range(3):
+            db.add(Interaction(customer_id=customer.id, message=f"[SMS] hello {n}",
+                               sent_by="customer" if n == 1 else f"user_{user.id}",
+                               timestamp=start + timedelta(hours=i, minutes=n)))
+        if i % 4 == 0:
+            db.add(Referral(user_id=user.id, customer_id=customer.id, referred_by="x",
+                            status="completed" if i % 8 == 0 else "pending", reward_points=100))
+    db.commit()
+    rebuild_daily_metrics(db, user.id)
+    return {"user_id": user.id, "customer_ids": [customer.id for customer in customers]}
+
+@pytest.fixture
+def client(db):
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        yield client
+
+# (label, method, path, params or body, max queries, max rows fetched)
+BUDGETS = [
+    ("dashboard", "GET", "/dashboard/", lambda t: {"user_id": t["user_id"]}, 2, 8),
+    ("dashboard period", "GET", "/dashboard/", lambda t: {"user_id": t["user_id"], "days": 30}, 4, 10),
+    ("dashboard timeseries", "GET", "/dashboard/timeseries", lambda t: {"user_id": t["user_id"]}, 2, 32),
+    ("customer list", "GET", "/customers/", lambda t: {"user_id": t["user_id"], "limit": 50}, 1, 50),
+    ("customer search", "GET", "/customers/search", lambda t: {"user_id": t["user_id"], "query": "c7@example"}, 1, 1),
+    ("conversation", "GET", "/messaging/conversations/{customer}", lambda t: {"user_id": t["user_id"]}, 2, 4),
+    ("conversation sync", "GET", "/messaging/conversations/{customer}/sync",
+     lambda t: {"user_id": t["user_id"], "limit": 2}, 2, 4),
+    ("conversation history", "GET", "/messaging/conversations/{customer}/history",
+     lambda t: {"user_id": t["user_id"], "limit": 2}, 2, 4),
+    ("referral list", "GET", "/referrals/", lambda t: {"user_id": t["user_id"]}, 1, CUSTOMERS // 4),
+    ("referral stats", "GET", "/referrals/stats", lambda t: {"user_id": t["user_id"]}, 2, 2),
+    ("send", "POST", "/messaging/send", lambda t: {
+        "user_id": t["user_id"], "customer_id": t["customer_ids"][0], "message": "hi", "platform": "sms"
+    }, 5, 3),
+]
+
+@pytest.mark.parametrize("label, method, path, arguments, queries, rows", BUDGETS, ids=[b[0] for b in BUDGETS])
+def test_endpoint_query_budget(client, tenant, query_counter, label, method, path, arguments, queries, rows):
+    url = path.format(customer=tenant["customer_ids"][5])
+    options = {"params": arguments(tenant)} if method == "GET" else {"json": arguments(tenant)}
+
+    with query_counter.budget(queries, rows, label=f"{method} {path}"):
+        response = client.request(method, url, **options)
+    assert response.status_code == 200, response.text
+
+@pytest.mark.parametrize("recipients", [1, 10, CUSTOMERS])
+def test_bulk_message_budget_is_independent_of_recipients(client, tenant, query_counter, db, recipients):
+    customer_ids = tenant["customer_ids"][:recipients]
+
+    with query_counter.budget(3, rows=recipients, label=f"POST /messaging/bulk-message x{recipients}"):
+        response = client.post("/messaging/bulk-message", json={
+            "customer_ids": customer_ids, "message": "offer", "user_id": tenant["user_id"]
+        })
+    assert response.status_code == 200
+    assert response.json()["sent_count"] == recipients
+    assert db.query(Interaction).filter(Interaction.message == "[BULK-WHATSAPP] offer").count() == recipients
+    assert db.query(Customer).filter(Customer.id.in_(customer_ids), Customer.last_contacted.isnot(None)).count() == recipients
+
+def test_bulk_message_rejects_foreign_customers_without_writing(client, tenant, db):
+    other = User(name="Other", user_id="agent2", password_hash="x")
+    db.add(other)
+    db.commit()
+    stranger = Customer(user_id=other.id, name="Stranger", contact_info="s@example.com")
+    db.add(stranger)
+    db.commit()
+
+    response = client.post("/messaging/bulk-message", json={
+        "customer_ids": [tenant["customer_ids"][0], stranger.id], "message": "offer", "user_id": tenant["user_id"]
+    })
+    assert response.status_code == 400
+    assert db.query(Interaction).filter(Interaction.message == "[BULK-WHATSAPP] offer").count() == 0
+    assert db.query(Customer).filter(Customer.last_contacted.isnot(None)).count() == 0
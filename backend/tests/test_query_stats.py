@@ -0,0 +1,41 @@
+import logging
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app.core.metrics import MetricsMiddleware, MetricsRegistry
+from app.database import database
+from app.database.database import get_db, statement_shape, parameter_shape
+from app.models.models import User, Customer
+
+def test_statement_and_parameter_shapes():
+    assert statement_shape("SELECT *\n  FROM t WHERE id IN (?, ?, ?)") == "SELECT * FROM t WHERE id IN (?, ...)"
+    assert statement_shape("SELECT * FROM t WHERE id IN (%(id_1_1)s, %(id_1_2)s)") == "SELECT * FROM t WHERE id IN (?, ...)"
+    assert parameter_shape((1, "x")) == "(int, str)"
+    assert parameter_shape([(1,), (2,)], executemany=True) == "2 x (int)"
+
+def test_n_plus_one_and_server_timing(db, caplog, monkeypatch):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    db.add_all([Customer(user_id=user.id, name=f"c{i}", contact_info="x") for i in range(6)])
+    db.commit()
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, registry=MetricsRegistry())
+    app.dependency_overrides[get_db] = lambda: db
+
+    @app.get("/names")
+    def names(db: Session = Depends(get_db)):
+        ids = [row.id for row in db.query(Customer.id).all()]
+        # One query per customer: the pattern the detector should flag
+        return [db.query(Customer).filter(Customer.id == customer_id).first().name for customer_id in ids]
+
+    monkeypatch.setattr(database, "SLOW_QUERY_MS", 0.0)
+    with caplog.at_level(logging.WARNING, logger="app.sql"), TestClient(app) as client:
+        response = client.get("/names")
+
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    assert 'desc="7 queries"' in response.headers["Server-Timing"]
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("Possible N+1 in GET /names: 6 x SELECT" in message for message in messages)
+    assert any(message.startswith("Slow query") and "params (int, int, int)" in message for message in messages)
@@ -0,0 +1,162 @@
+import pytest
+from datetime import datetime, timedelta, date
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database.database import Base
+from app.models.models import User, Customer, Interaction, DailyResponseRollup
+from app.core import rollups
+from app.core.rollups import ROLLUP_SETTLE_SECONDS, refresh_response_rollups, response_analytics, format_duration
+
+DAY = datetime(2024, 6, 3, 9, 0)
+
+def test_response_rollups_are_incremental(db):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    asha = Customer(user_id=user.id, name="Asha", contact_info="a@example.com")
+    ravi = Customer(user_id=user.id, name="Ravi", contact_info="r@example.com")
+    db.add_all([asha, ravi])
+    db.commit()
+
+    def message(customer, sent_by, minutes):
+        db.add(Interaction(customer_id=customer.id, message="m", sent_by=sent_by,
+                           timestamp=DAY + timedelta(minutes=minutes)))
+        db.commit()
+
+    message(asha, "user_1", 0)
+    message(asha, "customer", 60)      # reply after 1h
+    message(ravi, "user_1", 10)
+    message(ravi, "system", 20)        # ignored when pairing
+    assert refresh_response_rollups(db, user.id) == 3
+
+    stats = response_analytics(db, user.id)
+    assert stats["response_rate"] == 50.0
+    assert stats["avg_response_time"] == "1h 0m"
+
+    # A late reply is credited to the day of the original message
+    db.add(Interaction(customer_id=ravi.id, message="m", sent_by="customer", timestamp=DAY + timedelta(days=1, hours=2)))
+    db.commit()
+    assert refresh_response_rollups(db, user.id) == 1
+    assert refresh_response_rollups(db, user.id) == 0
+
+    row = db.get(DailyResponseRollup, (user.id, date(2024, 6, 3)))
+    assert (row.outbound_count, row.responded_count) == (2, 2)
+    assert response_analytics(db, user.id)["response_rate"] == 100.0
+    assert response_analytics(db, user.id, start=date(2024, 6, 4))["response_rate"] == 0.0
+
+def _conversation(db, timestamps):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    customer = Customer(user_id=user.id, name="Asha", contact_info="a@example.com")
+    db.add(customer)
+    db.commit()
+    for i, timestamp in enumerate(timestamps):
+        db.add(Interaction(customer_id=customer.id, message="m", sent_by="customer" if i % 2 else "user_1",
+                           timestamp=timestamp))
+        db.commit()
+    return user.id
+
+def test_concurrent_folds_count_each_interaction_once(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        user_pk = _conversation(db, [DAY, DAY + timedelta(minutes=30)])
+    first, second = Session(), Session()
+    read_watermark = rollups.get_watermark
+
+    def racing_read(db, user_id, name):
+        watermark = read_watermark(db, user_id, name)
+        if db is first:
+            # Another worker folds the same interactions after we read the watermark
+            assert refresh_response_rollups(second, user_id) == 2
+        return watermark
+
+    monkeypatch.setattr(rollups, "get_watermark", racing_read)
+    assert refresh_response_rollups(first, user_pk) == 0
+
+    row = first.get(DailyResponseRollup, (user_pk, DAY.date()))
+    assert (row.outbound_count, row.responded_count) == (1, 1)
+    first.close()
+    second.close()
+    engine.dispose()
+
+def test_fold_waits_for_interactions_to_settle(db):
+    now = DAY + timedelta(days=1)
+    recent = now - timedelta(seconds=ROLLUP_SETTLE_SECONDS - 60)
+    # The reply got a lower id but a later timestamp than a message already settled
+    user_pk = _conversation(db, [DAY, recent, DAY + timedelta(hours=2)])
+
+    assert refresh_response_rollups(db, user_pk, now=now) == 1
+    assert db.get(DailyResponseRollup, (user_pk, DAY.date())).outbound_count == 1
+    assert refresh_response_rollups(db, user_pk, now=now + timedelta(minutes=2)) == 2
+    row = db.get(DailyResponseRollup, (user_pk, DAY.date()))
+    assert (row.outbound_count, row.responded_count) == (2, 1)
+
+def test_resolve_date_range_rejects_bad_ranges():
+    from app.core.rollups import resolve_date_range
+    assert resolve_date_range(7, end=date(2024, 6, 7)) == (date(2024, 6, 1), date(2024, 6, 7))
+    for args in [(0,), (None, date(2024, 6, 2), date(2024, 6, 1)), (1000,)]:
+        with pytest.raises(ValueError):
+            resolve_date_range(*args)
+
+def test_format_duration():
+    assert format_duration(8100) == "2h 15m"
+    assert format_duration(20) == "<1m"
+    assert format_duration(None) is None
+
+def test_daily_metrics_from_writes_match_rebuild(db):
+    from fastapi.testclient import TestClient
+    from app.main import create_app
+    from app.database.database import get_db
+    from app.core.rollups import rebuild_daily_metrics, daily_metrics_totals, ensure_daily_metrics
+
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    # Backfill up front so the counts below come from the write path
+    ensure_daily_metrics(db, user.id)
+
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        customer_id = client.post("/customers/", json={
+            "name": "Asha", "contact_info": "a@example.com", "user_id": user.id
+        }).json()["id"]
+        client.post("/messaging/send", json={
+            "customer_id": customer_id, "message": "hi", "platform": "sms", "user_id": user.id
+        })
+        client.post("/messaging/bulk-message", json={
+            "customer_ids": [customer_id], "message": "offer", "user_id": user.id
+        })
+        client.post(f"/customers/{customer_id}/contact", json={"message": "thanks", "sent_by": "customer"})
+        referral_id = client.post("/referrals/", json={
+            "customer_id": customer_id, "referred_by": "x", "status": "pending", "reward_points": 0, "user_id": user.id
+        }).json()["id"]
+        client.put(f"/referrals/{referral_id}", json={
+            "customer_id": customer_id, "referred_by": "x", "status": "completed", "reward_points": 100
+        })
+        client.post(f"/digital-presence/website/{user.id}/view")
+
+        incremental = daily_metrics_totals(db, user.id)
+        assert incremental["customers_added"] == 1
+        assert incremental["messages_sms"] == 1
+        assert incremental["messages_whatsapp"] == 1
+        assert incremental["messages_received"] == 1
+        assert (incremental["referrals_pending"], incremental["referrals_completed"]) == (0, 1)
+        assert incremental["rewards_earned"] == 100
+
+        rebuild_daily_metrics(db, user.id)
+        assert daily_metrics_totals(db, user.id) == incremental
+
+        response = client.get("/dashboard/timeseries", params={"user_id": user.id, "days": 90})
+        assert response.status_code == 200
+        assert len(response.json()["days"]) == 90
+        assert response.json()["days"][-1]["customers_added"] == 1
+
+        stats = client.get("/referrals/stats", params={"user_id": user.id}).json()
+        assert (stats["total_referrals"], stats["total_earnings"]) == (1, 100)
+
+        response = client.get("/dashboard/timeseries", params={"user_id": user.id, "days": 1000})
+        assert response.status_code == 400
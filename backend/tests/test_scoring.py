@@ -0,0 +1,107 @@
+import pytest
+import numpy as np
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.database.database import get_db
+from app.models.models import User, Customer, Interaction, CustomerScore
+from app.core import celery_app as tasks
+from app.core.scoring import (
+    SCORE_MAX_AGE_HOURS, compute_scores, refresh_customer_scores, refresh_stale_scores, format_hour_window
+)
+from app.database.sharding import ShardRouter
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+@pytest.fixture
+def tenant(db):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    active = Customer(user_id=user.id, name="Active", contact_info="a@example.com")
+    dormant = Customer(user_id=user.id, name="Dormant", contact_info="d@example.com")
+    silent = Customer(user_id=user.id, name="Silent", contact_info="s@example.com")
+    db.add_all([active, dormant, silent])
+    db.commit()
+    for day in range(6):
+        db.add(Interaction(customer_id=active.id, message="hi", sent_by="customer",
+                           timestamp=NOW - timedelta(days=day, hours=2)))
+    db.add(Interaction(customer_id=dormant.id, message="old", sent_by="user_1",
+                       timestamp=NOW - timedelta(days=120)))
+    db.commit()
+    return user, active, dormant, silent
+
+def test_refresh_scores_ranks_customers(db, tenant):
+    user, active, dormant, silent = tenant
+    assert refresh_customer_scores(db, user.id, now=NOW) == 3
+
+    scores = {s.customer_id: s for s in db.query(CustomerScore).all()}
+    assert scores[active.id].engagement_score > scores[dormant.id].engagement_score
+    assert scores[active.id].churn_risk < scores[dormant.id].churn_risk
+    assert scores[active.id].best_contact_hour == 10
+    assert scores[active.id].interaction_count == 6
+    assert scores[silent.id].best_contact_hour is None
+    assert scores[silent.id].churn_risk == 1.0
+
+def test_refresh_stale_scores_only_touches_changed_customers(db, tenant):
+    user, active, dormant, silent = tenant
+    refresh_customer_scores(db, user.id, now=NOW)
+    assert refresh_stale_scores(db, user.id, now=NOW) == 0
+
+    db.add(Interaction(customer_id=dormant.id, message="back", sent_by="customer", timestamp=NOW))
+    db.commit()
+    assert refresh_stale_scores(db, user.id, now=NOW) == 1
+    assert db.get(CustomerScore, dormant.id).interaction_count == 2
+
+def test_scores_decay_without_new_interactions(db, tenant):
+    user, active, dormant, silent = tenant
+    refresh_customer_scores(db, user.id, now=NOW)
+    recency = db.get(CustomerScore, active.id).recency_score
+
+    assert refresh_stale_scores(db, user.id, now=NOW + timedelta(hours=SCORE_MAX_AGE_HOURS - 1)) == 0
+    later = NOW + timedelta(days=14)
+    assert refresh_stale_scores(db, user.id, now=later) == 3
+    db.expire_all()
+    score = db.get(CustomerScore, active.id)
+    assert score.computed_at == later
+    assert score.recency_score == pytest.approx(recency / 2)
+
+def test_beat_rescores_every_tenant(db, engine, tenant, monkeypatch):
+    user, active, dormant, silent = tenant
+    refresh_customer_scores(db, user.id, now=NOW)
+    monkeypatch.setattr(tasks, "shards", ShardRouter({"default": engine}))
+    monkeypatch.setattr(tasks.celery_app.conf, "task_always_eager", True)
+
+    assert tasks.refresh_all_customer_scores.apply().get() == {"status": "scored", "shards": {"default": 3}}
+    assert "refresh-all-customer-scores" in tasks.celery_app.conf.beat_schedule
+
+def test_deleting_a_customer_removes_its_score(db, tenant):
+    user, active, dormant, silent = tenant
+    refresh_customer_scores(db, user.id)
+
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        assert client.delete(f"/customers/{active.id}", params={"user_id": user.id}).status_code == 200
+    assert {score.customer_id for score in db.query(CustomerScore)} == {dormant.id, silent.id}
+
+def test_compute_scores_handles_large_batches():
+    n = 100_000
+    rng = np.random.default_rng(0)
+    count = rng.integers(0, 50, n)
+    aggregates = {
+        "count": count,
+        "inbound": count // 2,
+        "recent": count // 3,
+        "last_ts": np.where(count > 0, 1.7e9 - rng.integers(0, 10**7, n), np.nan),
+        "hour_counts": rng.integers(0, 5, (n, 24)),
+        "inbound_hour_counts": rng.integers(0, 5, (n, 24)),
+    }
+    scores = compute_scores(aggregates, 1.7e9)
+    assert scores["engagement_score"].shape == (n,)
+    assert np.all((scores["churn_risk"] >= 0) & (scores["churn_risk"] <= 1))
+
+def test_format_hour_window():
+    assert format_hour_window(10) == "10:00 AM - 12:00 PM"
+    assert format_hour_window(23) == "11:00 PM - 1:00 AM"
+    assert format_hour_window(None) is None
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.database.database import get_db
+from app.models.models import User, Customer, Interaction, Referral, CustomerSegment
+from app.core import celery_app as tasks
+from app.core.segmentation import SEGMENT_MAX_AGE_HOURS, refresh_segments, refresh_stale_segments
+from app.database.sharding import ShardRouter
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+def make_customer(db, user, name, created_days_ago, interactions_days_ago=()):
+    customer = Customer(user_id=user.id, name=name, contact_info=f"{name}@example.com",
+                        created_at=NOW - timedelta(days=created_days_ago))
+    db.add(customer)
+    db.commit()
+    for days in interactions_days_ago:
+        db.add(Interaction(customer_id=customer.id, message="hi", sent_by="customer",
+                           timestamp=NOW - timedelta(days=days)))
+    db.commit()
+    return customer
+
+def test_rule_buckets(db):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    fresh = make_customer(db, user, "fresh", 5, [1, 2, 3])
+    newbie = make_customer(db, user, "newbie", 5)
+    whale = make_customer(db, user, "whale", 400, [100 + d for d in range(12)])
+    regular = make_customer(db, user, "regular", 400, [10])
+    gone = make_customer(db, user, "gone", 400, [200])
+    db.add(Referral(user_id=user.id, customer_id=whale.id, referred_by="x", status="completed", reward_points=100))
+    db.commit()
+
+    assert refresh_segments(db, user.id, now=NOW) == 5
+    segments = {s.customer_id: s.segment for s in db.query(CustomerSegment).all()}
+    assert segments == {
+        fresh.id: "new_engaged",
+        newbie.id: "new",
+        whale.id: "high_value_dormant",
+        regular.id: "active",
+        gone.id: "dormant",
+    }
+
+    # Only the customer with a new interaction is re-assigned
+    db.add(Interaction(customer_id=gone.id, message="back", sent_by="customer"))
+    db.commit()
+    assert refresh_stale_segments(db, user.id, now=NOW) == 1
+
+def test_segments_move_with_time_without_new_interactions(db, engine, monkeypatch):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    newbie = make_customer(db, user, "newbie", 5)
+    regular = make_customer(db, user, "regular", 400, [10])
+    refresh_segments(db, user.id, now=NOW)
+
+    assert refresh_stale_segments(db, user.id, now=NOW + timedelta(hours=SEGMENT_MAX_AGE_HOURS - 1)) == 0
+    assert refresh_stale_segments(db, user.id, now=NOW + timedelta(days=40)) == 2
+    db.expire_all()
+    segments = {s.customer_id: s.segment for s in db.query(CustomerSegment)}
+    assert segments == {newbie.id: "dormant", regular.id: "at_risk"}
+
+    # Beat re-assigns every tenant
+    monkeypatch.setattr(tasks, "shards", ShardRouter({"default": engine}))
+    assert tasks.refresh_all_customer_segments() == {"status": "segmented", "shards": {"default": 2}}
+
+def test_customer_list_filters_by_segment(db):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    make_customer(db, user, "fresh", 5, [1, 2])
+    make_customer(db, user, "gone", 400, [200])
+    refresh_segments(db, user.id, now=NOW)
+
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        response = client.get("/customers/", params={"user_id": user.id, "segment": "new_engaged"})
+        assert response.status_code == 200
+        assert [c["name"] for c in response.json()] == ["fresh"]
+
+        response = client.get("/customers/segments", params={"user_id": user.id})
+        assert response.json()["segments"]["dormant"] == 1
+
+        response = client.get("/customers/", params={"user_id": user.id, "segment": "bogus"})
+        assert response.status_code == 400
+
+def test_deleted_customer_leaves_segment_counts(db):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    make_customer(db, user, "fresh", 5, [1, 2])
+    gone = make_customer(db, user, "gone", 400, [200])
+    refresh_segments(db, user.id, now=NOW)
+
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        assert client.delete(f"/customers/{gone.id}", params={"user_id": user.id}).status_code == 200
+        counts = client.get("/customers/segments", params={"user_id": user.id}).json()["segments"]
+        assert counts["dormant"] == 0 and sum(counts.values()) == 1
+    assert db.query(CustomerSegment).filter(CustomerSegment.customer_id == gone.id).count() == 0
@@ -0,0 +1,87 @@
+"""The fast list serializers must produce exactly the bytes of the response_model path."""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+import pytest
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.database.database import get_db
+from app.models.models import User, Customer, Referral
+from app.api import customers as customers_api, referrals as referrals_api, dashboard as dashboard_api
+from app.core.segmentation import refresh_segments
+from pydantic import TypeAdapter
+from app.core.serialization import ORJSONResponse, RowSerializer
+from app.schemas.schemas import Customer as CustomerSchema
+
+@pytest.fixture
+def tenant(db):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    names = ["Ásha   \"quoted\"", "Zoë\n😀", "</script>", "Plain"]
+    customers = [
+        Customer(user_id=user.id, name=names[i % 4], contact_info=f"c{i}@example.com",
+                 notes=None if i % 3 else f"note {i} \x7f",
+                 last_contacted=None if i % 5 == 0 else datetime(2024, 6, 1, i % 24, 5, 7, (i * 1237) % 1000000))
+        for i in range(40)
+    ]
+    db.add_all(customers)
+    db.commit()
+    for i, customer in enumerate(customers[:12]):
+        db.add(Referral(user_id=user.id, customer_id=customer.id, referred_by=f"ref {i} ✓",
+                        status="completed" if i % 2 else "pending", reward_points=i * 10))
+    db.commit()
+    refresh_segments(db, user.id)
+    return user.id
+
+@pytest.fixture
+def client(db):
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        yield client
+
+@pytest.mark.parametrize("path, params", [
+    ("/customers/", {"limit": 25, "skip": 5}),
+    ("/customers/", {"segment": "new"}),
+    ("/customers/search", {"query": "example"}),
+    ("/customers/search", {"query": "😀"}),
+    ("/referrals/", {}),
+    ("/dashboard/reports", {}),
+])
+def test_fast_path_is_byte_compatible(client, tenant, monkeypatch, path, params):
+    for module in (customers_api, referrals_api, dashboard_api):
+        monkeypatch.setattr(module, "FAST_JSON", True)
+    fast = client.get(path, params={"user_id": tenant, **params})
+    for module in (customers_api, referrals_api, dashboard_api):
+        monkeypatch.setattr(module, "FAST_JSON", False)
+    slow = client.get(path, params={"user_id": tenant, **params})
+
+    assert fast.status_code == slow.status_code == 200
+    assert fast.content == slow.content
+    assert fast.headers["content-type"] == slow.headers["content-type"]
+    assert len(fast.json()) > 0
+
+def test_row_serializer_fallback_without_orjson(monkeypatch):
+    serializer = RowSerializer(CustomerSchema)
+    rows = [("Ásha", "a@example.com", None, 1, datetime(2024, 6, 1, 3, 4, 5, 120000)),
+            ("B", "b@example.com", "n", 2, None)]
+    fast = serializer.dumps(rows)
+    monkeypatch.setattr("app.core.serialization.orjson", None)
+
+    assert serializer.dumps(rows) == fast
+    assert serializer.fields == ("name", "contact_info", "notes", "id", "last_contacted")
+
+@pytest.mark.parametrize("orjson_installed", [True, False])
+def test_tz_aware_datetimes_match_pydantic(monkeypatch, orjson_installed):
+    # Postgres returns aware datetimes; pydantic writes a zero offset as "Z"
+    if not orjson_installed:
+        monkeypatch.setattr("app.core.serialization.orjson", None)
+    serializer = RowSerializer(CustomerSchema)
+    rows = [("A", "a@example.com", None, 1, datetime(2024, 6, 1, 3, 4, 5, 120000, tzinfo=timezone.utc)),
+            ("B", "b@example.com", None, 2, datetime(2024, 6, 1, 3, 4, 5, tzinfo=timezone(timedelta(hours=2))))]
+    items = [dict(zip(serializer.fields, row)) for row in rows]
+
+    assert serializer.dumps(rows) == serializer.adapter.dump_json(serializer.adapter.validate_python(items))
+    assert b"2024-06-01T03:04:05.120000Z" in serializer.dumps(rows)
+    report = {"customers": items}
+    assert ORJSONResponse(report).body == TypeAdapter(Dict[str, Any]).dump_json(report)
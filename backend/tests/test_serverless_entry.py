@@ -0,0 +1,47 @@
+import asyncio
+import importlib.util
+import os
+import pytest
+from fastapi.testclient import TestClient
+from app.database.database import get_db, get_directory_db, engine_options
+from app.core.http_client import get_http_client, close_http_client
+
+ENTRY_POINT = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "api", "index.py")
+
+@pytest.fixture
+def index(db):
+    spec = importlib.util.spec_from_file_location("serverless_index", ENTRY_POINT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    overrides = module.backend.dependency_overrides
+    overrides[get_db] = overrides[get_directory_db] = lambda: db
+    return module
+
+def test_entry_point_serves_backend_routes_with_and_without_api_prefix(index, db):
+    with TestClient(index.app) as client:
+        response = client.post("/api/auth/signup", json={"name": "Asha", "user_id": "asha", "password": "s3cret-pass"})
+        assert response.status_code == 200, response.text
+        user_pk = response.json()["id"]
+
+        # Same database either way; nothing is kept in the function instance
+        assert client.post("/auth/signup", json={"name": "Asha", "user_id": "asha", "password": "x"}).status_code == 400
+        assert client.get("/api/customers/", params={"user_id": user_pk}).json() == []
+        assert client.get("/api/").json() == {"message": "Micro-Entrepreneur Growth App API"}
+
+def test_http_client_is_reused_within_a_loop_and_not_across_loops():
+    async def twice():
+        first, second = get_http_client(), get_http_client()
+        await close_http_client()
+        return first, second
+
+    first, second = asyncio.run(twice())
+    other, _ = asyncio.run(twice())
+
+    assert first is second
+    assert other is not first
+    assert first.is_closed
+
+def test_engine_options_only_pool_server_databases():
+    assert engine_options("sqlite:///./app.db") == {"connect_args": {"check_same_thread": False}}
+    options = engine_options("postgresql://user@localhost/app")
+    assert options["pool_pre_ping"] and "connect_args" not in options
@@ -0,0 +1,276 @@
+from datetime import date, datetime
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.pool import StaticPool
+from app.main import create_app
+from app.core import profiling
+from app.database import database
+from app.database.database import Base
+from app.database.sharding import FROZEN, HashRing, ShardRouter, parse_shard_urls, tenant_shards
+from app.api import admin as admin_api, auth as auth_api
+from app.models.models import User, Customer, Interaction, CustomerScore, DailyTenantMetrics, Referral, SocialAccount
+from migrate_tenant import TenantMove, pin_existing
+
+def _engine():
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+@pytest.fixture
+def router(monkeypatch):
+    router = ShardRouter({"default": _engine(), "a": _engine(), "b": _engine()})
+    router.create_all(Base.metadata)
+    for module in (database, admin_api, auth_api):
+        monkeypatch.setattr(module, "shards", router)
+    monkeypatch.setattr(database, "SessionLocal", router.sessionmakers["default"])
+    yield router
+    for engine in router.engines.values():
+        engine.dispose()
+
+@pytest.fixture
+def client(router):
+    with TestClient(create_app()) as client:
+        yield client
+
+def _count(router, shard, model, **filters):
+    with router.sessionmakers[shard]() as db:
+        return db.query(func.count()).select_from(model).filter_by(**filters).scalar()
+
+def _tenant(router, shard, customers=3, messages=2, first_id=1):
+    """A tenant whose users row is in the directory, pinned to `shard`, with data there"""
+    with router.sessionmakers["default"]() as db:
+        user = User(name="Agent", user_id=f"agent{first_id}", password_hash="x")
+        db.add(user)
+        db.commit()
+        user_pk = user.id
+    router.assign(user_pk, shard)
+    with router.sessionmakers[shard]() as db:
+        if shard != "default":
+            db.add(User(id=user_pk, name="Agent", user_id=f"agent{first_id}"))
+        for i in range(customers):
+            customer = Customer(id=first_id + i, user_id=user_pk, name=f"Customer {i}", contact_info=f"c{i}")
+            db.add(customer)
+            db.flush()
+            db.add(CustomerScore(customer_id=customer.id, user_id=user_pk, engagement_score=0.5))
+            for n in range(messages):
+                # Explicit ids: SQLite shards number their rows independently
+                db.add(Interaction(id=(first_id + i) * 100 + n, customer_id=customer.id, message=f"m{n}", sent_by="customer",
+                                   timestamp=datetime(2024, 6, 1, n)))
+        db.add(DailyTenantMetrics(user_id=user_pk, day=date(2024, 6, 1)))
+        db.commit()
+    return user_pk
+
+def test_ring_is_stable_and_adding_a_shard_moves_few_tenants():
+    before = HashRing(["default", "a", "b"])
+    after = HashRing(["default", "a", "b", "c"])
+
+    placed = [before.get(user_id) for user_id in range(4000)]
+    moved = sum(placed[user_id] != after.get(user_id) for user_id in range(4000))
+
+    assert placed == [HashRing(["b", "a", "default"]).get(user_id) for user_id in range(4000)]
+    assert {name: placed.count(name) > 1000 for name in ("default", "a", "b")} == {"default": True, "a": True, "b": True}
+    # Only keys landing on the new shard move, about a quarter of them
+    assert 600 < moved < 1400
+    assert all(after.get(user_id) == "c" for user_id in range(4000) if placed[user_id] != after.get(user_id))
+
+def test_parse_shard_urls():
+    assert parse_shard_urls(" a=postgresql://h/a?sslmode=require , b=sqlite:///./b.db,") == {
+        "a": "postgresql://h/a?sslmode=require", "b": "sqlite:///./b.db"
+    }
+    with pytest.raises(ValueError):
+        parse_shard_urls("default=sqlite://")
+    with pytest.raises(ValueError):
+        parse_shard_urls("just-a-url")
+
+def test_directory_entry_overrides_ring(router):
+    ring_shard = router.ring.get(7)
+    other = next(name for name in router.engines if name != ring_shard)
+
+    assert router.shard_for(7) == ring_shard
+    router.assign(7, other)
+    assert router.shard_for(7) == other
+    assert router.session(7).get_bind() is router.engines[other]
+    assert router.session().get_bind() is router.engines["default"]
+
+def test_requests_are_served_from_the_tenants_shard(client, router):
+    response = client.post("/auth/signup", json={"name": "Asha", "user_id": "asha", "password": "s3cret-pass"})
+    assert response.status_code == 200, response.text
+    user_pk = response.json()["id"]
+    router.assign(user_pk, "b")
+    router.replicate(user_pk, User.__table__, {"id": user_pk, "name": "Asha", "user_id": "asha"})
+
+    created = client.post("/customers/", json={"user_id": user_pk, "name": "Ravi", "contact_info": "ravi@example.com"})
+    assert created.status_code == 200, created.text
+    customer_id = created.json()["id"]
+
+    assert _count(router, "b", Customer, user_id=user_pk) == 1
+    assert _count(router, "default", Customer) == 0
+    assert [c["name"] for c in client.get("/customers/", params={"user_id": user_pk}).json()] == ["Ravi"]
+    # Routes without a user_id name the tenant in a header
+    assert client.get(f"/customers/{customer_id}").status_code == 400
+    assert client.get(f"/customers/{customer_id}", headers={"X-Tenant-ID": str(user_pk)}).json()["name"] == "Ravi"
+
+def test_routes_by_id_need_a_tenant_and_stay_within_it(client, router):
+    user_pk = _tenant(router, "b")  # customers 1..3
+    neighbour = _tenant(router, "b", customers=1, first_id=10)
+    home = _tenant(router, "default", customers=1, first_id=20)
+    with router.sessionmakers["b"]() as db:
+        db.add(Referral(id=1, user_id=user_pk, customer_id=1, referred_by="x", status="pending", reward_points=0))
+        db.add_all([SocialAccount(id=i, user_id=user_pk, platform_name="instagram") for i in (1, 2)])
+        db.commit()
+    # The same ids in the directory database, belonging to someone else
+    with router.sessionmakers["default"]() as db:
+        db.add(Customer(id=1, user_id=home, name="Not yours", contact_info="x"))
+        db.add(Referral(id=1, user_id=home, customer_id=1, referred_by="y", status="pending", reward_points=0))
+        db.add_all([SocialAccount(id=i, user_id=home, platform_name="facebook") for i in (1, 2)])
+        db.commit()
+    referral = {"customer_id": 1, "referred_by": "x", "status": "completed", "reward_points": 50}
+    calls = [
+        ("GET", "/customers/1", None),
+        ("GET", "/customers/1/interactions", None),
+        ("POST", "/customers/1/contact", {"message": "hello", "sent_by": "user"}),
+        ("PUT", "/customers/2", {"name": "Renamed", "contact_info": "c1"}),
+        ("PUT", "/referrals/1", referral),
+        ("POST", "/social/refresh/1", None),
+        ("DELETE", "/social/disconnect/2", None),
+        ("DELETE", "/customers/3", None),
+    ]
+
+    for method, path, body in calls:
+        assert client.request(method, path, json=body).status_code == 400, path
+        # Another tenant on the same shard doesn't see these rows
+        response = client.request(method, path, json=body, headers={"X-Tenant-ID": str(neighbour)})
+        assert response.status_code == 404 or response.json() == [], path
+    for method, path, body in calls:
+        response = client.request(method, path, json=body, headers={"X-Tenant-ID": str(user_pk)})
+        assert response.status_code == 200, (path, response.text)
+
+    assert len(client.get("/customers/1/interactions", headers={"X-Tenant-ID": str(user_pk)}).json()) == 3
+    with router.sessionmakers["b"]() as db:
+        assert db.get(Customer, 1).last_contacted is not None
+        assert db.get(Customer, 2).name == "Renamed" and db.get(Customer, 3) is None
+        assert db.get(Referral, 1).status == "completed" and db.get(SocialAccount, 2) is None
+    with router.sessionmakers["default"]() as db:
+        assert db.get(Customer, 1).last_contacted is None and db.get(Referral, 1).status == "pending"
+        assert db.get(SocialAccount, 2) is not None
+
+    # Writes by id are held while the tenant is being moved
+    router.assign(user_pk, "b", FROZEN)
+    headers = {"X-Tenant-ID": str(user_pk)}
+    assert client.get("/customers/1", headers=headers).status_code == 200
+    for method, path, body in calls[2:5] + calls[6:]:
+        assert client.request(method, path, json=body, headers=headers).status_code == 503, path
+
+def test_signup_pins_the_tenant_and_copies_its_user_without_credentials(client, router):
+    user_pk = client.post("/auth/signup", json={"name": "Asha", "user_id": "asha", "password": "s3cret-pass"}).json()["id"]
+    shard = router.ring.get(user_pk)
+
+    with router.sessionmakers["default"]() as db:
+        assert db.get(User, user_pk).password_hash
+    if shard != "default":
+        with router.sessionmakers[shard]() as db:
+            copy = db.get(User, user_pk)
+            assert copy.user_id == "asha" and copy.password_hash is None
+    # Pinned: a new shard on the ring doesn't move it
+    router.ring = HashRing(list(router.engines) + ["c"])
+    router.forget(user_pk)
+    assert router.shard_for(user_pk) == shard
+
+def test_frozen_tenant_reads_but_gets_503_on_writes(client, router):
+    user_pk = _tenant(router, "a")
+    router.assign(user_pk, "a", FROZEN)
+
+    assert client.get("/customers/", params={"user_id": user_pk}).status_code == 200
+    response = client.post("/customers/", json={"user_id": user_pk, "name": "Late", "contact_info": "x"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"]
+    assert _count(router, "a", Customer, name="Late") == 0
+
+def test_move_tenant_between_shards(router):
+    user_pk = _tenant(router, "a", customers=7, messages=3)
+    other = _tenant(router, "b", customers=2, first_id=100)
+
+    counts = TenantMove(router, user_pk, "b", batch_size=3, settle_seconds=0).run()
+
+    assert counts["customers"] == 7 and counts["interactions"] == 21 and counts["customer_scores"] == 7
+    assert router.placement(user_pk) == ("b", "active")
+    assert _count(router, "b", Customer, user_id=user_pk) == 7
+    assert _count(router, "b", Customer, user_id=other) == 2
+    assert _count(router, "b", DailyTenantMetrics, user_id=user_pk) == 1
+    assert _count(router, "a", Customer) == _count(router, "a", Interaction) == _count(router, "a", User) == 0
+    with router.sessionmakers["b"]() as db:
+        assert db.get(User, user_pk).password_hash is None
+    # And back to the directory database, keeping the copy on b
+    TenantMove(router, user_pk, "default", settle_seconds=0).run(keep_source=True)
+    assert router.shard_for(user_pk) == "default"
+    assert _count(router, "default", Interaction) == 21 and _count(router, "b", Customer, user_id=user_pk) == 7
+
+def test_move_catches_up_writes_made_during_the_copy(router):
+    user_pk = _tenant(router, "a", customers=4)
+    move = TenantMove(router, user_pk, "b", batch_size=2, settle_seconds=0)
+    copy = move.copy
+
+    def copy_then_write(table, key_name):
+        copy(table, key_name)
+        if table.name == "interactions":
+            # The tenant is still live on a: a new message, an edit and a deletion
+            with router.sessionmakers["a"]() as db:
+                db.add(Interaction(customer_id=1, message="late", sent_by="customer", timestamp=datetime(2024, 7, 1)))
+                db.get(Customer, 2).name = "Renamed"
+                db.query(CustomerScore).filter_by(customer_id=4).delete()
+                db.query(Interaction).filter_by(customer_id=4).delete()
+                db.query(Customer).filter_by(id=4).delete()
+                db.commit()
+
+    move.copy = copy_then_write
+    counts = move.run()
+
+    assert counts["interactions"] == 7 and counts["customers"] == 3
+    with router.sessionmakers["b"]() as db:
+        assert db.get(Customer, 2).name == "Renamed"
+        assert db.get(Customer, 4) is None
+        assert db.query(Interaction).filter_by(message="late").count() == 1
+
+def test_move_refuses_id_collisions_and_leaves_tenant_in_place(router):
+    user_pk = _tenant(router, "a")
+    _tenant(router, "b", first_id=2)  # customer ids 2..4 are taken on b
+
+    with pytest.raises(RuntimeError, match="ids are already used on b"):
+        TenantMove(router, user_pk, "b", settle_seconds=0).run()
+    assert router.placement(user_pk) == ("a", "active")
+    assert _count(router, "a", Customer, user_id=user_pk) == 3
+
+def test_failed_move_removes_partial_copy(router, monkeypatch):
+    user_pk = _tenant(router, "a")
+    move = TenantMove(router, user_pk, "b", settle_seconds=0)
+    monkeypatch.setattr(move, "verify", lambda: (_ for _ in ()).throw(RuntimeError("mismatch")))
+
+    with pytest.raises(RuntimeError, match="mismatch"):
+        move.run()
+    assert router.placement(user_pk) == ("a", "active")
+    assert _count(router, "b", Customer) == _count(router, "b", Interaction) == _count(router, "b", User) == 0
+
+def test_pin_existing_records_ring_placement(router):
+    with router.sessionmakers["default"]() as db:
+        db.add_all([User(name=f"U{i}", user_id=f"u{i}") for i in range(5)])
+        db.commit()
+
+    assert pin_existing(router) == 5
+    assert pin_existing(router) == 0
+    with router.engines["default"].connect() as conn:
+        pinned = dict(conn.execute(select(tenant_shards.c.user_id, tenant_shards.c.shard)).all())
+    assert pinned == {user_pk: router.ring.get(user_pk) for user_pk in range(1, 6)}
+
+def test_admin_endpoints_gather_from_every_shard(client, router, monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "t0ken")
+    small = _tenant(router, "a", customers=2)
+    big = _tenant(router, "b", customers=5, first_id=10)
+    home = _tenant(router, "default", customers=3, first_id=20)
+    headers = {"X-Admin-Token": "t0ken"}
+
+    shards = client.get("/admin/shards", headers=headers).json()["shards"]
+    largest = client.get("/admin/tenants/largest", params={"limit": 2}, headers=headers).json()["tenants"]
+
+    assert {name: counts["customers"] for name, counts in shards.items()} == {"default": 3, "a": 2, "b": 5}
+    assert shards["b"]["interactions"] == 10
+    assert largest == [{"user_id": big, "customers": 5, "shard": "b"}, {"user_id": home, "customers": 3, "shard": "default"}]
+    assert small not in [tenant["user_id"] for tenant in largest]
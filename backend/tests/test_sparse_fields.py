@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from app.main import create_app
+from app.database.database import get_db
+from app.models.models import User, Customer, Interaction, Referral
+from app.api import customers as customers_api
+
+@pytest.fixture
+def tenant(db):
+    user = User(name="Agent", user_id="agent1", password_hash="x")
+    db.add(user)
+    db.commit()
+    customers = [Customer(user_id=user.id, name=f"Customer {i}", contact_info=f"c{i}@example.com", notes="secret",
+                          last_contacted=datetime(2024, 6, 1) + timedelta(days=i)) for i in range(5)]
+    db.add_all(customers)
+    db.commit()
+    for n in range(3):
+        db.add(Interaction(customer_id=customers[0].id, message=f"hello {n}",
+                           sent_by="customer" if n == 1 else f"user_{user.id}",
+                           timestamp=datetime(2024, 6, 1, 10, n)))
+    db.add(Referral(user_id=user.id, customer_id=customers[0].id, referred_by="x", status="completed", reward_points=50))
+    db.commit()
+    return {"user_id": user.id, "customer_id": customers[0].id}
+
+@pytest.fixture
+def client(db):
+    app = create_app()
+    app.dependency_overrides[get_db] = lambda: db
+    with TestClient(app) as client:
+        yield client
+
+def _selected_columns(query_counter):
+    statement = " ".join(query_counter.statements[-1][0].split())
+    return statement[:statement.index(" FROM ")]
+
+@pytest.mark.parametrize("fast_json", [True, False])
+def test_customer_list_projects_requested_fields(client, tenant, query_counter, monkeypatch, fast_json):
+    monkeypatch.setattr(customers_api, "FAST_JSON", fast_json)
+
+    response = client.get("/customers/", params={"user_id": tenant["user_id"], "fields": "last_contacted, name,id"})
+
+    assert response.status_code == 200
+    # Schema order, whatever order they were asked for in
+    assert list(response.json()[0]) == ["name", "id", "last_contacted"]
+    assert response.json()[0] == {"name": "Customer 0", "id": tenant["customer_id"], "last_contacted": "2024-06-01T00:00:00"}
+    columns = _selected_columns(query_counter)
+    assert "notes" not in columns and "contact_info" not in columns
+
+def test_customer_search_and_detail_fields(client, tenant, query_counter):
+    search = client.get("/customers/search", params={"user_id": tenant["user_id"], "query": "Customer 3", "fields": "id"})
+    assert search.json() == [{"id": tenant["customer_id"] + 3}]
+
+    detail = client.get(f"/customers/{tenant['customer_id']}", params={"fields": "name,notes"})
+    assert detail.json() == {"name": "Customer 0", "notes": "secret"}
+    assert "contact_info" not in _selected_columns(query_counter)
+
+    assert client.get("/customers/999999", params={"fields": "name"}).status_code == 404
+    # Without fields the detail is unchanged
+    assert set(client.get(f"/customers/{tenant['customer_id']}").json()) == {
+        "name", "contact_info", "notes", "id", "last_contacted"
+    }
+
+@pytest.mark.parametrize("path", ["/customers/", "/customers/search", "/referrals/", "/referrals/rewards"])
+@pytest.mark.parametrize("fields, detail", [
+    ("id,password_hash", "Unknown fields: password_hash"),
+    (" , ", "fields must name at least one field"),
+])
+def test_unknown_or_empty_fields_are_rejected(client, tenant, path, fields, detail):
+    response = client.get(path, params={"user_id": tenant["user_id"], "query": "x", "fields": fields})
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith(detail)
+
+def test_referral_fields(client, tenant):
+    for path in ("/referrals/", "/referrals/rewards"):
+        response = client.get(path, params={"user_id": tenant["user_id"], "fields": "status,reward_points"})
+        assert response.json() == [{"status": "completed", "reward_points": 50}]
+
+def test_interaction_fields(client, tenant, query_counter):
+    customer_id = tenant["customer_id"]
+    history = client.get(f"/customers/{customer_id}/interactions", params={"fields": "id,message"}).json()
+    assert [list(item) for item in history] == [["message", "id"]] * 3
+    assert client.get(f"/customers/{customer_id}/interactions", params={"fields": "secret"}).status_code == 400
+
+    conversation = client.get(f"/messaging/conversations/{customer_id}",
+                              params={"user_id": tenant["user_id"], "fields": "message,is_from_user"})
+    assert conversation.json() == [
+        {"message": "hello 0", "is_from_user": True},
+        {"message": "hello 1", "is_from_user": False},
+        {"message": "hello 2", "is_from_user": True},
+    ]
+    columns = _selected_columns(query_counter)
+    assert "sent_by" in columns and "timestamp" not in columns
+
+    page = client.get(f"/messaging/conversations/{customer_id}/history",
+                      params={"user_id": tenant["user_id"], "limit": 2, "fields": "id"}).json()
+    assert page["messages"] == [{"id": m["id"]} for m in page["messages"]] and page["before"] and page["sync_token"]
+    sync = client.get(f"/messaging/conversations/{customer_id}/sync",
+                      params={"user_id": tenant["user_id"], "fields": "timestamp"}).json()
+    assert sync["messages"][0] == {"timestamp": "2024-06-01T10:00:00"}
+    assert client.get(f"/messaging/conversations/{customer_id}/sync",
+                      params={"user_id": tenant["user_id"], "fields": "body"}).status_code == 400
@@ -0,0 +1,43 @@
+import pytest
+from datetime import timedelta
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core.token_cache import VerifiedTokenCache, token_cache
+from app.core.security import create_access_token, get_current_user_id, revoke_access_token
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def credentials(token):
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+def test_cache_expires_and_evicts_lru():
+    clock = Clock()
+    cache = VerifiedTokenCache(max_size=2, clock=clock)
+    cache.put("a", {"sub": "a", "exp": 1100})
+    cache.put("b", {"sub": "b", "exp": 2000})
+    assert cache.get("a")["sub"] == "a"
+    cache.put("c", {"sub": "c", "exp": 2000})   # evicts b, the least recently used
+    assert cache.get("b") is None
+    clock.now = 1100
+    assert cache.get("a") is None
+    cache.put("no-exp", {"sub": "x"})
+    assert cache.get("no-exp") is None
+    assert cache.stats()["evictions"] == 1
+
+def test_dependency_uses_cache_and_honours_revocation():
+    token_cache.clear()
+    token = create_access_token({"sub": "agent1"}, expires_delta=timedelta(minutes=5))
+    assert get_current_user_id(credentials(token)) == "agent1"
+    assert get_current_user_id(credentials(token)) == "agent1"
+    assert (token_cache.hits, token_cache.misses) == (1, 1)
+
+    revoke_access_token(token)
+    with pytest.raises(HTTPException) as error:
+        get_current_user_id(credentials(token))
+    assert error.value.status_code == 401
+    token_cache.clear()